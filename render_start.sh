@@ -7,11 +7,24 @@ set -o errexit
 echo "Aplicando migraciones..."
 python manage.py migrate
 
+# 2.1 Pasar a la base las papeletas del diario que dejó el proceso anterior (modo 'journal')
+if [ "$BALLOT_INGESTION_MODE" = "journal" ]; then
+    echo "Reaplicando el diario de papeletas..."
+    python manage.py replay_journal
+fi
+
 # 3. Intentar crear el superusuario (si falla porque ya existe, no pasa nada)
 # El "|| true" hace que si este comando falla, el script continue.
 echo "Creando superusuario..."
 python manage.py createsuperuser --noinput || true
 
 # 4. Arrancar el servidor Gunicorn
+# SERVER_INTERFACE=asgi: workers de Uvicorn y vistas asíncronas (voto, llave y resultados)
+if [ "$SERVER_INTERFACE" = "asgi" ]; then
+    echo "Iniciando Gunicorn + Uvicorn (ASGI)..."
+    export ASYNC_VIEWS="${ASYNC_VIEWS:-True}"
+    export RESULTS_STREAM_ENABLED="${RESULTS_STREAM_ENABLED:-True}"
+    exec gunicorn voting_project.asgi:application -k uvicorn.workers.UvicornWorker
+fi
 echo "Iniciando Gunicorn..."
 gunicorn voting_project.wsgi:application
\ No newline at end of file
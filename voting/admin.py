@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import VoterProfile
+from .models import Election, ElectionVoter, VoterProfile
 
-# Registramos el modelo para que aparezca en el panel de administración
-admin.site.register(VoterProfile)
\ No newline at end of file
+# Registramos los modelos para que aparezcan en el panel de administración
+admin.site.register(VoterProfile)
+admin.site.register(Election)
+admin.site.register(ElectionVoter)
\ No newline at end of file
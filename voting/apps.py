@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class VotingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'voting'
+
+    def ready(self):
+        # Todos los procesos cifran los votos con el mismo llavero AES (ver key_ring.py)
+        from django.core import checks
+        from .key_ring import check_key_ring, configure_key_ring
+        configure_key_ring()
+        checks.register(check_key_ring, checks.Tags.security)
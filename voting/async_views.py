@@ -0,0 +1,187 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag
+
+from .ballot_pipeline import AlreadyVoted, BallotRejected, seal_ballot, seal_signed_ballot
+from .ballot_queue import QueueFull, enqueue_submission, has_open_submission
+from .ballot_utils import build_vote_content
+from .crypto_pool import CryptoPoolBusy, run_crypto
+from .crypto_utils import private_key_fingerprint, to_hex
+from .db_router import apin_primary, replica_reads
+from .elections import aget_election_or_404, ahas_voted, ais_eligible
+from .forms import KeyCheckForm
+from .metrics import span
+from .models import VoterProfile
+from .results_cache import aget_results_snapshot, results_etag
+from .views import client_signing_context, parse_client_signature, read_ballot_form, store_ballot
+
+# ---------------------------------------------------------
+# VISTAS ASÍNCRONAS (ASYNC_VIEWS=True, servidor ASGI)
+# ---------------------------------------------------------
+# Las mismas páginas que sus versiones en views.py, sin bloquear el event loop:
+# - Lecturas con el ORM asíncrono (aexists, acount, aget_object_or_404, sesión con aget/aset).
+# - Firma, verificación, cifrado y huellas en el pool de procesos (crypto_pool.run_crypto).
+# - Guardar la papeleta sigue siendo síncrono (el ORM async no tiene transacciones):
+#   commit_ballot corre en el hilo de la petición con sync_to_async.
+# El cuerpo (y el archivo .key) ya llega leído: el servidor ASGI lo recibe de forma asíncrona.
+
+BUSY_MESSAGE = "El sistema está recibiendo muchos votos en este momento. Intenta de nuevo en unos segundos."
+
+
+async def _render(request, template_name, context, status=None):
+    # Las plantillas (mensajes, usuario, CSRF) se arman en un hilo: pueden tocar la sesión
+    return await sync_to_async(render)(request, template_name, context, status=status)
+
+
+async def _load_voter(request, election_slug):
+    # El usuario ya resuelto reemplaza al perezoso: el código síncrono y las plantillas no lo vuelven a consultar
+    request.user = await request.auser()
+    profile = await aget_object_or_404(VoterProfile, user=request.user)
+    election = await aget_election_or_404(election_slug)
+    return profile, election
+
+
+async def _commit_and_confirm(request, profile, election, vote_content, answers, signature, encrypted_vote):
+    await sync_to_async(store_ballot)(profile, election, vote_content, answers, signature, encrypted_vote)
+    await apin_primary(request)
+    messages.success(request, "¡Voto firmado y procesado con éxito!")
+    await request.session.aset('last_signature', to_hex(signature))
+    return redirect('voting:success_page')
+
+
+@login_required
+async def vote_submission_view(request, election=None):
+    """
+    Versión asíncrona de views.vote_submission_view (mismas validaciones y respuestas).
+    Mientras el pool firma o la base guarda, el proceso sigue atendiendo otras peticiones.
+    """
+    profile, election = await _load_voter(request, election)
+    vote_url = reverse('voting:election_vote', args=[election.slug])
+    context = {
+        'profile': profile, 'election': election, 'has_voted': False, 'eligible': True,
+        'client_signing': client_signing_context(request, profile, election),
+    }
+
+    if await ahas_voted(profile, election):
+        messages.warning(request, "Ya has votado en esta elección. No puedes votar de nuevo.")
+        return redirect('voting:success_page')
+
+    if not profile.public_key:
+        messages.error(request, "No tienes una llave pública registrada. Por favor, genera tu llave primero.")
+        return redirect('voting:generate_keys')
+
+    context['eligible'] = await ais_eligible(profile, election)
+    if request.method == 'POST' and (not election.is_open or not context['eligible']):
+        messages.error(request, "No puedes votar en esta elección.")
+        return await _render(request, 'voting/vote_form.html', context, status=403)
+
+    if request.method != 'POST':
+        return await _render(request, 'voting/vote_form.html', context)
+
+    answers, private_key_file, client_signature, error = read_ballot_form(request, election)
+    if error:
+        messages.error(request, error)
+        return await _render(request, 'voting/vote_form.html', context)
+
+    try:
+        vote_content = build_vote_content(request.user.username, answers, election)
+        # Puede guardar la huella si faltaba: es una escritura, va en un hilo
+        cache_key = await sync_to_async(lambda: profile.public_key_cache_key)()
+
+        if client_signature and not private_key_file:
+            # MODO NAVEGADOR: solo verificación + cifrado en el pool
+            signature = parse_client_signature(client_signature)
+            with span('ballot.seal'):
+                encrypted_vote = await run_crypto(
+                    seal_signed_ballot, vote_content, signature, profile.public_key, profile.signature_scheme,
+                    None, cache_key,
+                )
+            return await _commit_and_confirm(request, profile, election, vote_content, answers, signature, encrypted_vote)
+
+        private_key_pem = private_key_file.read().decode('utf-8')
+
+        if settings.BALLOT_INGESTION_MODE == 'queue':
+            if await sync_to_async(has_open_submission)(profile, election):
+                messages.warning(request, "Tu voto ya se está procesando.")
+                return redirect('voting:verification_page')
+            try:
+                submission = await sync_to_async(enqueue_submission)(profile, election, vote_content, private_key_pem)
+            except QueueFull:
+                messages.error(request, BUSY_MESSAGE)
+                return await _render(request, 'voting/vote_form.html', context, status=503)
+            return redirect('voting:submission_status', receipt=submission.receipt)
+
+        # FIRMA, VERIFICACIÓN y ENCRIPTACIÓN en otro proceso
+        with span('ballot.seal'):
+            signature, encrypted_vote = await run_crypto(
+                seal_ballot, vote_content, private_key_pem, profile.public_key, profile.signature_scheme,
+                None, cache_key,
+            )
+        return await _commit_and_confirm(request, profile, election, vote_content, answers, signature, encrypted_vote)
+
+    except CryptoPoolBusy:
+        messages.error(request, BUSY_MESSAGE)
+        return await _render(request, 'voting/vote_form.html', context, status=503)
+
+    except AlreadyVoted as e:
+        messages.warning(request, str(e))
+        return redirect('voting:success_page')
+
+    except BallotRejected as e:
+        messages.error(request, str(e))
+        return redirect(vote_url)
+
+    except Exception as e:
+        messages.error(request, f"Error Criptográfico o de Archivo: {e}")
+        return await _render(request, 'voting/vote_form.html', context)
+
+
+@login_required
+async def check_key_status(request, election=None):
+    """Versión asíncrona de views.check_key_status: la huella de la llave subida se calcula en el pool."""
+    profile, election = await _load_voter(request, election)
+    key_status = None
+
+    if request.method == 'POST':
+        form = KeyCheckForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                key_content = request.FILES['private_key'].read().decode('utf-8')
+                uploaded_fingerprint = await run_crypto(private_key_fingerprint, key_content, profile.signature_scheme)
+                if not profile.public_key:
+                    key_status = 'no_key_registered'
+                elif uploaded_fingerprint != await sync_to_async(profile.ensure_fingerprint)():
+                    key_status = 'mismatch'
+                elif await ahas_voted(profile, election):
+                    key_status = 'valid_used'
+                else:
+                    key_status = 'valid_ready'
+            except (ValueError, IndexError, TypeError):
+                key_status = 'invalid_format'
+            except CryptoPoolBusy:
+                messages.error(request, BUSY_MESSAGE)
+    else:
+        form = KeyCheckForm()
+
+    return await _render(request, 'voting/check_key.html', {
+        'form': form,
+        'key_status': key_status,
+        'profile': profile,
+        'election': election,
+    })
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@etag(results_etag)
+@replica_reads
+async def results_data_view(request, election=None):
+    """Versión asíncrona de views.results_data_view (caché y ORM asíncronos; 304 con el ETag vigente)."""
+    election = await aget_election_or_404(election)
+    return JsonResponse(await aget_results_snapshot(election))
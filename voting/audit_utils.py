@@ -0,0 +1,92 @@
+from collections import Counter
+
+from .crypto_utils import AESKeyRing, decrypt_vote_aes, set_key_ring, verify_signature
+
+# ---------------------------------------------------------
+# HERRAMIENTAS DE AUDITORÍA (Re-verificación masiva)
+# ---------------------------------------------------------
+# Este módulo NO importa modelos de Django a propósito:
+# sus funciones se ejecutan dentro de procesos hijos (ProcessPoolExecutor),
+# que solo reciben tuplas simples y regresan resultados simples.
+
+# Motivos de falla que se reportan en la lista de fallos
+INVALID_SIGNATURE = 'invalid_signature'
+MISSING_KEY = 'missing_key'
+UNDECRYPTABLE = 'undecryptable'
+
+
+def chunked(iterable, size):
+    """Agrupa un iterable en listas de 'size' elementos (la última puede ser más corta)."""
+    chunk = []
+    for row in iterable:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def verify_ballot_rows(rows):
+    """
+    Verifica un bloque de votos.
+    Cada fila es: (vote_id, option, digital_signature, public_key, signature_scheme).
+    Regresa un diccionario con los conteos y la lista de fallos del bloque.
+    """
+    valid = invalid = missing_key = 0
+    failures = []
+
+    for vote_id, option, signature, public_key_pem, scheme in rows:
+        # Sin llave pública no hay forma de verificar (la borraron o nunca existió)
+        if not public_key_pem:
+            missing_key += 1
+            failures.append({'vote_id': vote_id, 'reason': MISSING_KEY})
+            continue
+
+        if verify_signature(option, signature, public_key_pem, scheme):
+            valid += 1
+        else:
+            invalid += 1
+            failures.append({'vote_id': vote_id, 'reason': INVALID_SIGNATURE, 'scheme': scheme})
+
+    return {
+        'last_id': rows[-1][0] if rows else None,
+        'valid': valid,
+        'invalid': invalid,
+        'missing_key': missing_key,
+        'failures': failures,
+    }
+
+
+def init_key_ring(exported_key_ring):
+    """Inicializador de los procesos hijos: reciben el llavero AES del proceso padre."""
+    set_key_ring(AESKeyRing.from_export(exported_key_ring))
+
+
+def tally_encrypted_rows(rows):
+    """
+    Descifra un bloque de votos y agrupa las boletas idénticas.
+    Cada fila es: (vote_id, encrypted_vote).
+    Regresa {'P1:ALTO|P2:FACIL|...': n} (sin el 'USUARIO:' de cada voto, así hay
+    a lo mucho unas decenas de combinaciones) y la lista de fallos del bloque.
+    """
+    ballots = Counter()
+    decrypted = 0
+    failures = []
+
+    for vote_id, encrypted_vote in rows:
+        try:
+            vote_content = decrypt_vote_aes(encrypted_vote or b'')
+        except ValueError as e:
+            failures.append({'vote_id': vote_id, 'reason': UNDECRYPTABLE, 'detail': str(e)})
+            continue
+        # 'USUARIO:x|P1:..|P2:..' -> 'P1:..|P2:..'
+        ballots[vote_content.partition('|')[2]] += 1
+        decrypted += 1
+
+    return {
+        'last_id': rows[-1][0] if rows else None,
+        'decrypted': decrypted,
+        'ballots': ballots,
+        'failures': failures,
+    }
@@ -0,0 +1,193 @@
+import time
+
+from django.db import IntegrityError, transaction
+
+from .ballot_utils import record_ballot_answers, record_vote_tally
+from .broadcast import publish_vote_delta
+from .crypto_utils import encrypt_vote_aes, sign_vote, verify_signature
+from .encrypted_tally import TallyContention, add_to_encrypted_tally, encrypt_answers
+from .ledger import schedule_ledger_append
+from .merkle import receipt_digest
+from .metrics import span
+from .models import ElectionVoter, Vote
+from .receipts import forget_missing_receipt
+from .turnout import record_vote_turnout
+
+# ---------------------------------------------------------
+# PROCESAMIENTO DE UNA PAPELETA (Firma -> Verificación -> Cifrado -> Guardado)
+# ---------------------------------------------------------
+# Las mismas etapas se usan en el modo en línea (dentro de la vista) y en el
+# modo cola (dentro de los workers de 'process_ballot_queue').
+
+
+class BallotRejected(Exception):
+    """El voto no se puede registrar; el mensaje se muestra tal cual al votante."""
+
+
+# Choque pasajero con otro voto: el votante puede volver a intentar
+RETRY_MESSAGE = "No se pudo registrar tu voto por un conflicto momentáneo. Intenta de nuevo."
+
+
+class AlreadyVoted(BallotRejected):
+    """El votante ya tiene una papeleta registrada (la base de datos rechazó la segunda)."""
+
+    def __init__(self, message="Ya has votado. No puedes votar de nuevo."):
+        super().__init__(message)
+
+
+class NotEligible(BallotRejected):
+    """La elección tiene padrón cerrado y el votante no está inscrito."""
+
+    def __init__(self, message="No estás inscrito en el padrón de esta elección."):
+        super().__init__(message)
+
+
+def _elapsed_ms(started):
+    return (time.perf_counter() - started) * 1000
+
+
+def seal_ballot(vote_content, private_key_pem, public_key_pem, scheme, timings=None, cache_key=None):
+    """
+    Firma el voto, comprueba la firma contra la llave pública registrada y lo cifra.
+    Regresa (firma, sobre cifrado), ambos en bytes.
+    Si se pasa un diccionario 'timings', guarda ahí los ms de cada etapa.
+    'cache_key' (VoterProfile.public_key_cache_key) evita volver a leer el PEM en cada voto.
+    """
+    timings = {} if timings is None else timings
+
+    # 1. FIRMA DIGITAL (Autenticación)
+    started = time.perf_counter()
+    signature = sign_vote(vote_content, private_key_pem, scheme)
+    timings['sign_ms'] = _elapsed_ms(started)
+
+    # 2-3. VERIFICACIÓN INMEDIATA y ENCRIPTACIÓN
+    # Comprobamos que la llave privada subida coincide con la pública que tenemos guardada.
+    encrypted_vote = seal_signed_ballot(
+        vote_content, signature, public_key_pem, scheme, timings, cache_key,
+        rejection="La llave privada subida no corresponde a su llave pública registrada.",
+    )
+    return signature, encrypted_vote
+
+
+def seal_signed_ballot(vote_content, signature, public_key_pem, scheme, timings=None, cache_key=None,
+                       rejection="La firma no corresponde a su llave pública registrada."):
+    """
+    Verifica una firma ya hecha (en el navegador, con WebCrypto) y cifra el voto.
+    Es la única operación de llave pública que el servidor hace en ese modo.
+    Regresa el sobre cifrado; si la firma no es válida lanza BallotRejected('rejection').
+    """
+    timings = {} if timings is None else timings
+
+    started = time.perf_counter()
+    valid = verify_signature(vote_content, signature, public_key_pem, scheme, cache_key=cache_key)
+    timings['verify_ms'] = _elapsed_ms(started)
+    if not valid:
+        raise BallotRejected(rejection)
+
+    # ENCRIPTACIÓN (Confidencialidad)
+    started = time.perf_counter()
+    encrypted_vote = encrypt_vote_aes(vote_content)
+    timings['encrypt_ms'] = _elapsed_ms(started)
+    return encrypted_vote
+
+
+def _claim_ballot(profile, election):
+    """
+    Marca al votante como "ya votó" en la elección. Debe llamarse dentro de la transacción del voto.
+    Con un UPDATE condicional (... SET has_voted = true WHERE ... AND has_voted = false):
+    si dos peticiones llegan a la vez, solo una afecta la fila; la otra ve 0 filas.
+    """
+    roll = ElectionVoter.objects.filter(election=election, voter=profile)
+    if roll.filter(has_voted=False).update(has_voted=True):
+        return
+    if roll.exists():
+        raise AlreadyVoted()
+    if not election.open_enrollment:
+        raise NotEligible()
+    # Inscripción abierta y primera vez: la fila nace ya marcada.
+    # Si otra petición la crea al mismo tiempo, la restricción única la rechaza (IntegrityError).
+    ElectionVoter.objects.create(election=election, voter=profile, has_voted=True)
+
+
+def claim_ballot(profile, election):
+    """
+    Marca "ya votó" en su propia transacción, antes de que la papeleta llegue a la base
+    (modo diario). Es el mismo UPDATE condicional: entre varios procesos solo uno gana.
+    """
+    try:
+        with transaction.atomic():
+            _claim_ballot(profile, election)
+    except IntegrityError:
+        raise AlreadyVoted()
+
+
+def _has_ballot(profile, election):
+    # Tras un IntegrityError (transacción ya revertida): ¿la otra petición sí dejó su papeleta o su marca?
+    return (
+        ElectionVoter.objects.filter(election=election, voter=profile, has_voted=True).exists()
+        or Vote.objects.filter(election=election, voter=profile).exists()
+    )
+
+
+def commit_ballot(profile, election, vote_content, answers, signature, encrypted_vote, timings=None):
+    """
+    Guarda la papeleta y todo lo que depende de ella en UNA transacción:
+    el Vote, sus respuestas, los contadores del tablero (y el conteo cifrado, si la
+    elección lo usa) y la marca de "ya votó" en el padrón. Su hoja en el registro
+    público se agrega al confirmarse (schedule_ledger_append).
+    Si el votante ya votó en esta elección (aunque sea en una petición simultánea), lanza AlreadyVoted.
+    """
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    if not election.is_open:
+        raise BallotRejected("La elección está cerrada: ya no se reciben votos.")
+
+    # Conteo cifrado: se cifra ANTES de abrir la transacción (es lo único caro)
+    tally_ciphertext = None
+    if election.encrypted_tally:
+        with span('tally.encrypt'):
+            tally_ciphertext = encrypt_answers(election, answers)
+
+    try:
+        with span('ballot.commit'), transaction.atomic():
+            with span('ballot.claim'):
+                _claim_ballot(profile, election)
+
+            vote = Vote.objects.create(
+                election=election,
+                voter=profile,
+                option=vote_content, # Guardamos el texto plano (opcional según requisitos)
+                digital_signature=signature, # Guardamos la firma
+                receipt_digest=receipt_digest(signature), # Y su SHA-256 (consulta pública del comprobante)
+                encrypted_vote=encrypted_vote, # Guardamos el cifrado
+                tally_ciphertext=tally_ciphertext,
+            )
+            # Guardamos las respuestas separadas y sumamos el voto a los contadores
+            # del tablero (misma transacción que la papeleta)
+            with span('ballot.answers_and_tally'):
+                record_ballot_answers(vote, answers)
+                record_vote_tally(election, answers)
+                record_vote_turnout(election, vote.timestamp, answers)
+                if tally_ciphertext is not None:
+                    add_to_encrypted_tally(election, [tally_ciphertext])
+            # Al confirmar, avisamos a los tableros conectados en vivo
+            transaction.on_commit(lambda: publish_vote_delta(election, answers))
+            # ...y el comprobante deja de estar marcado como "no existe" en la caché
+            transaction.on_commit(lambda: forget_missing_receipt(signature))
+            # La firma entra como hoja al árbol de Merkle público DESPUÉS del COMMIT, por lotes
+            # (ver voting/ledger.py): la fila de estado del árbol no se bloquea dentro del voto
+            transaction.on_commit(schedule_ledger_append)
+    except IntegrityError:
+        # Las restricciones únicas (election, voter) del padrón y de Vote son la última
+        # línea de defensa (ej. has_voted se reinició a mano pero la papeleta sigue ahí).
+        # Solo esas significan "ya votó": cualquier otra (registro, contadores) es un choque
+        # pasajero con otro voto y el votante debe poder reintentar.
+        if _has_ballot(profile, election):
+            raise AlreadyVoted()
+        raise BallotRejected(RETRY_MESSAGE)
+    except TallyContention:
+        # El agregado cifrado no se pudo actualizar: la transacción se revirtió entera
+        raise BallotRejected(RETRY_MESSAGE)
+
+    timings['commit_ms'] = _elapsed_ms(started)
+    return vote
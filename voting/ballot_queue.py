@@ -0,0 +1,166 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .ballot_pipeline import AlreadyVoted, BallotRejected, commit_ballot, seal_ballot
+from .ballot_utils import parse_vote_content
+from .crypto_utils import get_key_ring
+from .elections import has_voted
+from .models import BallotSubmission
+
+# ---------------------------------------------------------
+# COLA LOCAL DE INGESTA DE VOTOS
+# ---------------------------------------------------------
+# La cola es la propia tabla BallotSubmission: funciona igual en SQLite y Postgres
+# y no requiere servicios externos (Redis, RabbitMQ, ...).
+# Los workers "reclaman" una solicitud con un UPDATE condicional
+# (WHERE status = 'pending'): solo uno de ellos puede ganarla.
+
+# Etapas que se miden por cada solicitud
+STAGES = ('queue_ms', 'sign_ms', 'verify_ms', 'encrypt_ms', 'commit_ms')
+
+
+class QueueFull(Exception):
+    """Hay demasiadas solicitudes esperando: el votante debe reintentar en unos segundos."""
+
+
+def enqueue_submission(profile, election, vote_content, private_key_pem):
+    """
+    Guarda la solicitud de voto en la cola y regresa la BallotSubmission creada.
+    La llave privada se guarda cifrada con el llavero de papeletas, nunca en PEM.
+    Aplica contrapresión: si ya hay BALLOT_QUEUE_MAX_PENDING en espera, lanza QueueFull.
+    """
+    pending = BallotSubmission.objects.filter(status=BallotSubmission.PENDING).count()
+    if pending >= settings.BALLOT_QUEUE_MAX_PENDING:
+        raise QueueFull()
+
+    return BallotSubmission.objects.create(
+        voter=profile,
+        election=election,
+        vote_content=vote_content,
+        sealed_private_key=get_key_ring().encrypt(private_key_pem),
+    )
+
+
+def has_open_submission(profile, election):
+    """¿El votante ya tiene un voto de esta elección esperando o procesándose?"""
+    return BallotSubmission.objects.filter(
+        voter=profile, election=election, status__in=[BallotSubmission.PENDING, BallotSubmission.PROCESSING]
+    ).exists()
+
+
+def claim_next_submission():
+    """
+    Toma la solicitud pendiente más antigua. Regresa su id o None si la cola está vacía.
+    Sin bloqueos: si otro worker gana la fila, probamos con la siguiente.
+    """
+    candidates = (
+        BallotSubmission.objects.filter(status=BallotSubmission.PENDING)
+        .order_by('id').values_list('id', flat=True)[:10]
+    )
+    for submission_id in candidates:
+        claimed = BallotSubmission.objects.filter(id=submission_id, status=BallotSubmission.PENDING).update(
+            status=BallotSubmission.PROCESSING, started_at=timezone.now()
+        )
+        if claimed:
+            return submission_id
+    return None
+
+
+def _unseal_private_key(submission):
+    try:
+        return get_key_ring().decrypt(bytes(submission.sealed_private_key))
+    except ValueError:
+        # Su llave AES ya salió del llavero: el votante tiene que volver a enviar su voto
+        raise BallotRejected("No se pudo leer tu llave privada en la cola. Vuelve a enviar tu voto.")
+
+
+def process_submission(submission_id):
+    """Firma, verifica, cifra y guarda una solicitud ya reclamada."""
+    submission = BallotSubmission.objects.select_related('voter__user', 'election').get(id=submission_id)
+    profile = submission.voter
+    election = submission.election
+    timings = {
+        'queue_ms': (submission.started_at - submission.created_at).total_seconds() * 1000,
+    }
+
+    try:
+        if has_voted(profile, election):
+            raise AlreadyVoted()
+
+        private_key_pem = _unseal_private_key(submission)
+        signature, encrypted_vote = seal_ballot(
+            submission.vote_content, private_key_pem, profile.public_key, profile.signature_scheme, timings,
+            cache_key=profile.public_key_cache_key
+        )
+        answers = parse_vote_content(submission.vote_content)
+
+        with transaction.atomic():
+            vote = commit_ballot(
+                profile, election, submission.vote_content, answers, signature, encrypted_vote, timings
+            )
+            submission.vote = vote
+            submission.status = BallotSubmission.DONE
+            _finish(submission, timings)
+
+    except (BallotRejected, ValueError) as e:
+        submission.status = BallotSubmission.FAILED
+        submission.error = str(e)
+        _finish(submission, timings)
+    except Exception as e:
+        submission.status = BallotSubmission.FAILED
+        submission.error = f"Error Criptográfico o de Archivo: {e}"
+        _finish(submission, timings)
+        raise
+
+    return submission
+
+
+def _finish(submission, timings):
+    # La llave privada ya no hace falta: la borramos de la cola.
+    submission.sealed_private_key = b''
+    submission.finished_at = timezone.now()
+    for stage, value in timings.items():
+        setattr(submission, stage, value)
+    submission.save()
+
+
+def reclaim_stale_submissions(older_than_seconds):
+    """
+    Regresa a 'pending' las solicitudes que quedaron en 'processing' porque su
+    worker murió a media tarea. Se llama al arrancar los workers.
+    """
+    limit = timezone.now() - timedelta(seconds=older_than_seconds)
+    return BallotSubmission.objects.filter(
+        status=BallotSubmission.PROCESSING, started_at__lt=limit
+    ).update(status=BallotSubmission.PENDING, started_at=None)
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 3)
+
+
+def queue_stats(sample_size=1000):
+    """Profundidad de la cola y latencias por etapa (promedio, p50, p95) de las últimas solicitudes."""
+    depth = {
+        status: BallotSubmission.objects.filter(status=status).count()
+        for status, label in BallotSubmission.STATUS_CHOICES
+    }
+    rows = list(
+        BallotSubmission.objects.filter(status=BallotSubmission.DONE)
+        .order_by('-id').values_list(*STAGES)[:sample_size]
+    )
+    stages = {}
+    for index, stage in enumerate(STAGES):
+        values = sorted(row[index] for row in rows if row[index] is not None)
+        stages[stage] = {
+            'avg': round(sum(values) / len(values), 3) if values else None,
+            'p50': _percentile(values, 0.50),
+            'p95': _percentile(values, 0.95),
+        }
+    return {'depth': depth, 'sample': len(rows), 'stages': stages}
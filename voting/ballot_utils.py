@@ -0,0 +1,137 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import BallotAnswer, VoteTally
+
+# ---------------------------------------------------------
+# CONFIGURACIÓN DE LA BOLETA
+# ---------------------------------------------------------
+# Las preguntas, sus opciones válidas y su texto legible ahora son de cada elección
+# (Election.questions; ver Election.get_label() y Election.is_valid_answer()).
+
+# Partes del texto del voto que no son respuestas
+HEADER_KEYS = ('USUARIO', 'ELECCION')
+
+
+# ---------------------------------------------------------
+# FUNCIONES AUXILIARES (Procesamiento de Texto)
+# ---------------------------------------------------------
+
+def parse_vote_content(vote_option):
+    """
+    Convierte el texto crudo del voto (ej: 'USUARIO:x|ELECCION:e|P1:ALTO|P2:FACIL')
+    en un diccionario de Python fácil de leer: {'P1': 'ALTO', 'P2': 'FACIL'}.
+    """
+    results = {}
+    for part in vote_option.split('|'):
+        key, separator, value = part.partition(':')
+        if separator and key not in HEADER_KEYS:
+            results[key] = value
+    return results
+
+def build_vote_content(username, answers, election):
+    """
+    Arma el texto canónico que se firma: 'USUARIO:x|ELECCION:e|P1:ALTO|P2:FACIL|...'.
+    La elección va dentro de lo firmado: una firma no sirve para votar en otra elección.
+    ¡No cambiar el formato! Las firmas ya guardadas dependen de este texto exacto
+    (las papeletas anteriores a las elecciones no llevan 'ELECCION:' y se verifican con su texto guardado).
+    """
+    parts = [f"USUARIO:{username}", f"ELECCION:{election.slug}"]
+    parts += [f"{key}:{answers[key]}" for key in election.question_keys]
+    return "|".join(parts)
+
+
+# ---------------------------------------------------------
+# RESPUESTAS ESTRUCTURADAS (BallotAnswer)
+# ---------------------------------------------------------
+
+def record_ballot_answers(vote, answers):
+    """Guarda las respuestas del voto ya separadas (una fila por pregunta, un solo INSERT)."""
+    BallotAnswer.objects.bulk_create(
+        BallotAnswer(election_id=vote.election_id, vote=vote, question=question, answer=answer)
+        for question, answer in answers.items()
+    )
+
+def get_answers_for_votes(vote_ids):
+    """
+    Trae las respuestas de varios votos en UNA consulta.
+    Regresa: {vote_id: {'P1': 'ALTO', 'P2': ...}, ...}
+    """
+    answers = {vote_id: {} for vote_id in vote_ids}
+    rows = BallotAnswer.objects.filter(vote_id__in=vote_ids).values_list('vote_id', 'question', 'answer')
+    for vote_id, question, answer in rows:
+        answers[vote_id][question] = answer
+    return answers
+
+
+# ---------------------------------------------------------
+# CONTEO INCREMENTAL (VoteTally)
+# ---------------------------------------------------------
+
+def record_vote_tally(election, answers):
+    """
+    Suma +1 a los contadores de cada respuesta del voto ({'P1': 'ALTO', ...}).
+    Debe llamarse DENTRO del transaction.atomic() que guarda el Vote,
+    así el contador y la papeleta se confirman (o se revierten) juntos.
+    """
+    add_to_tally(election, {(question, option): 1 for question, option in answers.items()})
+
+
+def add_to_tally(election, counts):
+    """
+    Suma cantidades arbitrarias a los contadores de una elección: {('P1', 'ALTO'): 3, ...}.
+    La usan el voto individual (+1) y las cargas masivas (un UPDATE por opción, no por voto).
+    """
+    for (question, option), amount in counts.items():
+        tally = VoteTally.objects.filter(election=election, question=question, option=option)
+        # UPDATE ... SET count = count + N: lo resuelve la base de datos,
+        # sin leer el valor en Python (sin carreras entre procesos).
+        updated = tally.update(count=F('count') + amount)
+        if updated:
+            continue
+
+        # Primera vez que aparece esta opción: creamos su contador.
+        # El savepoint permite reintentar si otro proceso lo creó al mismo tiempo.
+        try:
+            with transaction.atomic():
+                VoteTally.objects.create(election=election, question=question, option=option, count=amount)
+        except IntegrityError:
+            tally.update(count=F('count') + amount)
+
+
+def get_tally_results(election):
+    """
+    Lee los contadores de UNA elección en una sola consulta y los agrupa por pregunta.
+    Regresa: {'P1': [('ALTO', 3), ('BAJO', 1)], 'P2': [...], ...}
+    """
+    rows = VoteTally.objects.filter(election=election).values_list('question', 'option', 'count')
+    return _group_tally_rows(election, rows)
+
+
+async def aget_tally_results(election):
+    """get_tally_results con el ORM asíncrono (vistas async bajo ASGI)."""
+    rows = VoteTally.objects.filter(election=election).values_list('question', 'option', 'count')
+    return _group_tally_rows(election, [row async for row in rows])
+
+
+def _group_tally_rows(election, rows):
+    results = {key: [] for key in election.question_keys}
+    for question, option, count in rows:
+        results.setdefault(question, []).append((option, count))
+    return results
+
+
+def count_votes_from_ballots(election):
+    """
+    Recalcula los conteos de una elección directamente de las respuestas guardadas
+    con un solo GROUP BY sobre el índice (election, question, answer).
+    Es la fuente de verdad para reconstruir o auditar la tabla VoteTally.
+    Regresa un Counter con llaves (pregunta, opción).
+    """
+    rows = (
+        BallotAnswer.objects.filter(election=election)
+        .values_list('question', 'answer').annotate(total=Count('id')).order_by()
+    )
+    return Counter({(question, answer): total for question, answer, total in rows})
@@ -0,0 +1,234 @@
+import platform
+import random
+import statistics
+import time
+from collections import Counter
+
+import django
+from django.db import connection, transaction
+
+from .ballot_utils import count_votes_from_ballots, parse_vote_content
+from .crypto_utils import (
+    DEFAULT_SIGNATURE_SCHEME, encrypt_vote_aes, generate_rsa_keys, sign_vote, verify_signature,
+)
+from .elections import get_election_or_404
+from .homomorphic import (
+    add_ballots, decrypt_counts, empty_aggregate, generate_tally_keys, load_public_key, load_secret_key,
+)
+from .metrics import discard_request, span, start_request
+from .models import Election, Vote
+from .results_cache import build_results_snapshot
+from .seeding import parse_distribution, seed_electorate
+
+# ---------------------------------------------------------
+# MICRO-BENCHMARKS DEL FLUJO DE VOTACIÓN
+# ---------------------------------------------------------
+# Mide las rutas calientes (llaves, firma, verificación, cifrado, parseo y
+# conteo del tablero) y regresa un diccionario serializable a JSON:
+#   {'meta': {...}, 'results': {'crypto.sign_vote': {'mean_ms': ..., 'p50_ms': ..., ...}, ...}}
+# Dos corridas se comparan con compare_results() para detectar regresiones.
+
+# Mismo formato que ballot_utils.build_vote_content()
+SAMPLE_VOTE = 'USUARIO:bench@ejemplo.com|ELECCION:bench|P1:ALTO|P2:FACIL|P3:MUCHO|P4:RAPIDO'
+
+# Spans por muestra al medir el costo de la instrumentación (uno solo no se alcanza a medir)
+SPANS_PER_SAMPLE = 1000
+
+# Tamaño de lote al generar papeletas sintéticas (acota la memoria con 1M de filas)
+SYNTHETIC_BATCH_SIZE = 5000
+
+# Papeletas cifradas REALES que se repiten en ciclo para formar N papeletas en el conteo cifrado
+# (cifrar 100k papeletas tardaría más que lo que se quiere medir, que es sumar y descifrar)
+HOMOMORPHIC_POOL_SIZE = 64
+
+
+class _Rollback(Exception):
+    """Se lanza para deshacer las papeletas sintéticas al terminar."""
+
+
+def summarize(samples_ms):
+    """Resumen de una lista de tiempos (ms): n, promedio, p50, p95, mínimo y máximo."""
+    ordered = sorted(samples_ms)
+    p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+    return {
+        'n': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered), 4),
+        'p50_ms': round(statistics.median(ordered), 4),
+        'p95_ms': round(ordered[p95_index], 4),
+        'min_ms': round(ordered[0], 4),
+        'max_ms': round(ordered[-1], 4),
+    }
+
+
+def measure(func, iterations, warmup=1):
+    """Ejecuta func() 'iterations' veces (tras 'warmup' llamadas sin medir) y resume los tiempos."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def run_crypto_benchmarks(iterations=50, keygen_iterations=5, scheme=DEFAULT_SIGNATURE_SCHEME):
+    """Tiempos de las funciones criptográficas y de parseo sobre una papeleta de ejemplo."""
+    public_key_pem, private_key_pem = generate_rsa_keys()
+    signature = sign_vote(SAMPLE_VOTE, private_key_pem, scheme)
+
+    return {
+        'crypto.generate_rsa_keys': measure(generate_rsa_keys, keygen_iterations, warmup=0),
+        'crypto.sign_vote': measure(lambda: sign_vote(SAMPLE_VOTE, private_key_pem, scheme), iterations),
+        'crypto.verify_signature': measure(
+            lambda: verify_signature(SAMPLE_VOTE, signature, public_key_pem, scheme), iterations
+        ),
+        'crypto.verify_signature_cached': measure(
+            lambda: verify_signature(SAMPLE_VOTE, signature, public_key_pem, scheme, cache_key=('bench', scheme)),
+            iterations
+        ),
+        'crypto.encrypt_vote_aes': measure(lambda: encrypt_vote_aes(SAMPLE_VOTE), iterations * 10),
+        'parse.parse_vote_content': measure(lambda: parse_vote_content(SAMPLE_VOTE), iterations * 100),
+    }
+
+
+def _spans():
+    for _ in range(SPANS_PER_SAMPLE):
+        with span('bench'):
+            pass
+
+
+def _sampled_spans():
+    recorder, token = start_request(1.0)
+    try:
+        _spans()
+    finally:
+        discard_request(token)
+
+
+def run_metrics_benchmarks(iterations=50):
+    """Costo de SPANS_PER_SAMPLE spans con la petición sin muestrear (lo normal) y muestreada."""
+    return {
+        f'metrics.span_unsampled_x{SPANS_PER_SAMPLE}': measure(_spans, iterations),
+        f'metrics.span_sampled_x{SPANS_PER_SAMPLE}': measure(_sampled_spans, iterations),
+    }
+
+
+def run_homomorphic_benchmarks(sizes, iterations=50, seed=0):
+    """
+    Conteo cifrado aditivo con la boleta de la elección predeterminada: cifrar una papeleta,
+    sumarla al agregado (un voto) y, por tamaño, sumar N papeletas en lote y descifrar el total
+    (una operación por opción). Sin base de datos: solo la aritmética.
+    """
+    slots = get_election_or_404().tally_slots
+    public_key_pem, secret_key_pem = generate_tally_keys()
+    public_key = load_public_key(public_key_pem)
+    secret = load_secret_key(secret_key_pem)
+    rng = random.Random(seed)
+
+    def random_bits():
+        chosen = {}
+        for question, option in slots:
+            chosen.setdefault(question, []).append(option)
+        picks = {question: rng.choice(options) for question, options in chosen.items()}
+        return [int(picks[question] == option) for question, option in slots]
+
+    pool = [public_key.encrypt_bits(random_bits()) for _ in range(HOMOMORPHIC_POOL_SIZE)]
+    single = empty_aggregate(len(slots))
+    results = {
+        'homomorphic.encrypt_ballot': measure(lambda: public_key.encrypt_bits(random_bits()), iterations),
+        'homomorphic.add_one_ballot': measure(lambda: add_ballots(single, pool[:1]), iterations * 10),
+    }
+    for size in sizes:
+        ballots = [pool[index % HOMOMORPHIC_POOL_SIZE] for index in range(size)]
+        aggregate = add_ballots(empty_aggregate(len(slots)), ballots)
+        # La suma en lote es O(N): con tamaños grandes basta una pasada
+        results[f'homomorphic.aggregate_batch@{size}'] = measure(
+            lambda: add_ballots(empty_aggregate(len(slots)), ballots), iterations if size <= 1000 else 1, warmup=0
+        )
+        results[f'homomorphic.decrypt_tally@{size}'] = measure(
+            lambda: decrypt_counts(secret, aggregate, size), 3, warmup=0
+        )
+    return results
+
+
+def create_synthetic_ballots(size, prefix, seed=0):
+    """
+    Crea una elección de prueba (con la boleta de la predeterminada) y le inserta 'size'
+    papeletas sintéticas (usuario, perfil, padrón, voto, respuestas y contadores) con
+    bulk_create por lotes. Las firmas y cifrados son de relleno: solo se mide el conteo.
+    Regresa la elección.
+    """
+    election = Election.objects.create(slug=prefix, name=prefix, questions=get_election_or_404().questions)
+    seed_electorate(
+        election, size, turnout=1.0, weights=parse_distribution(None, election), rng=random.Random(seed),
+        prefix=prefix, password_hash='!', batch_size=SYNTHETIC_BATCH_SIZE,
+    )
+    return election
+
+
+def _scan_and_parse(election):
+    # Conteo "a la antigua": leer todas las papeletas y parsear su texto
+    counts = Counter()
+    votes = Vote.objects.filter(election=election).values_list('option', flat=True)
+    for option in votes.iterator(chunk_size=SYNTHETIC_BATCH_SIZE):
+        counts.update(parse_vote_content(option).items())
+    return counts
+
+
+def run_aggregation_benchmarks(sizes, iterations=5):
+    """
+    Mide el conteo del tablero con N papeletas sintéticas por tamaño.
+    Todo corre dentro de una transacción que se revierte: la base de datos queda igual.
+    """
+    results = {}
+    for size in sizes:
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                election = create_synthetic_ballots(size, prefix=f'bench-{size}-{int(time.time())}')
+                results[f'aggregation.seed@{size}'] = summarize([(time.perf_counter() - started) * 1000])
+
+                results[f'aggregation.count_votes_from_ballots@{size}'] = measure(
+                    lambda: count_votes_from_ballots(election), iterations
+                )
+                results[f'aggregation.build_results_snapshot@{size}'] = measure(
+                    lambda: build_results_snapshot(election, 0), iterations
+                )
+                # El escaneo del texto es O(N) en Python: con tamaños grandes basta una pasada
+                results[f'aggregation.scan_and_parse@{size}'] = measure(
+                    lambda: _scan_and_parse(election), iterations if size <= 100000 else 1, warmup=0
+                )
+                raise _Rollback()
+        except _Rollback:
+            pass
+    return results
+
+
+def benchmark_metadata(**extra):
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+        **extra,
+    }
+
+
+def compare_results(current, baseline, threshold, metric='p50_ms'):
+    """
+    Compara dos corridas (el bloque 'results' de cada JSON).
+    Regresa una lista de (nombre, antes, ahora, cambio) para cada medición que empeoró
+    más que 'threshold' (ej. 0.2 = 20 % más lenta). Las que no existen en ambas se ignoran.
+    """
+    regressions = []
+    for name, row in current.items():
+        before = baseline.get(name, {}).get(metric)
+        after = row.get(metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        if change > threshold:
+            regressions.append((name, before, after, round(change, 4)))
+    return regressions
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .results_cache import get_results_snapshot, get_results_version
+
+# ---------------------------------------------------------
+# DIFUSIÓN DE RESULTADOS EN VIVO (Server-Sent Events)
+# ---------------------------------------------------------
+# Cada tablero abierto se "suscribe" a UNA elección y recibe sus eventos:
+#   - 'snapshot': la foto completa de resultados (al conectarse o al resincronizar).
+#   - 'delta':    un voto nuevo (+1 en cada respuesta), sin volver a pedir todo.
+#
+# Un suscriptor es solo una asyncio.Queue pequeña: miles de tableros inactivos
+# cuestan unos cuantos KB cada uno y ningún hilo.
+#
+# El "backend" se elige con settings.RESULTS_BROADCAST_BACKEND:
+#   - InProcessBroadcast:   difunde dentro del mismo proceso (un worker ASGI).
+#   - CachePollingBroadcast: sustituto local de un broker; un solo sondeo por proceso
+#     revisa la versión de resultados en la caché compartida, así los votos que
+#     entran por OTROS procesos (p. ej. workers WSGI) también llegan a los tableros.
+
+
+class InProcessBroadcast:
+    """Difusión en memoria: publish() puede llamarse desde cualquier hilo."""
+
+    # Eventos pendientes por suscriptor antes de considerarlo "atrasado"
+    queue_size = 32
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def _deliver(self, queue, event):
+        # Se ejecuta dentro del event loop del suscriptor.
+        if queue.full():
+            # Suscriptor lento: en lugar de acumular deltas, le pedimos resincronizar.
+            while not queue.empty():
+                queue.get_nowait()
+            event = {'type': 'resync'}
+        queue.put_nowait(event)
+
+    def publish(self, event):
+        """Envía un evento a los suscriptores de su elección (seguro desde hilos síncronos)."""
+        with self._lock:
+            subscribers = [subscriber for subscriber in self._subscribers if subscriber[2] == event['election']]
+        for loop, queue, slug in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                # El loop ya se cerró: el suscriptor se irá en su 'finally'
+                pass
+
+    def subscribe(self, election):
+        """Registra un suscriptor de la elección en el loop actual; regresa (loop, cola, slug)."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.queue_size), election.slug)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+
+class CachePollingBroadcast(InProcessBroadcast):
+    """
+    Sustituto local de un broker: no depende de que el voto entre por este proceso.
+    Una sola tarea por proceso y elección revisa la versión de resultados y, si cambió,
+    manda la foto completa a los suscriptores de esa elección.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._pollers = {}
+
+    def publish(self, event):
+        # Los deltas locales se ignoran: el sondeo manda fotos completas,
+        # y mezclar ambos podría contar un voto dos veces.
+        pass
+
+    def subscribe(self, election):
+        subscriber = super().subscribe(election)
+        poller = self._pollers.get(election.slug)
+        if poller is None or poller.done():
+            self._pollers[election.slug] = asyncio.get_running_loop().create_task(self._poll(election))
+        return subscriber
+
+    def _has_subscribers(self, slug):
+        with self._lock:
+            return any(subscriber[2] == slug for subscriber in self._subscribers)
+
+    async def _poll(self, election):
+        version = await sync_to_async(get_results_version)(election.slug)
+        while self._has_subscribers(election.slug):
+            await asyncio.sleep(settings.RESULTS_STREAM_POLL_INTERVAL)
+            current = await sync_to_async(get_results_version)(election.slug)
+            if current != version:
+                version = current
+                snapshot = await sync_to_async(get_results_snapshot)(election)
+                super().publish({'type': 'snapshot', 'election': election.slug, 'data': snapshot})
+
+
+_broadcast = None
+
+def get_broadcast():
+    """Instancia única (por proceso) del backend configurado."""
+    global _broadcast
+    if _broadcast is None:
+        _broadcast = import_string(settings.RESULTS_BROADCAST_BACKEND)()
+    return _broadcast
+
+
+def publish_vote_delta(election, answers):
+    """Avisa a los tableros de la elección que entró un voto. Llamar en transaction.on_commit()."""
+    get_broadcast().publish({
+        'type': 'delta',
+        'election': election.slug,
+        'data': {
+            'total_votes': 1,
+            'answers': {
+                key: {'code': value, 'label': election.get_label(key, value)}
+                for key, value in answers.items()
+            },
+        },
+    })
@@ -0,0 +1,77 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from django.conf import settings
+
+# ---------------------------------------------------------
+# PROCESOS PARA LA CRIPTOGRAFÍA DE LAS VISTAS ASÍNCRONAS
+# ---------------------------------------------------------
+# Bajo ASGI un solo event loop atiende a todas las peticiones del proceso: una firma
+# RSA (decenas de ms de CPU) dentro de una vista async detendría a todas las demás.
+# Las vistas async mandan firma, verificación, cifrado y huellas a un ProcessPoolExecutor
+# acotado (CRYPTO_POOL_WORKERS procesos) con run_in_executor y esperan sin bloquear.
+# Si ya hay CRYPTO_POOL_MAX_PENDING operaciones esperando, se rechaza (CryptoPoolBusy -> 503)
+# en lugar de acumular memoria y latencia sin límite.
+
+_pool = None
+_lock = threading.Lock()
+_pending = 0
+
+
+class CryptoPoolBusy(Exception):
+    """Demasiadas operaciones criptográficas en espera: el votante debe reintentar."""
+
+
+def _init_worker():
+    # Cada proceso hijo arranca Django: llavero AES y esquemas de firma (VotingConfig.ready)
+    import django
+    django.setup()
+
+
+def get_crypto_pool():
+    """Pool de procesos del servidor (uno por proceso worker); None = hilos (CRYPTO_POOL_WORKERS=0)."""
+    global _pool
+    if settings.CRYPTO_POOL_WORKERS <= 0:
+        return None
+    with _lock:
+        if _pool is None:
+            # 'spawn': un fork de un proceso con event loop e hilos puede heredar candados tomados.
+            # Los hijos reimportan el script principal: gunicorn, uvicorn y manage.py lo protegen
+            # con if __name__ == '__main__'; un script propio que use estas vistas debe hacer lo mismo.
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.CRYPTO_POOL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def _discard_pool(pool):
+    # Un hijo murió (OOM, kill): el pool ya no sirve; el siguiente voto crea otro
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_crypto(func, *args):
+    """Ejecuta func(*args) en el pool y espera el resultado sin bloquear el event loop."""
+    global _pending
+    with _lock:
+        if _pending >= settings.CRYPTO_POOL_MAX_PENDING:
+            raise CryptoPoolBusy()
+        _pending += 1
+    pool = get_crypto_pool()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, partial(func, *args))
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    finally:
+        with _lock:
+            _pending -= 1
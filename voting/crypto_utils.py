@@ -1,34 +1,209 @@
-from Crypto.PublicKey import RSA
-from Crypto.Signature import pkcs1_15
+import base64
+import re
+import threading
+from collections import OrderedDict
+
+from Crypto.PublicKey import RSA, ECC
+from Crypto.Signature import pkcs1_15, pss, eddsa
 from Crypto.Hash import SHA256
 from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
+from Crypto.Util.Padding import unpad
 from Crypto.Random import get_random_bytes
 
+from .metrics import span
+
 # ---------------------------------------------------------
 # CONFIGURACIÓN AES (Confidencialidad - El "Candado")
 # ---------------------------------------------------------
-# Generamos una clave secreta aleatoria.
-# Piensa en esto como la llave única de un candado que usaremos para cerrar los votos.
-AES_KEY = get_random_bytes(32) 
+# Las llaves AES viven en un "llavero" (AESKeyRing): cada llave tiene un
+# identificador (kid) que viaja dentro del voto cifrado ("sobre").
+# Así todos los procesos cifran con la MISMA llave activa, y al rotarla los votos
+# viejos se siguen abriendo con la llave que dice su sobre.
+# El llavero se configura al arrancar Django (voting/key_ring.py); este módulo
+# no importa Django para poder usarse dentro de procesos hijos.
+#
+# Formato binario del sobre (se guarda tal cual en un BinaryField):
+#   [versión 1 byte][largo del kid 1 byte][kid][...]
+#   - versión 1 (AES-GCM): nonce (12) + etiqueta (16) + cifrado. La cabecera va como
+#     dato autenticado: si alguien cambia un solo bit (o el kid), descifrar falla.
+#   - versión 0 (AES-CBC): IV (16) + cifrado con relleno PKCS#7. Solo votos anteriores
+#     a GCM (convertidos por la migración 0011); ya no se escribe.
+# También se aceptan los sobres de texto anteriores ("<kid>:<iv hex><cifrado hex>").
 BLOCK_SIZE = AES.block_size
+AES_KEY_SIZE = 32
+KEY_ID_SEPARATOR = ':'
+KEY_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,32}$')
+
+ENVELOPE_CBC = 0
+ENVELOPE_GCM = 1
+GCM_NONCE_SIZE = 12
+GCM_TAG_SIZE = 16
+# "kid" reservado (no cumple KEY_ID_PATTERN) para un sobre binario completo escrito en hex
+RAW_ENVELOPE_MARKER = '~'
+
+
+def _envelope_header(version, key_id):
+    kid = key_id.encode('ascii')
+    return bytes((version, len(kid))) + kid
+
+
+def split_envelope(envelope):
+    """Separa un sobre binario en (versión, kid, resto). Lanza ValueError si está truncado."""
+    data = bytes(envelope)
+    if len(data) < 2 or len(data) < 2 + data[1]:
+        raise ValueError("Sobre cifrado truncado.")
+    header_size = 2 + data[1]
+    return data[0], data[2:header_size].decode('ascii'), data[:header_size], data[header_size:]
+
+
+def text_envelope_to_binary(text):
+    """
+    Convierte un sobre de texto (CBC en hex, con o sin kid) al formato binario versión 0.
+    Sin pérdida y sin necesitar la llave: solo cambia la representación (la mitad de bytes).
+    """
+    key_id, separator, payload = text.partition(KEY_ID_SEPARATOR)
+    if key_id == RAW_ENVELOPE_MARKER:
+        return bytes.fromhex(payload)
+    if not separator:
+        key_id, payload = '', text
+    return _envelope_header(ENVELOPE_CBC, key_id) + bytes.fromhex(payload)
+
+
+def binary_envelope_to_text(envelope):
+    """
+    Inverso de text_envelope_to_binary() (para revertir la migración 0011).
+    Los sobres GCM no existen en el formato de texto: se guardan como '~:<hex del sobre>'
+    para no perderlos si la migración se vuelve a aplicar.
+    """
+    version, key_id, header, body = split_envelope(envelope)
+    if version != ENVELOPE_CBC:
+        return f"{RAW_ENVELOPE_MARKER}{KEY_ID_SEPARATOR}{bytes(envelope).hex()}"
+    return f"{key_id}{KEY_ID_SEPARATOR}{body.hex()}" if key_id else body.hex()
+
+
+def to_hex(value):
+    """Representación hexadecimal para mostrar/exportar firmas y sobres (bytes, memoryview o texto)."""
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    return bytes(value).hex()
+
+
+class AESKeyRing:
+    """Llaves AES-256 por identificador: cifra con la activa y descifra con la del sobre."""
+
+    def __init__(self, keys, active_key_id):
+        for key_id, key in keys.items():
+            if not KEY_ID_PATTERN.match(key_id):
+                raise ValueError(f"Identificador de llave AES inválido: '{key_id}'")
+            if len(key) != AES_KEY_SIZE:
+                raise ValueError(f"La llave AES '{key_id}' debe medir {AES_KEY_SIZE} bytes.")
+        if active_key_id not in keys:
+            raise ValueError(f"La llave AES activa '{active_key_id}' no está en el llavero.")
+        self.keys = dict(keys)
+        self.active_key_id = active_key_id
+
+    @classmethod
+    def from_spec(cls, spec, active_key_id=None):
+        """
+        Lee 'k2:<base64>,k1:<base64>' (formato de la variable BALLOT_AES_KEYS).
+        Si no se indica la activa, se usa la primera.
+        """
+        keys = {}
+        for item in filter(None, (part.strip() for part in spec.split(','))):
+            key_id, _, encoded = item.partition(KEY_ID_SEPARATOR)
+            keys[key_id.strip()] = base64.b64decode(encoded.strip())
+        if not keys:
+            raise ValueError("BALLOT_AES_KEYS no contiene llaves.")
+        return cls(keys, active_key_id or next(iter(keys)))
+
+    def export(self):
+        """Representación simple (dict) para mandar el llavero a procesos hijos o guardarlo."""
+        return {
+            'active': self.active_key_id,
+            'keys': {key_id: base64.b64encode(key).decode('ascii') for key_id, key in self.keys.items()},
+        }
+
+    @classmethod
+    def from_export(cls, data):
+        return cls({key_id: base64.b64decode(key) for key_id, key in data['keys'].items()}, data['active'])
+
+    def _key(self, key_id):
+        if not key_id:
+            raise ValueError("Voto cifrado sin identificador de llave (formato anterior al llavero).")
+        if key_id not in self.keys:
+            raise ValueError(f"La llave AES '{key_id}' no está en el llavero.")
+        return self.keys[key_id]
+
+    def encrypt(self, plaintext):
+        """Cifra con AES-256-GCM y regresa el sobre binario (versión 1)."""
+        header = _envelope_header(ENVELOPE_GCM, self.active_key_id)
+        cipher = AES.new(self.keys[self.active_key_id], AES.MODE_GCM, nonce=get_random_bytes(GCM_NONCE_SIZE))
+        # La cabecera (versión + kid) queda autenticada junto con el voto
+        cipher.update(header)
+        ciphertext, tag = cipher.encrypt_and_digest(plaintext.encode('utf-8'))
+        return header + cipher.nonce + tag + ciphertext
+
+    def decrypt(self, envelope):
+        """Abre un sobre (binario GCM/CBC o texto anterior). Lanza ValueError si no se puede."""
+        if isinstance(envelope, str):
+            envelope = text_envelope_to_binary(envelope)
+        version, key_id, header, body = split_envelope(envelope)
+        key = self._key(key_id)
+
+        if version == ENVELOPE_GCM:
+            nonce = body[:GCM_NONCE_SIZE]
+            tag = body[GCM_NONCE_SIZE:GCM_NONCE_SIZE + GCM_TAG_SIZE]
+            cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+            cipher.update(header)
+            # Lanza ValueError si el sobre fue alterado
+            return cipher.decrypt_and_verify(body[GCM_NONCE_SIZE + GCM_TAG_SIZE:], tag).decode('utf-8')
+
+        if version == ENVELOPE_CBC:
+            iv, ciphertext = body[:BLOCK_SIZE], body[BLOCK_SIZE:]
+            cipher = AES.new(key, AES.MODE_CBC, iv=iv)
+            return unpad(cipher.decrypt(ciphertext), BLOCK_SIZE).decode('utf-8')
+
+        raise ValueError(f"Versión de sobre cifrado desconocida: {version}")
+
+
+def generate_aes_key():
+    """Llave AES-256 nueva (para rotar)."""
+    return get_random_bytes(AES_KEY_SIZE)
+
+
+_key_ring = None
+
+def set_key_ring(key_ring):
+    global _key_ring
+    _key_ring = key_ring
+
+def has_key_ring():
+    return _key_ring is not None
+
+def get_key_ring():
+    if _key_ring is None:
+        raise RuntimeError(
+            "El llavero AES no está configurado: define BALLOT_AES_KEYS o BALLOT_KEYSTORE_PATH (ver voting/key_ring.py)."
+        )
+    return _key_ring
+
 
 def encrypt_vote_aes(vote_content):
     """
-    Cifra el contenido del voto con AES-256 en modo CBC.
-    Objetivo: Que nadie pueda leer el voto a simple vista (Confidencialidad).
+    Cifra el contenido del voto con AES-256-GCM usando la llave activa del llavero.
+    Objetivo: Que nadie pueda leer el voto a simple vista (Confidencialidad)
+    ni alterarlo sin que se note (el modo GCM incluye una etiqueta de integridad).
+    Regresa el sobre en bytes.
     """
-    # Preparamos el cifrador con nuestra llave maestra
-    cipher = AES.new(AES_KEY, AES.MODE_CBC)
-    
-    # 1. Rellenamos el texto (pad) para que tenga el tamaño correcto.
-    # 2. Lo encriptamos (lo convertimos en ruido ilegible).
-    ciphertext_bytes = cipher.encrypt(pad(vote_content.encode('utf-8'), BLOCK_SIZE))
-    
-    # Retornamos dos cosas pegadas:
-    # - IV (Vector de Inicialización): Un número aleatorio necesario para abrir el candado después.
-    # - Ciphertext: El voto ya encriptado.
-    return cipher.iv.hex() + ciphertext_bytes.hex()
+    with span('crypto.aes_encrypt'):
+        return get_key_ring().encrypt(vote_content)
+
+
+def decrypt_vote_aes(encrypted_vote):
+    """Descifra un voto guardado (para el conteo desde los votos cifrados)."""
+    return get_key_ring().decrypt(encrypted_vote)
 
 # ---------------------------------------------------------
 # FUNCIONES RSA (Autenticación - La "Firma Digital")
@@ -50,50 +225,281 @@ def generate_rsa_keys():
 
     return public_key_pem.decode('utf-8'), private_key_pem.decode('utf-8')
 
-def sign_vote(vote_content, private_key_pem):
+# ---------------------------------------------------------
+# ESQUEMAS DE FIRMA (Registro "enchufable")
+# ---------------------------------------------------------
+# Cada votante firma con UN esquema (guardado en VoterProfile.signature_scheme).
+# - rsa-pkcs1v15: el esquema original del proyecto (RSA 2048 + PKCS#1 v1.5).
+# - rsa-pss:      mismas llaves RSA, pero con el relleno probabilístico PSS.
+# - ed25519:      curva elíptica (EdDSA). Generar llaves y firmar es muchísimo más barato.
+
+RSA_PKCS1V15 = 'rsa-pkcs1v15'
+RSA_PSS = 'rsa-pss'
+ED25519 = 'ed25519'
+
+DEFAULT_SIGNATURE_SCHEME = RSA_PKCS1V15
+
+
+class RSAPKCS1v15Scheme:
+    """Esquema original: RSA 2048 con firmas PKCS#1 v1.5 sobre SHA-256."""
+    name = RSA_PKCS1V15
+    label = 'RSA-2048 PKCS#1 v1.5'
+    key_type = 'rsa'
+
+    def generate_keys(self):
+        return generate_rsa_keys()
+
+    def import_key(self, key_pem):
+        return RSA.import_key(key_pem)
+
+    def public_pem_from_private(self, private_key_pem):
+        return self.import_key(private_key_pem).publickey().export_key('PEM').decode('utf-8')
+
+    def public_der(self, key):
+        # Sirve igual con la llave pública o la privada (de la privada se deriva la pública)
+        return key.publickey().export_key('DER')
+
+    def new_signer(self, key):
+        return pkcs1_15.new(key)
+
+    def sign_with_key(self, vote_content, private_key):
+        h = SHA256.new(vote_content.encode('utf-8'))
+        return self.new_signer(private_key).sign(h)
+
+    def sign(self, vote_content, private_key_pem):
+        return self.sign_with_key(vote_content, self.import_key(private_key_pem))
+
+    def verify_with_key(self, vote_content, signature, public_key):
+        h = SHA256.new(vote_content.encode('utf-8'))
+        # Lanza ValueError si la firma no coincide
+        self.new_signer(public_key).verify(h, signature)
+
+    def verify(self, vote_content, signature, public_key_pem):
+        self.verify_with_key(vote_content, signature, self.import_key(public_key_pem))
+
+
+class RSAPSSScheme(RSAPKCS1v15Scheme):
+    """Mismas llaves RSA que el esquema original, pero con relleno PSS."""
+    name = RSA_PSS
+    label = 'RSA-2048 PSS'
+
+    def new_signer(self, key):
+        return pss.new(key)
+
+
+class Ed25519Scheme:
+    """EdDSA sobre Curve25519 (RFC 8032). Firma el mensaje completo, no un hash previo."""
+    name = ED25519
+    label = 'Ed25519'
+    key_type = 'ed25519'
+
+    def generate_keys(self):
+        key = ECC.generate(curve='ed25519')
+        private_key_pem = key.export_key(format='PEM')
+        public_key_pem = key.public_key().export_key(format='PEM')
+        return public_key_pem, private_key_pem
+
+    def import_key(self, key_pem):
+        key = ECC.import_key(key_pem)
+        if key.curve.lower() != 'ed25519':
+            raise ValueError("La llave no pertenece a la curva Ed25519.")
+        return key
+
+    def public_pem_from_private(self, private_key_pem):
+        return self.import_key(private_key_pem).public_key().export_key(format='PEM')
+
+    def public_der(self, key):
+        return key.public_key().export_key(format='DER')
+
+    def sign_with_key(self, vote_content, private_key):
+        signer = eddsa.new(private_key, 'rfc8032')
+        return signer.sign(vote_content.encode('utf-8'))
+
+    def sign(self, vote_content, private_key_pem):
+        return self.sign_with_key(vote_content, self.import_key(private_key_pem))
+
+    def verify_with_key(self, vote_content, signature, public_key):
+        verifier = eddsa.new(public_key, 'rfc8032')
+        verifier.verify(vote_content.encode('utf-8'), signature)
+
+    def verify(self, vote_content, signature, public_key_pem):
+        self.verify_with_key(vote_content, signature, self.import_key(public_key_pem))
+
+
+# Registro global: nombre del esquema -> implementación
+SIGNATURE_SCHEMES = {}
+
+def register_scheme(scheme):
+    """Agrega un esquema al registro (permite sumar esquemas nuevos sin tocar las vistas)."""
+    SIGNATURE_SCHEMES[scheme.name] = scheme
+    return scheme
+
+register_scheme(RSAPKCS1v15Scheme())
+register_scheme(RSAPSSScheme())
+register_scheme(Ed25519Scheme())
+
+# Opciones para los campos de modelo (name, label)
+SIGNATURE_SCHEME_CHOICES = [(scheme.name, scheme.label) for scheme in SIGNATURE_SCHEMES.values()]
+
+def get_scheme(name=None):
+    """Busca un esquema por nombre. Sin nombre (o None) regresa el esquema original."""
+    try:
+        return SIGNATURE_SCHEMES[name or DEFAULT_SIGNATURE_SCHEME]
+    except KeyError:
+        raise ValueError(f"Esquema de firma desconocido: {name}")
+
+def generate_keys(scheme=None):
+    """Genera (public_key_pem, private_key_pem) para el esquema indicado."""
+    return get_scheme(scheme).generate_keys()
+
+def public_key_from_private(private_key_pem, scheme=None):
+    """Deriva la llave pública (PEM) a partir de la privada. Lanza ValueError si el archivo no sirve."""
+    return get_scheme(scheme).public_pem_from_private(private_key_pem)
+
+# ---------------------------------------------------------
+# LLAVES GENERADAS EN EL NAVEGADOR (WebCrypto)
+# ---------------------------------------------------------
+# En el modo navegador el servidor nunca ve la llave privada: solo recibe la pública
+# (SPKI en PEM) y, al votar, la firma del texto canónico. Los tres esquemas existen en
+# WebCrypto con el mismo formato de firma que PyCryptodome:
+# - Ed25519: firma RFC 8032 de 64 bytes.
+# - RSASSA-PKCS1-v1_5 / RSA-PSS con SHA-256 (PSS con sal de 32 bytes, la de pss.new()).
+
+WEBCRYPTO_SCHEMES = (ED25519, RSA_PKCS1V15, RSA_PSS)
+MIN_CLIENT_RSA_BITS = 2048
+
+def normalize_client_public_key(public_key_pem, scheme):
+    """
+    Valida la llave pública que manda el navegador y la regresa en el PEM de PyCryptodome.
+    Lanza ValueError si el esquema no es de WebCrypto, si la llave no se puede leer,
+    si trae la parte privada o si es una llave RSA de menos de 2048 bits.
+    """
+    if scheme not in WEBCRYPTO_SCHEMES:
+        raise ValueError(f"Esquema no disponible en el navegador: {scheme}")
+    signature_scheme = get_scheme(scheme)
+    try:
+        key = signature_scheme.import_key(public_key_pem)
+    except (ValueError, TypeError, IndexError) as e:
+        raise ValueError("La llave pública enviada no es válida.") from e
+    if key.has_private():
+        raise ValueError("Solo se acepta la llave PÚBLICA: la privada nunca sale del navegador.")
+    if signature_scheme.key_type == 'rsa':
+        if key.size_in_bits() < MIN_CLIENT_RSA_BITS:
+            raise ValueError(f"La llave RSA debe tener al menos {MIN_CLIENT_RSA_BITS} bits.")
+        return key.export_key('PEM').decode('utf-8')
+    return key.export_key(format='PEM')
+
+# ---------------------------------------------------------
+# HUELLAS Y CACHÉ DE LLAVES PÚBLICAS
+# ---------------------------------------------------------
+# Leer un PEM (base64 + DER) en cada verificación es caro. Guardamos los objetos
+# de llave ya leídos en una caché LRU acotada, indexada por (id del perfil, huella).
+# Si el votante cambia de llave, cambia la huella y la entrada vieja simplemente envejece.
+
+def key_fingerprint(key, scheme=None):
+    """Huella SHA-256 (hex) de la llave pública en formato DER. Acepta la llave pública o la privada."""
+    return SHA256.new(get_scheme(scheme).public_der(key)).hexdigest()
+
+def public_key_fingerprint(public_key_pem, scheme=None):
+    """Huella de una llave pública en PEM (la que se guarda en VoterProfile)."""
+    return key_fingerprint(get_scheme(scheme).import_key(public_key_pem), scheme)
+
+def private_key_fingerprint(private_key_pem, scheme=None):
+    """Huella de la llave pública derivada de una privada. Lanza ValueError si el archivo no sirve."""
+    return key_fingerprint(get_scheme(scheme).import_key(private_key_pem), scheme)
+
+
+class PublicKeyCache:
+    """Caché LRU (menos usado recientemente) de llaves públicas ya leídas, segura entre hilos."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key, public_key_pem, scheme=None):
+        with self._lock:
+            key = self._keys.get(cache_key)
+            if key is not None:
+                self._keys.move_to_end(cache_key)
+                self.hits += 1
+                return key
+            self.misses += 1
+
+        # Leemos el PEM fuera del candado (es la parte lenta)
+        key = get_scheme(scheme).import_key(public_key_pem)
+        with self._lock:
+            self._keys[cache_key] = key
+            self._keys.move_to_end(cache_key)
+            while len(self._keys) > self.maxsize:
+                self._keys.popitem(last=False)
+        return key
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._keys),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else None,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self.hits = self.misses = 0
+
+
+# Caché única por proceso
+PUBLIC_KEY_CACHE = PublicKeyCache()
+
+
+def sign_vote(vote_content, private_key_pem, scheme=None):
     """
     Firma el voto digitalmente.
     Objetivo: Garantizar que el voto vino de este usuario y no fue modificado (No Repudio).
     """
     try:
         # 1. Cargamos la llave privada del usuario (su "bolígrafo" digital)
-        private_key = RSA.import_key(private_key_pem)
-        
         # 2. Creamos un HASH (una huella digital única) del contenido del voto.
-        # Si el voto cambia aunque sea una letra, este hash cambia totalmente.
-        h = SHA256.new(vote_content.encode('utf-8'))
-        
-        # 3. Firmamos ese hash con la llave privada.
-        signer = pkcs1_15.new(private_key)
-        signature = signer.sign(h)
-        
-        return signature.hex()
+        #    Si el voto cambia aunque sea una letra, este hash cambia totalmente.
+        # 3. Firmamos con la llave privada, según el esquema del votante.
+        # La firma se regresa en bytes (así se guarda); to_hex() la muestra como texto.
+        # Leer la llave y firmar se miden por separado (con RSA, leer el PEM no es gratis).
+        signature_scheme = get_scheme(scheme)
+        with span('crypto.import_private_key'):
+            private_key = signature_scheme.import_key(private_key_pem)
+        with span('crypto.sign'):
+            return signature_scheme.sign_with_key(vote_content, private_key)
     
-    except ValueError as e:
+    except (ValueError, TypeError, IndexError) as e:
         raise ValueError("Error al cargar o usar la llave privada. Asegúrese de que el archivo es correcto.") from e
 
-def verify_signature(vote_content, signature_hex, public_key_pem):
+def verify_signature(vote_content, signature, public_key_pem, scheme=None, cache_key=None):
     """
-    Verifica la firma.
+    Verifica la firma (en bytes, o en hexadecimal como en los comprobantes).
     Objetivo: El sistema comprueba si la firma es válida usando la llave pública.
+    Con 'cache_key' (ej. (profile_id, huella)) la llave ya leída sale de PUBLIC_KEY_CACHE.
     """
     try:
-        # 1. Cargamos la Llave Pública del votante (que tenemos guardada en la BD)
-        public_key = RSA.import_key(public_key_pem)
+        # 1. Si la firma llega en hexadecimal la convertimos a bytes reales
+        signature = bytes.fromhex(signature) if isinstance(signature, str) else bytes(signature)
 
-        # 2. Volvemos a calcular el Hash del voto que estamos viendo
-        h = SHA256.new(vote_content.encode('utf-8'))
-        
-        # 3. Convertimos la firma que recibimos de hexadecimal a bytes reales
-        signature = bytes.fromhex(signature_hex)
-
-        # 4. El momento de la verdad:
-        # Comparamos el hash del voto actual con la firma descifrada.
-        # Si coinciden, es auténtico. Si no, alguien manipuló el voto.
-        verifier = pkcs1_15.new(public_key)
-        verifier.verify(h, signature)
+        # 2. El momento de la verdad:
+        # El esquema carga la Llave Pública del votante, recalcula el hash del voto
+        # y lo compara contra la firma. Si no coincide, alguien manipuló el voto.
+        with span('crypto.import_public_key'):
+            if cache_key is None:
+                public_key = get_scheme(scheme).import_key(public_key_pem)
+            else:
+                public_key = PUBLIC_KEY_CACHE.get(cache_key, public_key_pem, scheme)
+        with span('crypto.verify'):
+            get_scheme(scheme).verify_with_key(vote_content, signature, public_key)
         
         return True # ¡Firma válida!
 
-    except (ValueError, TypeError):
-        return False # Firma inválida o corrupta
\ No newline at end of file
+    except (ValueError, TypeError, IndexError):
+        return False # Firma inválida o corrupta
@@ -0,0 +1,119 @@
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+# ---------------------------------------------------------
+# LECTURAS EN RÉPLICA (DATABASE_REPLICA_URL)
+# ---------------------------------------------------------
+# Tablero, auditoría, exportaciones y "mis votos" solo leen, pero compartían la base
+# (y sus conexiones) con la ruta del voto. Con una réplica configurada, las vistas
+# marcadas con @replica_reads leen de ella; TODO lo demás, y cualquier escritura,
+# sigue en 'default'.
+#
+# Leer-lo-que-escribí: justo después de votar (o de registrar la llave) la réplica
+# puede no tener aún ese cambio. Esas vistas marcan la sesión (pin_primary) y, durante
+# DATABASE_REPLICA_PIN_SECONDS, las vistas de réplica de ese usuario leen del primario.
+
+REPLICA_ALIAS = 'replica'
+PIN_SESSION_KEY = 'primary_pinned_until'
+
+# Solo las vistas con @replica_reads activan la réplica (por petición, también en vistas async)
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def reading_from_replica():
+    """¿Las lecturas de esta petición van a la réplica?"""
+    return _use_replica.get() and replica_configured()
+
+
+class ReplicaRouter:
+    """Lecturas marcadas -> réplica; escrituras, migraciones y el resto -> 'default'."""
+
+    def db_for_read(self, model, **hints):
+        return REPLICA_ALIAS if reading_from_replica() else 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Son la misma base (una es copia de la otra)
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # El esquema llega a la réplica por la replicación, no por migrate
+        return db != REPLICA_ALIAS
+
+
+def pin_primary(request):
+    """El usuario acaba de escribir: sus próximas lecturas van al primario por un rato."""
+    if replica_configured():
+        request.session[PIN_SESSION_KEY] = time.time() + settings.DATABASE_REPLICA_PIN_SECONDS
+
+
+async def apin_primary(request):
+    """pin_primary para vistas asíncronas (la sesión se carga con su API async)."""
+    if replica_configured():
+        await request.session.aset(PIN_SESSION_KEY, time.time() + settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+def _pinned(request):
+    # Se lee la sesión ANTES de activar la réplica: la sesión misma sale del primario
+    return request.session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+async def _apinned(request):
+    return await request.session.aget(PIN_SESSION_KEY, 0) > time.time()
+
+
+def _stream_from_replica(content):
+    # Las exportaciones se generan DESPUÉS de que la vista regresa: cada trozo se lee en la réplica
+    iterator = iter(content)
+    while True:
+        token = _use_replica.set(True)
+        try:
+            chunk = next(iterator, None)
+        finally:
+            _use_replica.reset(token)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def replica_reads(view):
+    """
+    Decorador para vistas de solo lectura: sus consultas van a la réplica (si existe).
+    Va DEBAJO de @login_required, para que el usuario y la sesión se lean del primario.
+    Funciona igual con vistas async: la ContextVar viaja al hilo de cada consulta.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if not replica_configured() or await _apinned(request):
+                return await view(request, *args, **kwargs)
+            token = _use_replica.set(True)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _use_replica.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not replica_configured() or _pinned(request):
+            return view(request, *args, **kwargs)
+        token = _use_replica.set(True)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+        if response.streaming:
+            response.streaming_content = _stream_from_replica(response.streaming_content)
+        return response
+    return wrapper
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.shortcuts import aget_object_or_404, get_object_or_404
+
+from .models import Election, ElectionVoter
+
+# ---------------------------------------------------------
+# ELECCIONES Y PADRÓN
+# ---------------------------------------------------------
+# Las rutas sin slug usan settings.DEFAULT_ELECTION; las rutas /voting/elecciones/<slug>/...
+# atienden a cualquier otra. El "ya votó" vive en ElectionVoter (uno por votante y elección).
+
+
+def get_election_or_404(slug=None):
+    """La elección del slug (o la predeterminada); 404 si no existe."""
+    return get_object_or_404(Election, slug=slug or settings.DEFAULT_ELECTION)
+
+
+async def aget_election_or_404(slug=None):
+    """get_election_or_404 para vistas asíncronas (ORM asíncrono)."""
+    return await aget_object_or_404(Election, slug=slug or settings.DEFAULT_ELECTION)
+
+
+def has_voted(profile, election):
+    """¿El votante ya votó en esta elección? (consulta por el índice único (election, voter))"""
+    return ElectionVoter.objects.filter(election=election, voter=profile, has_voted=True).exists()
+
+
+async def ahas_voted(profile, election):
+    return await ElectionVoter.objects.filter(election=election, voter=profile, has_voted=True).aexists()
+
+
+def has_voted_anywhere(profile):
+    """¿Ya votó en alguna elección? Entonces su llave pública ya no puede cambiar."""
+    return ElectionVoter.objects.filter(voter=profile, has_voted=True).exists()
+
+
+def is_eligible(profile, election):
+    """Con inscripción abierta vota cualquiera; si no, solo quien está en el padrón."""
+    return election.open_enrollment or ElectionVoter.objects.filter(election=election, voter=profile).exists()
+
+
+async def ais_eligible(profile, election):
+    return election.open_enrollment or await ElectionVoter.objects.filter(election=election, voter=profile).aexists()
+
+
+def enroll_voters(election, profile_ids, batch_size=5000):
+    """Agrega votantes al padrón (los que ya estaban se ignoran). Regresa cuántos se pidieron."""
+    ElectionVoter.objects.bulk_create(
+        (ElectionVoter(election=election, voter_id=profile_id) for profile_id in profile_ids),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    return len(profile_ids)
+
+
+def turnout(election):
+    """Participación: (votaron, inscritos en el padrón)."""
+    roll = ElectionVoter.objects.filter(election=election)
+    return roll.filter(has_voted=True).count(), roll.count()
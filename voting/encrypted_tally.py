@@ -0,0 +1,105 @@
+from django.db import transaction
+
+from .homomorphic import (
+    add_ballots, decrypt_counts, empty_aggregate, load_public_key, load_secret_key, same_aggregate,
+)
+from .models import EncryptedTally, Vote
+
+# ---------------------------------------------------------
+# CONTEO CIFRADO DE UNA ELECCIÓN (EncryptedTally)
+# ---------------------------------------------------------
+# Si la elección tiene tally_public_key, cada papeleta lleva Enc(0/1) de cada opción
+# (Vote.tally_ciphertext) y esos cifrados se suman al agregado de la elección en la
+# misma transacción del voto. Escrutar = descifrar una vez por opción con la llave secreta.
+
+# Papeletas por lote al reconstruir el agregado
+REBUILD_BATCH_SIZE = 2000
+
+# Reintentos del UPDATE condicional antes de rendirse (solo con mucha contención)
+MAX_UPDATE_ATTEMPTS = 50
+
+
+class TallyContention(Exception):
+    """Otros votos ganaron el UPDATE condicional MAX_UPDATE_ATTEMPTS veces: conflicto pasajero, se puede reintentar."""
+
+
+def encrypt_answers(election, answers):
+    """Cifra las respuestas ({'P1': 'ALTO', ...}) como un 0/1 por opción, en el orden de tally_slots."""
+    bits = [int(answers.get(question) == option) for question, option in election.tally_slots]
+    return load_public_key(election.tally_public_key).encrypt_bits(bits)
+
+
+def add_to_encrypted_tally(election, ciphertexts):
+    """
+    Suma papeletas cifradas al agregado de la elección. Debe llamarse DENTRO de la transacción del voto.
+    No hay "count = count + 1" posible en SQL para cifrados: leemos, sumamos en Python y
+    escribimos con UPDATE ... WHERE version = <la que leímos>. Si otro voto se adelantó, 0 filas: se reintenta.
+    """
+    ciphertexts = list(ciphertexts)
+    if not ciphertexts:
+        return
+    # La fila existe desde que se creó la elección (models.create_encrypted_tally)
+    tally = EncryptedTally.objects.get(election=election)
+    for _ in range(MAX_UPDATE_ATTEMPTS):
+        aggregate = add_ballots(bytes(tally.ciphertexts), ciphertexts)
+        updated = EncryptedTally.objects.filter(id=tally.id, version=tally.version).update(
+            ciphertexts=aggregate, ballots=tally.ballots + len(ciphertexts), version=tally.version + 1
+        )
+        if updated:
+            return
+        tally.refresh_from_db()
+    raise TallyContention("No se pudo actualizar el conteo cifrado (demasiada contención).")
+
+
+def aggregate_from_ballots(election):
+    """Vuelve a sumar los cifrados de todas las papeletas, por lotes. Regresa (agregado, papeletas)."""
+    aggregate = empty_aggregate(len(election.tally_slots))
+    total = 0
+    rows = (
+        Vote.objects.filter(election=election, tally_ciphertext__isnull=False)
+        .order_by('id').values_list('tally_ciphertext', flat=True)
+    )
+    batch = []
+    for ciphertext in rows.iterator(chunk_size=REBUILD_BATCH_SIZE):
+        batch.append(bytes(ciphertext))
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            aggregate = add_ballots(aggregate, batch)
+            total += len(batch)
+            batch = []
+    aggregate = add_ballots(aggregate, batch)
+    return aggregate, total + len(batch)
+
+
+@transaction.atomic
+def rebuild_encrypted_tally(election):
+    """
+    Re-suma las papeletas y, si el agregado guardado difiere, lo reemplaza.
+    La fila se bloquea ANTES de leer las papeletas: un voto simultáneo espera, su UPDATE
+    condicional falla (cambió 'version') y se vuelve a sumar sobre el agregado nuevo.
+    Regresa (papeletas, True si hubo que corregir).
+    """
+    EncryptedTally.objects.get_or_create(
+        election=election, defaults={'ciphertexts': empty_aggregate(len(election.tally_slots))}
+    )
+    tally = EncryptedTally.objects.select_for_update().get(election=election)
+    aggregate, ballots = aggregate_from_ballots(election)
+    if tally.ballots == ballots and same_aggregate(bytes(tally.ciphertexts), aggregate):
+        return ballots, False
+    tally.ciphertexts = aggregate
+    tally.ballots = ballots
+    tally.version += 1
+    tally.save(update_fields=['ciphertexts', 'ballots', 'version'])
+    return ballots, True
+
+
+def decrypt_tally(election, secret_key_pem):
+    """
+    Descifra el agregado: {('P1', 'ALTO'): 3, ...} y el número de papeletas sumadas.
+    Una sola descifrada por opción, sin tocar las papeletas.
+    """
+    secret = load_secret_key(secret_key_pem, election.tally_public_key)
+    tally = EncryptedTally.objects.filter(election=election).first()
+    if tally is None:
+        return {slot: 0 for slot in election.tally_slots}, 0
+    counts = decrypt_counts(secret, bytes(tally.ciphertexts), tally.ballots)
+    return dict(zip(election.tally_slots, counts)), tally.ballots
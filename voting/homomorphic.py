@@ -0,0 +1,343 @@
+import secrets
+from functools import lru_cache
+from math import isqrt
+
+from Crypto.PublicKey import ECC
+
+# ---------------------------------------------------------
+# CONTEO CIFRADO ADITIVO (ElGamal exponencial sobre P-256)
+# ---------------------------------------------------------
+# Cada opción de la boleta se cifra como Enc(1) si se eligió o Enc(0) si no:
+#     Enc(m) = (r·G, m·G + r·H)      H = d·G es la llave pública del conteo
+# Sumar dos cifrados (punto a punto) cifra la SUMA de los mensajes, así que el total
+# de cada opción se acumula cifrado voto por voto y al final se descifra UNA vez por
+# opción: m·G = c2 - d·c1, y m (a lo más el número de papeletas) sale con paso de
+# bebé / paso de gigante.
+#
+# La aritmética va con enteros de Python (no cabe en numpy: son números de 256 bits)
+# y está pensada para lotes:
+# - Coordenadas jacobianas: sumar no requiere inversiones modulares.
+# - Truco de Montgomery: convertir N puntos a afines cuesta UNA inversión, no N.
+# - Tablas de base fija (ventanas de 8 bits) para r·G y r·H: cifrar es sumar 32 puntos.
+# - Los agregados se suman columna por columna (una opción = una columna).
+# Este módulo no importa Django (igual que crypto_utils).
+
+CURVE = 'P-256'
+CURVE_NAMES = ('NIST P-256', 'P-256', 'p256', 'prime256v1', 'secp256r1')
+
+# Parámetros de NIST P-256 (FIPS 186-4): y² = x³ - 3x + b sobre GF(p), orden _N
+_P = 0xffffffff00000001000000000000000000000000ffffffffffffffffffffffff
+_N = 0xffffffff00000000ffffffffffffffffbce6faada7179e84f3b9cac2fc632551
+_G = (
+    0x6b17d1f2e12c4247f8bce6e563a440f277037d812deb33a0f4a13945d898c296,
+    0x4fe342e2fe1a7f9b8ee7eb4a7c0f9e162bce33576b315ececbb6406837bf51f5,
+)
+
+# Punto al infinito en jacobianas (Z = 0); en afines se representa con None
+_INFINITY = (1, 1, 0)
+
+COORDINATE_SIZE = 32
+AFFINE_POINT_SIZE = 2 * COORDINATE_SIZE     # papeletas: x || y (ceros = infinito)
+JACOBIAN_POINT_SIZE = 3 * COORDINATE_SIZE   # agregados: X || Y || Z
+WINDOW_BITS = 8
+
+
+# --- Aritmética de la curva ---
+
+def _double(point):
+    x, y, z = point
+    if not z or not y:
+        return _INFINITY
+    yy = y * y % _P
+    zz = z * z % _P
+    s = 4 * x * yy % _P
+    m = 3 * (x - zz) * (x + zz) % _P      # a = -3
+    x3 = (m * m - 2 * s) % _P
+    y3 = (m * (s - x3) - 8 * yy * yy) % _P
+    return (x3, y3, 2 * y * z % _P)
+
+
+def _add_affine(point, affine):
+    """Suma mixta: punto jacobiano + punto afín (x, y) o None."""
+    if affine is None:
+        return point
+    x1, y1, z1 = point
+    x2, y2 = affine
+    if not z1:
+        return (x2, y2, 1)
+    z1z1 = z1 * z1 % _P
+    h = (x2 * z1z1 - x1) % _P
+    r = (y2 * z1 * z1z1 - y1) % _P
+    if not h:
+        return _double(point) if not r else _INFINITY
+    hh = h * h % _P
+    hhh = h * hh % _P
+    v = x1 * hh % _P
+    x3 = (r * r - hhh - 2 * v) % _P
+    y3 = (r * (v - x3) - y1 * hhh) % _P
+    return (x3, y3, z1 * h % _P)
+
+
+def _add(first, second):
+    """Suma de dos puntos jacobianos."""
+    x1, y1, z1 = first
+    x2, y2, z2 = second
+    if not z1:
+        return second
+    if not z2:
+        return first
+    z1z1 = z1 * z1 % _P
+    z2z2 = z2 * z2 % _P
+    u1 = x1 * z2z2 % _P
+    s1 = y1 * z2 * z2z2 % _P
+    h = (x2 * z1z1 - u1) % _P
+    r = (y2 * z1 * z1z1 - s1) % _P
+    if not h:
+        return _double(first) if not r else _INFINITY
+    hh = h * h % _P
+    hhh = h * hh % _P
+    v = u1 * hh % _P
+    x3 = (r * r - hhh - 2 * v) % _P
+    y3 = (r * (v - x3) - s1 * hhh) % _P
+    return (x3, y3, z1 * z2 * h % _P)
+
+
+def _negate(point):
+    x, y, z = point
+    return (x, -y % _P, z)
+
+
+def _multiply(affine, scalar):
+    """k·P para una base cualquiera (duplicar y sumar). Solo se usa al descifrar."""
+    result = _INFINITY
+    for bit in bin(scalar)[2:]:
+        result = _double(result)
+        if bit == '1':
+            result = _add_affine(result, affine)
+    return result
+
+
+def _to_affine_batch(points):
+    """
+    Convierte puntos jacobianos a afines con UNA inversión modular (truco de Montgomery):
+    se invierte el producto de todas las Z y de ahí sale cada inversa con dos multiplicaciones.
+    """
+    prefixes = []
+    product = 1
+    for x, y, z in points:
+        if z:
+            product = product * z % _P
+        prefixes.append(product)
+
+    inverse = pow(product, -1, _P)
+    result = [None] * len(points)
+    for index in range(len(points) - 1, -1, -1):
+        x, y, z = points[index]
+        if not z:
+            continue
+        z_inverse = inverse * (prefixes[index - 1] if index else 1) % _P
+        inverse = inverse * z % _P
+        zz_inverse = z_inverse * z_inverse % _P
+        result[index] = (x * zz_inverse % _P, y * zz_inverse * z_inverse % _P)
+    return result
+
+
+class _FixedBase:
+    """Tabla de múltiplos d·2^(8i)·P (d = 1..255): k·P se reduce a 32 sumas mixtas."""
+
+    def __init__(self, affine):
+        windows = -(-_N.bit_length() // WINDOW_BITS)
+        multiples = []
+        base = (affine[0], affine[1], 1)
+        for _ in range(windows):
+            row = [base]
+            for _ in range((1 << WINDOW_BITS) - 2):
+                row.append(_add(row[-1], base))
+            multiples.extend(row)
+            base = _add(row[-1], base)
+        table = _to_affine_batch(multiples)
+        size = (1 << WINDOW_BITS) - 1
+        self.rows = [table[start:start + size] for start in range(0, len(table), size)]
+
+    def multiply(self, scalar):
+        result = _INFINITY
+        mask = (1 << WINDOW_BITS) - 1
+        for row in self.rows:
+            digit = scalar & mask
+            if digit:
+                result = _add_affine(result, row[digit - 1])
+            scalar >>= WINDOW_BITS
+        return result
+
+
+@lru_cache(maxsize=1)
+def _generator_table():
+    return _FixedBase(_G)
+
+
+# --- Codificación ---
+
+def _encode_affine(points):
+    return b''.join(
+        bytes(AFFINE_POINT_SIZE) if point is None
+        else point[0].to_bytes(COORDINATE_SIZE, 'big') + point[1].to_bytes(COORDINATE_SIZE, 'big')
+        for point in points
+    )
+
+
+def _decode_affine(data):
+    if len(data) % AFFINE_POINT_SIZE:
+        raise ValueError("Cifrado de papeleta con longitud inválida.")
+    points = []
+    for start in range(0, len(data), AFFINE_POINT_SIZE):
+        x = int.from_bytes(data[start:start + COORDINATE_SIZE], 'big')
+        y = int.from_bytes(data[start + COORDINATE_SIZE:start + AFFINE_POINT_SIZE], 'big')
+        points.append((x, y) if x or y else None)
+    return points
+
+
+def _encode_jacobian(points):
+    return b''.join(
+        coordinate.to_bytes(COORDINATE_SIZE, 'big') for point in points for coordinate in point
+    )
+
+
+def _decode_jacobian(data):
+    if len(data) % JACOBIAN_POINT_SIZE:
+        raise ValueError("Agregado cifrado con longitud inválida.")
+    coordinates = [
+        int.from_bytes(data[start:start + COORDINATE_SIZE], 'big')
+        for start in range(0, len(data), COORDINATE_SIZE)
+    ]
+    return [tuple(coordinates[start:start + 3]) for start in range(0, len(coordinates), 3)]
+
+
+# --- Llaves ---
+
+class TallyPublicKey:
+    """Llave pública H del conteo con su tabla de base fija (se arma una vez por proceso)."""
+
+    def __init__(self, point):
+        self.point = point
+        self._table = None
+
+    def encrypt_bits(self, bits):
+        """
+        Cifra una papeleta como vector de 0/1 (uno por opción de la boleta).
+        Regresa los bytes afines (c1, c2) de cada opción, en el mismo orden.
+        """
+        generator = _generator_table()
+        if self._table is None:
+            self._table = _FixedBase(self.point)
+        points = []
+        for bit in bits:
+            if bit not in (0, 1):
+                raise ValueError("Cada opción se cifra como 0 o 1.")
+            r = secrets.randbelow(_N - 1) + 1
+            c2 = self._table.multiply(r)
+            points.append(generator.multiply(r))
+            points.append(_add_affine(c2, _G) if bit else c2)
+        return _encode_affine(_to_affine_batch(points))
+
+
+def generate_tally_keys():
+    """Genera (public_key_pem, secret_key_pem) del conteo. La secreta la guarda quien escruta, no el servidor."""
+    key = ECC.generate(curve=CURVE)
+    return key.public_key().export_key(format='PEM'), key.export_key(format='PEM')
+
+
+def _import_key(key_pem):
+    key = ECC.import_key(key_pem)
+    if key.curve not in CURVE_NAMES:
+        raise ValueError(f"La llave del conteo debe ser de la curva {CURVE}.")
+    return key
+
+
+@lru_cache(maxsize=16)
+def load_public_key(public_key_pem):
+    """Lee la llave pública de una elección (con caché: la tabla de base fija cuesta ~50 ms)."""
+    point = _import_key(public_key_pem).pointQ
+    return TallyPublicKey((int(point.x), int(point.y)))
+
+
+def load_secret_key(secret_key_pem, public_key_pem=None):
+    """Lee la llave secreta; con 'public_key_pem' comprueba que sea la pareja de la publicada."""
+    key = _import_key(secret_key_pem)
+    if not key.has_private():
+        raise ValueError("El archivo no contiene la llave secreta del conteo.")
+    if public_key_pem is not None and _import_key(public_key_pem).pointQ != key.pointQ:
+        raise ValueError("La llave secreta no corresponde a la llave pública de la elección.")
+    return int(key.d)
+
+
+# --- Agregados ---
+
+def empty_aggregate(size):
+    """Agregado inicial de 'size' opciones: Enc(0) trivial (infinito, infinito) en cada una."""
+    return _encode_jacobian([_INFINITY] * (2 * size))
+
+
+def add_ballots(aggregate, ballots):
+    """
+    Suma papeletas cifradas (bytes de encrypt_bits) a un agregado y regresa el nuevo agregado.
+    Sirve igual para un voto (incremental) que para un lote entero (reconstrucción, cargas masivas):
+    cada columna se acumula con sumas mixtas, sin una sola inversión modular.
+    """
+    totals = _decode_jacobian(aggregate)
+    columns = range(len(totals))
+    add = _add_affine
+    for ballot in ballots:
+        points = _decode_affine(ballot)
+        if len(points) != len(totals):
+            raise ValueError("La papeleta cifrada no tiene las opciones de la boleta.")
+        for index in columns:
+            totals[index] = add(totals[index], points[index])
+    return _encode_jacobian(totals)
+
+
+def same_aggregate(first, second):
+    """¿Dos agregados cifran exactamente lo mismo? (Las jacobianas no son únicas: se comparan en afines.)"""
+    return _to_affine_batch(_decode_jacobian(first)) == _to_affine_batch(_decode_jacobian(second))
+
+
+@lru_cache(maxsize=4)
+def _baby_steps(size):
+    points = []
+    current = _INFINITY
+    for _ in range(size):
+        current = _add_affine(current, _G)
+        points.append(current)
+    return {point: index for index, point in enumerate(_to_affine_batch(points), start=1)}
+
+
+def _discrete_log(point, max_count):
+    """m tal que m·G = point, con 0 <= m <= max_count (paso de bebé / paso de gigante)."""
+    if point is None:
+        return 0
+    size = isqrt(max_count) + 1
+    table = _baby_steps(size)
+    giant = _to_affine_batch([_negate(_multiply(_G, size))])[0]
+    current = (point[0], point[1], 1)
+    for step in range(size + 1):
+        affine = _to_affine_batch([current])[0]
+        if affine is None:
+            return step * size
+        found = table.get(affine)
+        if found is not None:
+            return step * size + found
+        current = _add_affine(current, giant)
+    raise ValueError("El total descifrado está fuera de rango (¿llave secreta equivocada?).")
+
+
+def decrypt_counts(secret, aggregate, max_count):
+    """
+    Descifra el total de cada opción: UNA operación por opción, sin importar cuántas papeletas haya.
+    'max_count' acota la búsqueda (el número de papeletas sumadas).
+    """
+    totals = _decode_jacobian(aggregate)
+    shared = [
+        _negate(_multiply(c1, secret)) if c1 is not None else _INFINITY
+        for c1 in _to_affine_batch(totals[0::2])
+    ]
+    messages = _to_affine_batch([_add(c2, mask) for c2, mask in zip(totals[1::2], shared)])
+    return [_discrete_log(message, max_count) for message in messages]
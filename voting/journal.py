@@ -0,0 +1,486 @@
+import base64
+import json
+import os
+import socket
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: el diario necesita candados de archivo POSIX
+    fcntl = None
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import InterfaceError, OperationalError, close_old_connections, transaction
+
+from .ballot_pipeline import BallotRejected, claim_ballot
+from .ballot_utils import add_to_tally
+from .broadcast import publish_vote_delta
+from .encrypted_tally import TallyContention, add_to_encrypted_tally, encrypt_answers
+from .ledger import append_signatures
+from .merkle import receipt_digest
+from .models import BallotAnswer, Election, ElectionVoter, Vote
+from .receipts import forget_missing_receipt
+from .results_cache import bump_results_version
+from .turnout import add_to_turnout, turnout_counts
+
+# ---------------------------------------------------------
+# DIARIO DE PAPELETAS (modo BALLOT_INGESTION_MODE = 'journal')
+# ---------------------------------------------------------
+# En los picos del cierre cada voto esperaba su propia transacción (y en SQLite todas
+# se forman en el candado de escritura). En este modo la papeleta ya firmada y cifrada
+# se AGREGA a un archivo local y el votante recibe su comprobante en cuanto está en disco:
+#
+# 1. "Group commit": un hilo escritor junta las papeletas que llegaron mientras hacía
+#    el fsync anterior y las escribe con UN solo write() + fsync().
+# 2. Un hilo "flusher" las pasa a la base de datos por lotes (bulk_create de Vote y
+#    respuestas, un UPDATE por opción en los contadores, una raíz nueva del registro).
+# 3. Al arrancar, los segmentos que dejó un proceso muerto se vuelven a aplicar; las
+#    papeletas que ya estaban en la base se reconocen por su receipt_digest (índice).
+#
+# Antes de escribir la papeleta se marca "ya votó" en el padrón (claim_ballot, el mismo
+# UPDATE condicional del modo en línea): un segundo envío del votante, desde cualquier
+# worker, recibe "Ya has votado" en vez de un comprobante que el flusher tiraría después.
+# Si la papeleta no se puede escribir o se rechaza al aplicarla, la marca se devuelve.
+#
+# Cada proceso escribe su propio segmento y lo mantiene bloqueado (flock) mientras vive:
+# un segmento sin candado es de un proceso que ya terminó y se puede reaplicar.
+# Formato: una línea por papeleta, '<crc32 en hex> <json>\n'; una línea incompleta o
+# con CRC inválido (escritura cortada por un apagón) marca el final del segmento.
+
+SEGMENT_SUFFIX = '.journal'
+REJECTED_FILE = 'rejected.jsonl'
+
+
+# --- Formato ---
+
+def _b64(value):
+    return base64.b64encode(bytes(value)).decode('ascii') if value is not None else None
+
+
+def _unb64(value):
+    return base64.b64decode(value) if value is not None else None
+
+
+def encode_entry(entry):
+    payload = json.dumps(entry, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return b'%08x ' % zlib.crc32(payload) + payload + b'\n'
+
+
+def read_segment(path):
+    """Lee las papeletas de un segmento hasta la primera línea incompleta o dañada."""
+    entries = []
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n') or len(line) < 10:
+                break
+            checksum, _, payload = line[:-1].partition(b' ')
+            try:
+                if int(checksum, 16) != zlib.crc32(payload):
+                    break
+                entries.append(json.loads(payload))
+            except ValueError:
+                break
+    return entries
+
+
+def make_entry(profile, election, vote_content, answers, signature, encrypted_vote):
+    """Papeleta lista para el diario (ya firmada, verificada y cifrada)."""
+    tally_ciphertext = encrypt_answers(election, answers) if election.encrypted_tally else None
+    return {
+        'election': election.id,
+        'voter': profile.id,
+        'content': vote_content,
+        'answers': answers,
+        'signature': _b64(signature),
+        'encrypted': _b64(encrypted_vote),
+        'tally': _b64(tally_ciphertext),
+        'journaled_at': time.time(),
+    }
+
+
+# --- Paso del diario a la base de datos ---
+
+def _claim_voters(election, first):
+    """
+    Confirma en UNA pasada por el padrón la marca de "ya votó" de los votantes del lote.
+    La marca normalmente ya existe (claim_ballot al recibir la papeleta); aquí se pone si
+    falta (segmentos escritos antes de ese paso) y se descartan los votantes que ya tienen
+    una papeleta guardada. Regresa los ids aceptados.
+    """
+    voter_ids = list(first)
+    if election.open_enrollment:
+        ElectionVoter.objects.bulk_create(
+            [ElectionVoter(election=election, voter_id=voter_id, has_voted=True) for voter_id in voter_ids],
+            ignore_conflicts=True,
+        )
+    enrolled = set(
+        ElectionVoter.objects.select_for_update()
+        .filter(election=election, voter_id__in=voter_ids).values_list('voter_id', flat=True)
+    )
+    stored = set(Vote.objects.filter(election=election, voter_id__in=voter_ids).values_list('voter_id', flat=True))
+    claimable = [voter_id for voter_id in voter_ids if voter_id in enrolled and voter_id not in stored]
+    ElectionVoter.objects.filter(election=election, voter_id__in=claimable, has_voted=False).update(has_voted=True)
+    return claimable
+
+
+def release_claims(entries):
+    """
+    Devuelve la marca de "ya votó" de papeletas que no llegaron a la base (no se pudieron
+    escribir o se rechazaron al aplicarse), salvo que el votante sí tenga otra guardada.
+    """
+    for entry in entries:
+        if not Vote.objects.filter(election_id=entry['election'], voter_id=entry['voter']).exists():
+            ElectionVoter.objects.filter(
+                election_id=entry['election'], voter_id=entry['voter'], has_voted=True,
+            ).update(has_voted=False)
+
+
+@transaction.atomic
+def _flush_election(election, entries):
+    # Un voto por votante: si el diario trae dos, gana el primero
+    first = {}
+    for entry in entries:
+        first.setdefault(entry['voter'], entry)
+    claimable = _claim_voters(election, first)
+    accepted = [first[voter_id] for voter_id in claimable]
+    accepted_ids = {id(entry) for entry in accepted}
+    rejected = [entry for entry in entries if id(entry) not in accepted_ids]
+    if not accepted:
+        return rejected
+
+    signatures = [_unb64(entry['signature']) for entry in accepted]
+    first_index = append_signatures(signatures)
+    votes = Vote.objects.bulk_create([
+        Vote(
+            election=election, voter_id=entry['voter'], option=entry['content'],
+            digital_signature=signature, encrypted_vote=_unb64(entry['encrypted']),
+            receipt_digest=receipt_digest(signature), ledger_index=first_index + offset,
+            tally_ciphertext=_unb64(entry['tally']),
+            # La hora del voto es la del comprobante (fsync), no la del flusher
+            timestamp=datetime.fromtimestamp(entry['journaled_at']),
+        )
+        for offset, (entry, signature) in enumerate(zip(accepted, signatures))
+    ])
+    BallotAnswer.objects.bulk_create([
+        BallotAnswer(election=election, vote=vote, question=question, answer=answer)
+        for vote, entry in zip(votes, accepted)
+        for question, answer in entry['answers'].items()
+    ])
+    add_to_tally(election, Counter(item for entry in accepted for item in entry['answers'].items()))
+    add_to_turnout(election, turnout_counts((vote.timestamp, entry['answers']) for vote, entry in zip(votes, accepted)))
+    if election.encrypted_tally:
+        add_to_encrypted_tally(election, [
+            vote.tally_ciphertext if vote.tally_ciphertext is not None else encrypt_answers(election, entry['answers'])
+            for vote, entry in zip(votes, accepted)
+        ])
+
+    # bulk_create no dispara post_save: avisamos a mano (tablero, SSE y caché de comprobantes)
+    def announce():
+        bump_results_version(election.slug)
+        for entry, signature in zip(accepted, signatures):
+            publish_vote_delta(election, entry['answers'])
+            forget_missing_receipt(signature)
+    transaction.on_commit(announce)
+    return rejected
+
+
+def _flush_one_by_one(election, entries):
+    # Respaldo si el lote falló: cada papeleta en su transacción y la que falle se rechaza
+    # sola, sin detener a las demás. Si la base no responde (o el conteo cifrado está en
+    # contención) se deja subir el error: el flusher reintenta el lote más tarde.
+    rejected = []
+    for entry in entries:
+        try:
+            rejected.extend(_flush_election(election, [entry]))
+        except (OperationalError, InterfaceError, TallyContention):
+            raise
+        except Exception:
+            rejected.append(entry)
+    return rejected
+
+
+def flush_entries(entries):
+    """
+    Guarda en la base un lote de papeletas del diario (una transacción por elección).
+    Regresa las rechazadas: voto repetido, votante fuera del padrón, elección inexistente
+    o una entrada que no se pudo guardar por sí sola.
+    """
+    by_election = {}
+    for entry in entries:
+        by_election.setdefault(entry['election'], []).append(entry)
+    elections = Election.objects.in_bulk(list(by_election))
+
+    rejected = []
+    for election_id, group in by_election.items():
+        election = elections.get(election_id)
+        if election is None:
+            rejected.extend(group)
+            continue
+        try:
+            rejected.extend(_flush_election(election, group))
+        except Exception:
+            rejected.extend(_flush_one_by_one(election, group))
+    return rejected
+
+
+def record_rejected(directory, entries):
+    """
+    Las papeletas rechazadas al aplicar el diario no se pierden en silencio: quedan en
+    rejected.jsonl, y el votante recupera su marca para volver a votar (release_claims).
+    """
+    if not entries:
+        return
+    with open(os.path.join(directory, REJECTED_FILE), 'ab') as f:
+        for entry in entries:
+            f.write(json.dumps({**entry, 'rejected_at': time.time()}, ensure_ascii=False).encode('utf-8') + b'\n')
+        f.flush()
+        os.fsync(f.fileno())
+    release_claims(entries)
+
+
+def _already_flushed(entries):
+    # Papeletas que ya llegaron a la base antes de que el proceso muriera
+    digests = [receipt_digest(_unb64(entry['signature'])) for entry in entries]
+    stored = set(
+        bytes(digest) for digest in Vote.objects.filter(receipt_digest__in=digests).values_list('receipt_digest', flat=True)
+    )
+    return [digest in stored for digest in digests]
+
+
+def replay_segment(path, batch_size):
+    """
+    Reaplica un segmento de un proceso que ya no existe y lo borra.
+    Regresa (aplicadas, ya estaban, rechazadas); None si otro proceso lo tiene bloqueado.
+    """
+    with open(path, 'ab') as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return None
+        entries = read_segment(path)
+        applied = skipped = rejected = 0
+        for start in range(0, len(entries), batch_size):
+            batch = entries[start:start + batch_size]
+            pending = [entry for entry, done in zip(batch, _already_flushed(batch)) if not done]
+            skipped += len(batch) - len(pending)
+            failed = flush_entries(pending)
+            record_rejected(os.path.dirname(path), failed)
+            applied += len(pending) - len(failed)
+            rejected += len(failed)
+        os.remove(path)
+    return applied, skipped, rejected
+
+
+def orphan_segments(directory):
+    """Segmentos del directorio en orden de creación (los bloqueados se saltan al reaplicar)."""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+    return [os.path.join(directory, name) for name in names]
+
+
+def replay_orphan_segments(directory, batch_size):
+    """Reaplica todos los segmentos sin dueño. Regresa los totales (aplicadas, ya estaban, rechazadas)."""
+    totals = [0, 0, 0]
+    for path in orphan_segments(directory):
+        result = replay_segment(path, batch_size)
+        if result is not None:
+            totals = [total + value for total, value in zip(totals, result)]
+    return tuple(totals)
+
+
+# --- Escritor con group commit y flusher en segundo plano ---
+
+class _Pending:
+    __slots__ = ('data', 'done', 'error')
+
+    def __init__(self, data):
+        self.data = data
+        self.done = threading.Event()
+        self.error = None
+
+
+class BallotJournal:
+    """Diario de UN proceso: su segmento, el hilo escritor y el hilo flusher."""
+
+    def __init__(self, directory, group_commit_ms, flush_interval, flush_batch, segment_bytes):
+        if fcntl is None:
+            raise ImproperlyConfigured("BALLOT_INGESTION_MODE='journal' requiere candados de archivo POSIX (fcntl).")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.group_commit = group_commit_ms / 1000
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.segment_bytes = segment_bytes
+
+        self._lock = threading.Condition()
+        self._to_write = []                 # esperan fsync
+        self._to_flush = []                 # ya en disco, faltan en la base: (segmento, entrada)
+        self._outstanding = Counter()       # papeletas sin pasar a la base por segmento
+        self._retired = []                  # segmentos llenos esperando a quedar vacíos
+        self._flushing = False
+        self.stats = Counter()
+        self.last_error = None
+
+        self._open_segment()
+        threading.Thread(target=self._write_loop, name='ballot-journal-writer', daemon=True).start()
+        threading.Thread(target=self._flush_loop, name='ballot-journal-flusher', daemon=True).start()
+
+    def _open_segment(self):
+        name = f'{time.time_ns():020d}-{socket.gethostname()}-{os.getpid()}{SEGMENT_SUFFIX}'
+        self.segment = open(os.path.join(self.directory, name), 'ab')
+        fcntl.flock(self.segment, fcntl.LOCK_EX)
+
+    # -- Lado de la petición --
+
+    def append(self, entry):
+        """Agrega una papeleta y espera a que esté en disco (fsync). Lanza BallotRejected si no se pudo escribir."""
+        pending = _Pending(encode_entry(entry))
+        with self._lock:
+            self._to_write.append((pending, entry))
+            self._lock.notify_all()
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+
+    def drain(self, timeout=30):
+        """Espera a que todo lo escrito llegue a la base (pruebas y apagado ordenado)."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._to_write or self._to_flush or self._flushing:
+                self._lock.notify_all()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._lock.wait(min(remaining, 0.05))
+        return True
+
+    # -- Hilo escritor (group commit) --
+
+    def _write_loop(self):
+        while True:
+            with self._lock:
+                while not self._to_write:
+                    self._lock.wait()
+            # Damos un instante a que lleguen más papeletas: todas comparten el mismo fsync
+            if self.group_commit:
+                time.sleep(self.group_commit)
+            with self._lock:
+                group, self._to_write = self._to_write, []
+            try:
+                self.segment.write(b''.join(pending.data for pending, entry in group))
+                self.segment.flush()
+                os.fsync(self.segment.fileno())
+            except OSError as e:
+                with self._lock:
+                    for pending, entry in group:
+                        pending.error = BallotRejected(f"No se pudo registrar el voto en el diario: {e}")
+                        pending.done.set()
+                continue
+
+            with self._lock:
+                segment = self.segment
+                for pending, entry in group:
+                    self._to_flush.append((segment, entry))
+                    pending.done.set()
+                self._outstanding[segment] += len(group)
+                self.stats['journaled'] += len(group)
+                self.stats['fsyncs'] += 1
+                if segment.tell() >= self.segment_bytes:
+                    self._retired.append(segment)
+                    self._open_segment()
+                self._lock.notify_all()
+
+    # -- Hilo flusher (diario -> base de datos) --
+
+    def _flush_loop(self):
+        # Primero lo que dejaron procesos anteriores
+        try:
+            applied, skipped, rejected = replay_orphan_segments(self.directory, self.flush_batch)
+            self.stats.update(replayed=applied, rejected=rejected)
+        except Exception as e:
+            self.last_error = f"replay: {e}"
+        finally:
+            close_old_connections()
+
+        while True:
+            with self._lock:
+                if not self._to_flush:
+                    self._lock.wait(self.flush_interval)
+                batch = self._to_flush[:self.flush_batch]
+                self._flushing = bool(batch)
+            if not batch:
+                continue
+            try:
+                # Una papeleta que no se puede guardar se rechaza sola (flush_entries la aísla);
+                # solo una base que no responde hace repetir el lote completo. Al repetirlo,
+                # las elecciones que sí alcanzaron a confirmarse ya están en la base: no se reaplican
+                # (se verían como voto repetido y acabarían en rejected.jsonl)
+                entries = [entry for segment, entry in batch]
+                failed = flush_entries([entry for entry, done in zip(entries, _already_flushed(entries)) if not done])
+                record_rejected(self.directory, failed)
+            except Exception as e:
+                # Se reintenta en la siguiente vuelta; las papeletas siguen en el segmento
+                self.last_error = str(e)
+                with self._lock:
+                    self._flushing = False
+                time.sleep(self.flush_interval)
+                continue
+            finally:
+                close_old_connections()
+
+            with self._lock:
+                del self._to_flush[:len(batch)]
+                for segment, entry in batch:
+                    self._outstanding[segment] -= 1
+                self.stats.update(flushed=len(batch) - len(failed), rejected=len(failed))
+                self._remove_empty_segments()
+                self._flushing = False
+                self._lock.notify_all()
+
+    def _remove_empty_segments(self):
+        # Un segmento lleno cuyas papeletas ya están todas en la base deja de hacer falta
+        for segment in list(self._retired):
+            if self._outstanding[segment] <= 0:
+                self._retired.remove(segment)
+                del self._outstanding[segment]
+                os.remove(segment.name)
+                segment.close()
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal():
+    """Diario único por proceso; se crea (y reaplica lo pendiente) con la primera papeleta."""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = BallotJournal(
+                settings.JOURNAL_DIR, settings.JOURNAL_GROUP_COMMIT_MS, settings.JOURNAL_FLUSH_INTERVAL,
+                settings.JOURNAL_FLUSH_BATCH, settings.JOURNAL_SEGMENT_BYTES,
+            )
+        return _journal
+
+
+def journal_ballot(profile, election, vote_content, answers, signature, encrypted_vote):
+    """
+    Registra una papeleta sellada en el diario y regresa en cuanto está en disco.
+    Se guarda en la base unos milisegundos después (flusher); el comprobante ya es válido.
+    """
+    if not election.is_open:
+        raise BallotRejected("La elección está cerrada: ya no se reciben votos.")
+    entry = make_entry(profile, election, vote_content, answers, signature, encrypted_vote)
+    # "Ya votó" en la base ANTES del comprobante: lanza AlreadyVoted / NotEligible
+    claim_ballot(profile, election)
+    try:
+        get_journal().append(entry)
+    except Exception:
+        release_claims([entry])
+        raise
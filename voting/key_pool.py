@@ -0,0 +1,122 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .crypto_utils import generate_rsa_keys, get_key_ring, get_scheme
+from .models import KeyPoolStats, PregeneratedKeyPair
+
+# ---------------------------------------------------------
+# RESERVA DE LLAVES RSA PRE-GENERADAS
+# ---------------------------------------------------------
+# La vista de generación de llaves ya no hace RSA.generate(2048) en la petición:
+# toma un par ya listo de la tabla PregeneratedKeyPair.
+# Si la reserva está vacía (o desactivada), generamos en caliente como antes.
+#
+# Las llaves privadas de la reserva son las futuras llaves de firma de votantes que aún
+# no se registran: se guardan CIFRADAS con el llavero de papeletas (AES-256-GCM), nunca
+# en PEM plano. Un respaldo de la base o la réplica de lectura solo ven sobres cifrados.
+
+# Intentos para "ganar" una fila cuando varios workers sacan llaves al mismo tiempo.
+MAX_POP_ATTEMPTS = 3
+
+
+def _bump_stat(field, amount=1):
+    """Incrementa un contador de KeyPoolStats con UPDATE atómico (sin leerlo en Python)."""
+    if KeyPoolStats.objects.filter(pk=1).update(**{field: F(field) + amount}):
+        return
+    try:
+        with transaction.atomic():
+            KeyPoolStats.objects.create(pk=1, **{field: amount})
+    except IntegrityError:
+        KeyPoolStats.objects.filter(pk=1).update(**{field: F(field) + amount})
+
+
+def _seal(private_key_pem):
+    return get_key_ring().encrypt(private_key_pem)
+
+
+def _unseal(sealed_private_key):
+    """PEM de una fila de la reserva, o None si su llave AES ya no está en el llavero."""
+    try:
+        return get_key_ring().decrypt(bytes(sealed_private_key))
+    except ValueError:
+        return None
+
+
+def _pop_key_pair():
+    """
+    Saca el par más antiguo de la reserva y lo borra.
+    El DELETE ... WHERE id = X solo lo gana un proceso: si otro se nos adelantó,
+    probamos con la siguiente fila. No usamos bloqueos (funciona igual en SQLite y Postgres).
+    """
+    for _ in range(MAX_POP_ATTEMPTS):
+        row = PregeneratedKeyPair.objects.order_by('id').values_list('id', 'public_key', 'sealed_private_key').first()
+        if row is None:
+            return None
+        key_id, public_key_pem, sealed_private_key = row
+        deleted, _ = PregeneratedKeyPair.objects.filter(id=key_id).delete()
+        if deleted:
+            private_key_pem = _unseal(sealed_private_key)
+            if private_key_pem is not None:
+                return public_key_pem, private_key_pem
+    return None
+
+
+def take_key_pair(scheme=None):
+    """
+    Regresa (public_key_pem, private_key_pem) igual que generate_rsa_keys(),
+    pero sacándolo de la reserva cuando hay llaves disponibles.
+    La reserva solo guarda llaves RSA (sirven para PKCS#1 v1.5 y PSS);
+    las de Ed25519 son tan baratas que se generan al momento.
+    """
+    scheme = get_scheme(scheme)
+    if scheme.key_type != 'rsa':
+        return scheme.generate_keys()
+
+    if getattr(settings, 'KEY_POOL_ENABLED', True):
+        pair = _pop_key_pair()
+        if pair is not None:
+            _bump_stat('hits')
+            return pair
+        _bump_stat('misses')
+
+    # Respaldo síncrono: la reserva está vacía, generamos como siempre.
+    return generate_rsa_keys()
+
+
+def pop_key_pairs(limit):
+    """
+    Saca hasta 'limit' pares de la reserva (cargas masivas como seed_election).
+    Igual que _pop_key_pair(): cada DELETE ... WHERE id = X solo lo gana un proceso.
+    """
+    rows = PregeneratedKeyPair.objects.order_by('id').values_list('id', 'public_key', 'sealed_private_key')[:limit]
+    pairs = []
+    for key_id, public_key_pem, sealed_private_key in list(rows):
+        deleted, _ = PregeneratedKeyPair.objects.filter(id=key_id).delete()
+        private_key_pem = _unseal(sealed_private_key) if deleted else None
+        if private_key_pem is not None:
+            pairs.append((public_key_pem, private_key_pem))
+    return pairs
+
+
+def add_key_pairs(pairs):
+    """Guarda en la reserva una lista de pares (public_key_pem, private_key_pem); la privada va cifrada."""
+    PregeneratedKeyPair.objects.bulk_create(
+        PregeneratedKeyPair(public_key=public_key_pem, sealed_private_key=_seal(private_key_pem))
+        for public_key_pem, private_key_pem in pairs
+    )
+    _bump_stat('generated', len(pairs))
+
+
+def pool_status():
+    """Foto de la reserva: tamaño actual y métricas acumuladas."""
+    stats = KeyPoolStats.objects.filter(pk=1).values('hits', 'misses', 'generated').first()
+    stats = stats or {'hits': 0, 'misses': 0, 'generated': 0}
+    total = stats['hits'] + stats['misses']
+    return {
+        'size': PregeneratedKeyPair.objects.count(),
+        'max_size': settings.KEY_POOL_MAX_SIZE,
+        'low_water': settings.KEY_POOL_LOW_WATER,
+        'hit_rate': round(stats['hits'] / total, 4) if total else None,
+        **stats,
+    }
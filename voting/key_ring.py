@@ -0,0 +1,98 @@
+import json
+import os
+
+from django.conf import settings
+from django.core import checks
+
+from .crypto_utils import AESKeyRing, SHA256, generate_aes_key, has_key_ring, set_key_ring
+
+# ---------------------------------------------------------
+# ORIGEN DEL LLAVERO AES
+# ---------------------------------------------------------
+# En orden de prioridad:
+#   1. BALLOT_AES_KEYS:       variable de entorno 'k2:<base64>,k1:<base64>' (+ BALLOT_AES_ACTIVE_KEY).
+#   2. BALLOT_KEYSTORE_PATH:  archivo JSON {"active": "k2", "keys": {"k1": "<base64>", ...}}
+#                             (lo crea y rota 'manage.py rotate_ballot_key').
+#   3. SOLO con DEBUG=True: una llave derivada de SECRET_KEY (kid 'sk1'), para desarrollo.
+#      SECRET_KEY tiene un valor por defecto en el repositorio: con esa llave cualquiera
+#      descifraría las papeletas. Con DEBUG=False y sin 1 ni 2 no hay llavero: el chequeo
+#      voting.E001 detiene migrate/runserver y cifrar un voto falla con un error claro.
+
+DERIVED_KEY_ID = 'sk1'
+
+
+def derive_key_from_secret(secret_key):
+    """Llave AES-256 estable derivada de SECRET_KEY (solo como respaldo)."""
+    return SHA256.new(b'ballot-aes:' + secret_key.encode('utf-8')).digest()
+
+
+def load_keystore(path):
+    with open(path, encoding='utf-8') as f:
+        return AESKeyRing.from_export(json.load(f))
+
+
+def save_keystore(path, key_ring):
+    # Archivo temporal + rename (nunca queda a medio escribir) y permisos solo para el dueño
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(key_ring.export(), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def rotate_keystore(path, base_ring=None):
+    """
+    Agrega una llave nueva al archivo y la vuelve la activa. Las anteriores se conservan
+    para seguir abriendo los votos viejos. Si el archivo no existe, arranca con las llaves
+    de 'base_ring' (ej. la derivada de SECRET_KEY) para no perderlas.
+    Regresa el llavero nuevo.
+    """
+    if os.path.exists(path):
+        keys = dict(load_keystore(path).keys)
+    else:
+        keys = dict(base_ring.keys) if base_ring else {}
+
+    number = len(keys) + 1
+    while f'k{number}' in keys:
+        number += 1
+    key_id = f'k{number}'
+    keys[key_id] = generate_aes_key()
+
+    key_ring = AESKeyRing(keys, key_id)
+    save_keystore(path, key_ring)
+    return key_ring
+
+
+def derived_key_ring():
+    """Llavero con solo la llave derivada de SECRET_KEY (desarrollo, o para importarla al rotar)."""
+    return AESKeyRing({DERIVED_KEY_ID: derive_key_from_secret(settings.SECRET_KEY)}, DERIVED_KEY_ID)
+
+
+def build_key_ring():
+    """Arma el llavero según la configuración (ver prioridades arriba); None si no hay ninguno."""
+    if settings.BALLOT_AES_KEYS:
+        return AESKeyRing.from_spec(settings.BALLOT_AES_KEYS, settings.BALLOT_AES_ACTIVE_KEY or None)
+    if settings.BALLOT_KEYSTORE_PATH and os.path.exists(settings.BALLOT_KEYSTORE_PATH):
+        return load_keystore(settings.BALLOT_KEYSTORE_PATH)
+    if settings.DEBUG:
+        return derived_key_ring()
+    return None
+
+
+def configure_key_ring():
+    """Carga el llavero y lo deja listo para encrypt_vote_aes(). Se llama desde VotingConfig.ready()."""
+    key_ring = build_key_ring()
+    set_key_ring(key_ring)
+    return key_ring
+
+
+def check_key_ring(app_configs=None, **kwargs):
+    """Chequeo de sistema: sin llavero (DEBUG=False y nada configurado) no se puede cifrar un solo voto."""
+    if has_key_ring():
+        return []
+    return [checks.Error(
+        "No hay llavero AES para cifrar las papeletas.",
+        hint="Define BALLOT_AES_KEYS o crea un llavero con 'manage.py rotate_ballot_key' (BALLOT_KEYSTORE_PATH). "
+             "La llave derivada de SECRET_KEY solo se usa con DEBUG=True.",
+        id='voting.E001',
+    )]
@@ -0,0 +1,199 @@
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+
+from .merkle import (
+    EMPTY_ROOT, append_leaf, inclusion_ranges, leaf_hash, pack_frontier, range_hash, receipt_digest,
+    root_from_frontier, subtree_nodes, unpack_frontier,
+)
+from .models import LedgerHead, LedgerNode, Vote
+
+# ---------------------------------------------------------
+# REGISTRO PÚBLICO DE PAPELETAS (solo-agregar)
+# ---------------------------------------------------------
+# Agregar una papeleta cuesta O(log n): se leen la frontera (una fila), se escriben
+# la hoja y los subárboles que se completan, y se guarda la raíz nueva.
+# Una prueba de inclusión lee O(log n) nodos con una sola consulta.
+#
+# La fila de estado (LedgerHead) es única para todas las elecciones. Por eso un voto NO
+# agrega su hoja dentro de su transacción (serializaría todos los votos en esa fila):
+# se guarda con ledger_index vacío y, al confirmarse, despierta al anexador del proceso,
+# que agrega de una vez TODAS las papeletas pendientes en una transacción corta.
+# La fila se bloquea una vez por lote, fuera de la ruta del voto.
+
+LEDGER_HEAD_ID = 1
+
+
+def _locked_head():
+    """Fila de estado del árbol, bloqueada hasta el COMMIT (crea la fila la primera vez)."""
+    head = LedgerHead.objects.select_for_update().filter(pk=LEDGER_HEAD_ID).first()
+    if head is not None:
+        return head
+    try:
+        with transaction.atomic():
+            LedgerHead.objects.create(pk=LEDGER_HEAD_ID, root=EMPTY_ROOT)
+    except IntegrityError:
+        pass  # Otro proceso la creó primero
+    return LedgerHead.objects.select_for_update().get(pk=LEDGER_HEAD_ID)
+
+
+def _append(head, signatures):
+    frontier = unpack_frontier(head.frontier)
+    first = size = head.size
+    nodes = []
+    for signature in signatures:
+        nodes.extend(
+            LedgerNode(level=level, position=position, hash=digest)
+            for level, position, digest in append_leaf(frontier, size, leaf_hash(receipt_digest(signature)))
+        )
+        size += 1
+    LedgerNode.objects.bulk_create(nodes)
+
+    head.size = size
+    head.frontier = pack_frontier(frontier)
+    head.root = root_from_frontier(frontier)
+    head.save(update_fields=['size', 'frontier', 'root', 'updated_at'])
+    return first
+
+
+def append_signatures(signatures):
+    """
+    Agrega las firmas (bytes) al registro, en orden, y regresa la posición de la primera.
+    Para cargas por lotes (diario, semillas) dentro de la transacción que guarda esos votos:
+    si se revierte, el árbol tampoco cambia. La fila de estado queda bloqueada hasta el COMMIT.
+    """
+    return _append(_locked_head(), signatures)
+
+
+def append_pending_ballots(batch_size=None):
+    """
+    Agrega al registro las papeletas confirmadas que aún no tienen hoja (ledger_index vacío),
+    en orden de id, en una transacción. Regresa cuántas agregó (0 = no quedaba ninguna).
+    """
+    batch_size = batch_size or settings.LEDGER_APPEND_BATCH
+    with transaction.atomic():
+        # Primero el candado: otro anexador que terminó antes ya no deja pendientes repetidas
+        head = _locked_head()
+        pending = list(
+            Vote.objects.filter(ledger_index__isnull=True).order_by('id')
+            .values_list('id', 'digital_signature')[:batch_size]
+        )
+        if not pending:
+            return 0
+        first = _append(head, (bytes(signature) for vote_id, signature in pending))
+        Vote.objects.bulk_update(
+            [Vote(id=vote_id, ledger_index=first + offset) for offset, (vote_id, signature) in enumerate(pending)],
+            ['ledger_index'],
+        )
+    return len(pending)
+
+
+def append_all_pending():
+    """Vacía la lista de pendientes (lotes de LEDGER_APPEND_BATCH). Regresa cuántas agregó."""
+    total = 0
+    while True:
+        appended = append_pending_ballots()
+        if not appended:
+            return total
+        total += appended
+
+
+class LedgerAppender:
+    """Hilo de UN proceso que agrega al registro las papeletas que se van confirmando."""
+
+    def __init__(self):
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.last_error = None
+
+    def notify(self):
+        """Hay papeletas nuevas (llamar en transaction.on_commit)."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='ledger-appender', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            # Se limpia ANTES de leer las pendientes: un aviso que llega durante el lote provoca otra vuelta
+            self._wake.clear()
+            try:
+                append_all_pending()
+                self.last_error = None
+            except Exception as e:
+                # Los votos ya están guardados; solo su hoja espera: el siguiente voto
+                # (o la consulta de ese comprobante, ver ensure_in_ledger) lo vuelve a intentar
+                self.last_error = str(e)
+            finally:
+                close_old_connections()
+
+
+_appender = LedgerAppender()
+
+
+def schedule_ledger_append():
+    """Despierta al anexador del proceso. Se llama en on_commit de cada voto."""
+    _appender.notify()
+
+
+def ensure_in_ledger(signature):
+    """
+    Consulta pública de un comprobante recién confirmado cuya hoja aún no se agrega
+    (o que dejó pendiente un proceso que terminó): se agregan las pendientes en el momento.
+    """
+    if Vote.objects.filter(receipt_digest=receipt_digest(signature), ledger_index__isnull=True).exists():
+        append_all_pending()
+
+
+def get_ledger_root():
+    """Regresa (tamaño, raíz) del árbol publicado."""
+    head = LedgerHead.objects.filter(pk=LEDGER_HEAD_ID).values_list('size', 'root').first()
+    if head is None:
+        return 0, EMPTY_ROOT
+    size, root = head
+    return size, bytes(root)
+
+
+def find_leaf_index(signature):
+    """Posición de la papeleta con esta firma (bytes) o None. Una búsqueda por índice."""
+    return (
+        LedgerNode.objects.filter(level=0, hash=leaf_hash(receipt_digest(signature)))
+        .values_list('position', flat=True).first()
+    )
+
+
+def _load_nodes(keys):
+    condition = Q()
+    for level, position in keys:
+        condition |= Q(level=level, position=position)
+    return {
+        (level, position): bytes(digest)
+        for level, position, digest in LedgerNode.objects.filter(condition).values_list('level', 'position', 'hash')
+    }
+
+
+def inclusion_proof(signature):
+    """
+    Prueba de inclusión de una firma contra la raíz actual, o None si no está en el registro.
+    Regresa {'index', 'size', 'leaf', 'path', 'root'} con los hashes en bytes.
+    """
+    index = find_leaf_index(signature)
+    if index is None:
+        return None
+    # Primero la raíz: los nodos que cubre ya existen y nunca cambian,
+    # aunque otros votos se agreguen mientras armamos la prueba.
+    size, root = get_ledger_root()
+    ranges = inclusion_ranges(index, size)
+    nodes = _load_nodes({key for start, end in ranges for key in subtree_nodes(start, end)})
+    return {
+        'index': index,
+        'size': size,
+        'leaf': leaf_hash(receipt_digest(signature)),
+        'path': [range_hash(start, end, nodes) for start, end in ranges],
+        'root': root,
+    }
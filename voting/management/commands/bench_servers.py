@@ -0,0 +1,144 @@
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from importlib.util import find_spec
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+# Perfiles de despliegue: (nombre, aplicación, argumentos extra de gunicorn, ASYNC_VIEWS)
+PROFILES = (
+    ('wsgi', 'voting_project.wsgi:application', [], 'False'),
+    ('asgi', 'voting_project.asgi:application', ['-k', 'uvicorn.workers.UvicornWorker'], 'True'),
+)
+
+
+def _free_port(host):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url, timeout):
+    # El servidor está listo cuando responde la portada (cualquier código HTTP sirve)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urlopen(url, timeout=2):
+                return True
+        except URLError as e:
+            if getattr(e, 'code', None):
+                return True
+            time.sleep(0.2)
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+class Command(BaseCommand):
+    """
+    Compara el mismo flujo de votación servido por gunicorn (WSGI, vistas síncronas)
+    y por gunicorn + Uvicorn (ASGI, ASYNC_VIEWS=True y pool de procesos criptográficos).
+
+    Levanta cada servidor en un puerto libre contra la MISMA base de datos, corre
+    load_test contra él y lo apaga. Crea usuarios reales: úsese solo con una base de pruebas.
+
+    Uso:
+        python manage.py bench_servers --voters 200 --concurrency 40 --workers 2
+        python manage.py bench_servers --only asgi --crypto-workers 4 --output servidores.json
+    """
+    help = "Benchmark lado a lado: gunicorn WSGI contra gunicorn + Uvicorn (ASGI) con load_test."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=100, help="Votantes por servidor.")
+        parser.add_argument('--concurrency', type=int, default=20, help="Votantes simultáneos.")
+        parser.add_argument('--workers', type=int, default=2, help="Procesos de gunicorn por servidor.")
+        parser.add_argument('--crypto-workers', type=int, default=settings.CRYPTO_POOL_WORKERS,
+                            help="CRYPTO_POOL_WORKERS de cada proceso ASGI.")
+        parser.add_argument('--only', choices=[name for name, *_ in PROFILES], help="Medir un solo perfil.")
+        parser.add_argument('--election', default=settings.DEFAULT_ELECTION, help="Slug de la elección.")
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--ready-timeout', type=float, default=30, help="Segundos para que arranque cada servidor.")
+        parser.add_argument('--output', help="Archivo donde guardar el JSON.")
+
+    def handle(self, *args, **options):
+        if find_spec('gunicorn') is None:
+            raise CommandError("Se necesita gunicorn (pip install -r requirements.txt).")
+        if find_spec('uvicorn') is None and options['only'] != 'wsgi':
+            raise CommandError("El perfil ASGI necesita uvicorn (pip install -r requirements.txt).")
+
+        reports = {}
+        for name, application, extra_args, async_views in PROFILES:
+            if options['only'] and name != options['only']:
+                continue
+            self.stderr.write(f"[{name}] iniciando {application}...")
+            reports[name] = self._run_profile(name, application, extra_args, async_views, options)
+
+        self._print_table(reports)
+        payload = json.dumps(reports, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(payload + '\n')
+        self.stdout.write(payload)
+
+    def _run_profile(self, name, application, extra_args, async_views, options):
+        port = _free_port(options['host'])
+        base_url = f"http://{options['host']}:{port}"
+        env = {
+            **os.environ,
+            'ASYNC_VIEWS': async_views,
+            'CRYPTO_POOL_WORKERS': str(options['crypto_workers']),
+        }
+        command = [
+            sys.executable, '-m', 'gunicorn', application,
+            '--bind', f"{options['host']}:{port}", '--workers', str(options['workers']),
+            *extra_args,
+        ]
+        # El log del servidor va a un archivo temporal (un PIPE sin leer lo bloquearía)
+        with tempfile.TemporaryFile() as log:
+            server = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+            try:
+                if not _wait_ready(f"{base_url}/", options['ready_timeout']):
+                    log.seek(0)
+                    raise CommandError(
+                        f"[{name}] el servidor no respondió en {options['ready_timeout']} s:\n"
+                        + log.read().decode('utf-8', 'replace')[-2000:]
+                    )
+                out = io.StringIO()
+                call_command(
+                    'load_test', url=base_url, voters=options['voters'], concurrency=options['concurrency'],
+                    election=options['election'], stdout=out,
+                )
+                report = json.loads(out.getvalue())
+            finally:
+                server.terminate()
+                try:
+                    server.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+                    server.wait()
+        report['meta'].update({
+            'server': application, 'workers': options['workers'], 'async_views': async_views == 'True',
+            'crypto_workers': options['crypto_workers'] if async_views == 'True' else None,
+        })
+        return report
+
+    def _print_table(self, reports):
+        header = f"{'perfil':<6} {'votos/s':>9} {'voto p50':>10} {'voto p95':>10} {'llaves p50':>11} {'errores':>8}"
+        self.stderr.write(header)
+        self.stderr.write('-' * len(header))
+        for name, report in reports.items():
+            vote = report['steps'].get('vote', {})
+            keys = report['steps'].get('generate_keys', {})
+            self.stderr.write(
+                f"{name:<6} {report['votes_per_second'] or 0:>9.2f} {vote.get('p50_ms', 0):>8.1f}ms "
+                f"{vote.get('p95_ms', 0):>8.1f}ms {keys.get('p50_ms', 0):>9.1f}ms {sum(report['errors'].values()):>8}"
+            )
@@ -0,0 +1,67 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from voting.crypto_utils import PUBLIC_KEY_CACHE, SIGNATURE_SCHEMES, sign_vote, verify_signature
+
+
+def _time_ms(func, iterations):
+    """Ejecuta func() varias veces y regresa el promedio en milisegundos."""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) * 1000 / iterations
+
+
+class Command(BaseCommand):
+    """
+    Compara el costo de cada esquema de firma registrado en crypto_utils.
+
+    Uso:
+        python manage.py bench_signatures
+        python manage.py bench_signatures --keygen 10 --iterations 200 --json
+    """
+    help = "Mide generación de llaves, firma y verificación para cada esquema de firma."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keygen', type=int, default=5, help="Llaves a generar por esquema.")
+        parser.add_argument('--iterations', type=int, default=50, help="Firmas/verificaciones por esquema.")
+        parser.add_argument('--json', action='store_true', help="Imprime los resultados en JSON.")
+
+    def handle(self, *args, **options):
+        vote_content = "USUARIO:bench@ejemplo.com|P1:ALTO|P2:FACIL|P3:MUCHO|P4:RAPIDO"
+        results = {}
+
+        for name, scheme in SIGNATURE_SCHEMES.items():
+            keygen_ms = _time_ms(scheme.generate_keys, options['keygen'])
+            public_key_pem, private_key_pem = scheme.generate_keys()
+            signature = sign_vote(vote_content, private_key_pem, name)
+
+            results[name] = {
+                'keygen_ms': round(keygen_ms, 3),
+                'sign_ms': round(_time_ms(lambda: sign_vote(vote_content, private_key_pem, name), options['iterations']), 3),
+                'verify_ms': round(_time_ms(
+                    lambda: verify_signature(vote_content, signature, public_key_pem, name), options['iterations']
+                ), 3),
+                # Misma verificación, pero con la llave ya leída en PUBLIC_KEY_CACHE
+                'verify_cached_ms': round(_time_ms(
+                    lambda: verify_signature(vote_content, signature, public_key_pem, name, cache_key=('bench', name)),
+                    options['iterations']
+                ), 3),
+                'signature_bytes': len(signature),
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps({**results, 'public_key_cache': PUBLIC_KEY_CACHE.stats()}, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'Esquema':<16}{'Llaves (ms)':>14}{'Firma (ms)':>14}{'Verif. (ms)':>14}{'Caché (ms)':>14}{'Bytes':>8}"
+        )
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<16}{row['keygen_ms']:>14.3f}{row['sign_ms']:>14.3f}{row['verify_ms']:>14.3f}"
+                f"{row['verify_cached_ms']:>14.3f}{row['signature_bytes']:>8}"
+            )
+        self.stdout.write(f"Caché de llaves públicas: {PUBLIC_KEY_CACHE.stats()}")
@@ -0,0 +1,89 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from voting.benchmarks import (
+    benchmark_metadata, compare_results, run_aggregation_benchmarks, run_crypto_benchmarks,
+    run_homomorphic_benchmarks, run_metrics_benchmarks,
+)
+
+
+def _parse_sizes(value):
+    try:
+        return [int(size) for size in value.split(',') if size.strip()]
+    except ValueError:
+        raise CommandError(f"--sizes inválido: '{value}' (ej. 1000,100000,1000000)")
+
+
+class Command(BaseCommand):
+    """
+    Suite de micro-benchmarks del flujo de votación.
+
+    Uso:
+        python manage.py bench_voting --output bench.json
+        python manage.py bench_voting --sizes 1000,100000,1000000 --output bench.json
+        python manage.py bench_voting --baseline bench.json --threshold 0.2   # Falla si algo empeora >20 %
+        python manage.py bench_voting --only crypto
+        python manage.py bench_voting --only metrics   # Costo de span() con y sin muestreo
+        python manage.py bench_voting --only homomorphic --sizes 100000   # Conteo cifrado aditivo
+
+    Las papeletas sintéticas se insertan dentro de una transacción que se revierte.
+    """
+    help = "Mide llaves, firma, verificación, cifrado, parseo y conteo del tablero; emite JSON comparable."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=['crypto', 'metrics', 'homomorphic', 'aggregation'], help="Ejecuta solo un grupo.")
+        parser.add_argument('--iterations', type=int, default=50, help="Repeticiones por medición criptográfica.")
+        parser.add_argument('--keygen', type=int, default=5, help="Llaves RSA a generar.")
+        parser.add_argument('--sizes', type=_parse_sizes, default=[1000, 100000],
+                            help="Papeletas sintéticas para el conteo, separadas por coma (ej. 1000,100000,1000000).")
+        parser.add_argument('--aggregation-iterations', type=int, default=5, help="Repeticiones por conteo.")
+        parser.add_argument('--output', help="Archivo donde guardar el JSON (por defecto, la salida estándar).")
+        parser.add_argument('--baseline', help="JSON de una corrida anterior para comparar.")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Empeoramiento máximo tolerado frente a --baseline (0.2 = 20 %%).")
+        parser.add_argument('--metric', default='p50_ms', choices=['mean_ms', 'p50_ms', 'p95_ms'],
+                            help="Medida usada para comparar.")
+
+    def handle(self, *args, **options):
+        results = {}
+        if options['only'] in (None, 'crypto'):
+            results.update(run_crypto_benchmarks(options['iterations'], options['keygen']))
+        if options['only'] in (None, 'metrics'):
+            results.update(run_metrics_benchmarks(options['iterations']))
+        if options['only'] in (None, 'homomorphic'):
+            results.update(run_homomorphic_benchmarks(options['sizes'], options['iterations']))
+        if options['only'] in (None, 'aggregation'):
+            results.update(run_aggregation_benchmarks(options['sizes'], options['aggregation_iterations']))
+
+        report = {
+            'meta': benchmark_metadata(iterations=options['iterations'], sizes=options['sizes']),
+            'results': results,
+        }
+        payload = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(payload + '\n')
+            self.stderr.write(f"Resultados guardados en {options['output']}")
+        else:
+            self.stdout.write(payload)
+
+        if not options['baseline']:
+            return
+
+        try:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)['results']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"No se pudo leer la línea base '{options['baseline']}': {e}")
+
+        regressions = compare_results(results, baseline, options['threshold'], options['metric'])
+        if regressions:
+            for name, before, after, change in regressions:
+                self.stderr.write(self.style.ERROR(
+                    f"REGRESIÓN {name}: {before:.4f} -> {after:.4f} ms ({change:+.1%})"
+                ))
+            raise CommandError(f"{len(regressions)} mediciones empeoraron más de {options['threshold']:.0%}.")
+        self.stderr.write(self.style.SUCCESS(
+            f"Sin regresiones frente a {options['baseline']} (umbral {options['threshold']:.0%})."
+        ))
@@ -0,0 +1,92 @@
+import json
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from voting.elections import enroll_voters
+from voting.homomorphic import generate_tally_keys
+from voting.models import Election, VoterProfile
+
+
+class Command(BaseCommand):
+    """
+    Da de alta una elección nueva con su boleta.
+
+    La boleta sale de un archivo JSON (lista de preguntas, formato en models.py)
+    o se copia de otra elección. Con inscripción cerrada solo votan quienes estén
+    en el padrón: --enroll-all inscribe a todos los votantes registrados.
+    Con --encrypted-tally la elección usa conteo cifrado aditivo: la llave secreta
+    se escribe en ese archivo (para quien escruta) y el servidor solo guarda la pública.
+
+    Uso:
+        python manage.py create_election --slug consejo-2026 --name "Consejo 2026" --questions boleta.json
+        python manage.py create_election --slug encuesta-2 --name "Encuesta 2" --copy-from encuesta-catedra
+        python manage.py create_election --slug cerrada --name "Cerrada" --copy-from encuesta-catedra \\
+            --closed-enrollment --enroll-all
+        python manage.py create_election --slug secreta --name "Secreta" --copy-from encuesta-catedra \
+            --encrypted-tally escrutinio.pem
+    """
+    help = "Crea una elección (boleta desde JSON o copiada de otra elección)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slug', required=True, help="Identificador corto para las URLs.")
+        parser.add_argument('--name', required=True, help="Nombre visible de la elección.")
+        parser.add_argument('--description', default='', help="Texto bajo el título de la boleta.")
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--questions', help="Archivo JSON con la lista de preguntas.")
+        source.add_argument('--copy-from', help="Slug de la elección cuya boleta se copia.")
+        parser.add_argument('--closed-enrollment', action='store_true',
+                            help="Solo votan quienes estén en el padrón.")
+        parser.add_argument('--enroll-all', action='store_true',
+                            help="Inscribe en el padrón a todos los votantes registrados.")
+        parser.add_argument('--encrypted-tally', metavar='SECRET_KEY_FILE',
+                            help="Activa el conteo cifrado y guarda la llave secreta en este archivo (no debe existir).")
+
+    def handle(self, *args, **options):
+        if Election.objects.filter(slug=options['slug']).exists():
+            raise CommandError(f"Ya existe la elección '{options['slug']}'.")
+
+        if options['questions']:
+            try:
+                with open(options['questions'], encoding='utf-8') as f:
+                    questions = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer la boleta: {e}")
+        else:
+            source = Election.objects.filter(slug=options['copy_from']).first()
+            if source is None:
+                raise CommandError(f"No existe la elección '{options['copy_from']}'.")
+            questions = source.questions
+
+        election = Election(
+            slug=options['slug'], name=options['name'], description=options['description'],
+            questions=questions, open_enrollment=not options['closed_enrollment'],
+        )
+        try:
+            election.full_clean()
+        except ValidationError as e:
+            raise CommandError(f"Boleta inválida: {e}")
+
+        if options['encrypted_tally']:
+            election.tally_public_key, secret_key_pem = generate_tally_keys()
+            try:
+                # Solo el dueño puede leerla; nunca sobreescribimos una llave existente
+                fd = os.open(options['encrypted_tally'], os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, 'w') as f:
+                    f.write(secret_key_pem)
+            except OSError as e:
+                raise CommandError(f"No se pudo escribir la llave secreta: {e}")
+        election.save()  # Con conteo cifrado, su agregado vacío se crea junto (models.create_encrypted_tally)
+        if election.encrypted_tally:
+            self.stdout.write(
+                f"Conteo cifrado activo: llave secreta en {options['encrypted_tally']} (guárdala fuera del servidor)."
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Elección '{election.slug}' creada con {len(election.question_keys)} preguntas."
+        ))
+
+        if options['enroll_all']:
+            profile_ids = list(VoterProfile.objects.values_list('id', flat=True))
+            enroll_voters(election, profile_ids)
+            self.stdout.write(f"Padrón: {len(profile_ids)} votantes inscritos.")
@@ -0,0 +1,115 @@
+import json
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from voting.audit_utils import chunked, init_key_ring, tally_encrypted_rows
+from voting.ballot_utils import count_votes_from_ballots, parse_vote_content
+from voting.crypto_utils import get_key_ring
+from voting.models import Election, Vote
+
+
+class Command(BaseCommand):
+    """
+    Cuenta los votos a partir de los CIFRADOS (Vote.encrypted_vote), no del texto plano.
+
+    - Lee los votos en bloques ordenados por id (iterator(), memoria constante).
+    - Reparte el descifrado entre varios procesos; cada uno recibe el llavero AES.
+    - Con --check compara el resultado contra las respuestas guardadas (BallotAnswer).
+
+    Uso:
+        python manage.py decrypt_ballots
+        python manage.py decrypt_ballots --workers 8 --chunk-size 10000 --check
+        python manage.py decrypt_ballots --election mi-eleccion
+    """
+    help = "Descifra en paralelo todos los votos y cuenta los resultados desde los cifrados."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Procesos de descifrado.")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Votos por bloque enviado a cada proceso.")
+        parser.add_argument('--failures', default='decrypt_ballots.failures.jsonl',
+                            help="Archivo JSON Lines con un renglón por cada voto que no se pudo descifrar.")
+        parser.add_argument('--check', action='store_true',
+                            help="Compara contra las respuestas guardadas y falla si no coinciden.")
+        parser.add_argument('--json', action='store_true', help="Imprime el resultado en JSON.")
+        parser.add_argument('--election', default=settings.DEFAULT_ELECTION, help="Slug de la elección a contar.")
+
+    def handle(self, *args, **options):
+        try:
+            election = Election.objects.get(slug=options['election'])
+        except Election.DoesNotExist:
+            raise CommandError(f"No existe la elección '{options['election']}'.")
+
+        started = time.monotonic()
+        rows = (
+            Vote.objects.filter(election=election).order_by('id').values_list('id', 'encrypted_vote')
+            .iterator(chunk_size=options['chunk_size'])
+        )
+
+        ballots = Counter()
+        decrypted = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_key_ring,
+                                 initargs=(get_key_ring().export(),)) as executor, \
+                open(options['failures'], 'w', encoding='utf-8') as failures_file:
+            pending = deque()
+            max_in_flight = options['workers'] * 2
+
+            def collect(result):
+                nonlocal decrypted, failed
+                ballots.update(result['ballots'])
+                decrypted += result['decrypted']
+                failed += len(result['failures'])
+                for failure in result['failures']:
+                    failures_file.write(json.dumps(failure) + '\n')
+
+            for chunk in chunked(rows, options['chunk_size']):
+                pending.append(executor.submit(tally_encrypted_rows, chunk))
+                while len(pending) >= max_in_flight:
+                    collect(pending.popleft().result())
+            while pending:
+                collect(pending.popleft().result())
+
+        # Las combinaciones de respuestas son pocas: se parsean aquí una sola vez cada una
+        # (los encabezados USUARIO/ELECCION no son respuestas y se descartan)
+        counts = Counter()
+        for ballot, total in ballots.items():
+            for item in parse_vote_content(ballot).items():
+                counts[item] += total
+
+        summary = {
+            'election': election.slug,
+            'decrypted': decrypted,
+            'failed': failed,
+            'seconds': round(time.monotonic() - started, 2),
+            'failures_file': options['failures'],
+            'results': {
+                key: {option: total for (question, option), total in sorted(counts.items()) if question == key}
+                for key in election.question_keys
+            },
+        }
+        differences = None
+        if options['check']:
+            stored = count_votes_from_ballots(election)
+            differences = {
+                f'{question}:{option}': {'cifrados': counts.get((question, option), 0), 'guardados': stored.get((question, option), 0)}
+                for question, option in set(counts) | set(stored)
+                if counts.get((question, option), 0) != stored.get((question, option), 0)
+            }
+            summary['differences'] = differences
+
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2))
+        else:
+            self.stdout.write(f"Votos descifrados: {decrypted} en {summary['seconds']} s (fallidos: {failed})")
+            for key, options_count in summary['results'].items():
+                for option, total in options_count.items():
+                    self.stdout.write(f"  {key} {election.get_label(key, option):<14} {total}")
+            if failed:
+                self.stdout.write(self.style.WARNING(f"Votos que no se pudieron descifrar: {options['failures']}"))
+
+        if differences:
+            raise CommandError(f"El conteo de los cifrados no coincide con las respuestas guardadas: {differences}")
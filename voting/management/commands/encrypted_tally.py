@@ -0,0 +1,83 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from voting.ballot_utils import get_tally_results
+from voting.encrypted_tally import decrypt_tally, rebuild_encrypted_tally
+from voting.models import Election
+
+
+class Command(BaseCommand):
+    """
+    Escrutinio de una elección con conteo cifrado aditivo.
+
+    Descifra el agregado de cada opción (una operación por opción, sin descifrar papeletas)
+    con la llave secreta que generó create_election --encrypted-tally.
+
+    Uso:
+        python manage.py encrypted_tally --election secreta --secret-key escrutinio.pem
+        python manage.py encrypted_tally --election secreta --secret-key escrutinio.pem --check --json
+        python manage.py encrypted_tally --election secreta --rebuild   # Re-suma las papeletas (no necesita la llave)
+    """
+    help = "Descifra el conteo cifrado de una elección (y opcionalmente lo reconstruye desde las papeletas)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--election', required=True, help="Slug de la elección.")
+        parser.add_argument('--secret-key', help="Archivo PEM con la llave secreta del conteo.")
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Re-suma los cifrados de todas las papeletas y reemplaza el agregado si difiere.")
+        parser.add_argument('--check', action='store_true',
+                            help="Falla si el conteo descifrado no coincide con los contadores del tablero.")
+        parser.add_argument('--json', action='store_true', help="Imprime el resultado como JSON.")
+
+    def handle(self, *args, **options):
+        election = Election.objects.filter(slug=options['election']).first()
+        if election is None:
+            raise CommandError(f"No existe la elección '{options['election']}'.")
+        if not election.encrypted_tally:
+            raise CommandError(f"La elección '{election.slug}' no usa conteo cifrado.")
+        if not options['secret_key'] and not options['rebuild']:
+            raise CommandError("Indica --secret-key para descifrar o --rebuild para reconstruir.")
+
+        if options['rebuild']:
+            self.rebuild(election)
+        if not options['secret_key']:
+            return
+
+        try:
+            with open(options['secret_key'], encoding='utf-8') as f:
+                secret_key_pem = f.read()
+            counts, ballots = decrypt_tally(election, secret_key_pem)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"No se pudo descifrar el conteo: {e}")
+
+        if options['json']:
+            results = {}
+            for (question, option), count in counts.items():
+                results.setdefault(question, {})[option] = count
+            self.stdout.write(json.dumps({'election': election.slug, 'ballots': ballots, 'results': results}))
+        else:
+            self.stdout.write(f"[{election.slug}] {ballots} papeletas en el conteo cifrado:")
+            for (question, option), count in counts.items():
+                self.stdout.write(f"  {question}:{option} = {count}")
+
+        if options['check']:
+            stored = {
+                (question, option): count
+                for question, rows in get_tally_results(election).items() for option, count in rows
+            }
+            drift = [(slot, count, stored.get(slot, 0)) for slot, count in counts.items() if count != stored.get(slot, 0)]
+            for (question, option), decrypted, saved in drift:
+                self.stderr.write(f"  {question}:{option}: cifrado={decrypted} tablero={saved}")
+            if drift:
+                raise CommandError(f"{len(drift)} opciones no coinciden con los contadores del tablero.")
+            self.stderr.write(self.style.SUCCESS("El conteo cifrado coincide con los contadores del tablero."))
+
+    def rebuild(self, election):
+        ballots, changed = rebuild_encrypted_tally(election)
+        if changed:
+            self.stdout.write(self.style.WARNING(
+                f"[{election.slug}] Agregado cifrado reconstruido desde {ballots} papeletas."
+            ))
+        else:
+            self.stdout.write(f"[{election.slug}] Agregado cifrado sin diferencias ({ballots} papeletas).")
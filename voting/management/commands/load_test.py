@@ -0,0 +1,205 @@
+import json
+import random
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode, urljoin
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from voting.benchmarks import summarize
+from voting.models import Election
+
+# Pasos del flujo de un votante, en orden
+STEPS = ('register', 'login', 'generate_keys', 'vote')
+
+PASSWORD = 'Carga#2024x'
+
+
+class _NoRedirect(HTTPRedirectHandler):
+    # Queremos medir cada petición por separado: un 302 cuenta como respuesta válida
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """Navegador mínimo sobre urllib: cookies de sesión y token CSRF."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/') + '/'
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies), _NoRedirect())
+
+    def _csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                return response.status, response.read()
+        except HTTPError as e:
+            return e.code, e.read()
+
+    def get(self, path):
+        return self._open(Request(urljoin(self.base_url, path.lstrip('/'))))
+
+    def post(self, path, data, files=None):
+        url = urljoin(self.base_url, path.lstrip('/'))
+        token = self._csrf_token()
+        data = {**data, 'csrfmiddlewaretoken': token}
+        headers = {'X-CSRFToken': token, 'Referer': url}
+        if files:
+            boundary = uuid.uuid4().hex
+            body = self._multipart(boundary, data, files)
+            headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+        else:
+            body = urlencode(data).encode('utf-8')
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        return self._open(Request(url, data=body, headers=headers, method='POST'))
+
+    @staticmethod
+    def _multipart(boundary, data, files):
+        lines = []
+        for name, value in data.items():
+            lines += [f'--{boundary}', f'Content-Disposition: form-data; name="{name}"', '', str(value)]
+        parts = '\r\n'.join(lines).encode('utf-8') + b'\r\n'
+        for name, (filename, content) in files.items():
+            parts += (
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                'Content-Type: application/octet-stream\r\n\r\n'
+            ).encode('utf-8') + content + b'\r\n'
+        return parts + f'--{boundary}--\r\n'.encode('utf-8')
+
+
+class ClientSession:
+    """Mismo flujo con el cliente de pruebas de Django (en proceso, sin servidor)."""
+
+    def __init__(self):
+        self.client = Client()
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.content
+
+    def post(self, path, data, files=None):
+        if files:
+            data = dict(data)
+            for name, (filename, content) in files.items():
+                data[name] = SimpleUploadedFile(filename, content)
+        response = self.client.post(path, data)
+        return response.status_code, response.content
+
+
+def run_voter(session, email, rng, election):
+    """
+    Un votante completo: registro -> login -> generar llaves -> votar en 'election'.
+    Regresa {paso: ms} y el primer error (o None).
+    """
+    timings = {}
+
+    def step(name, expected, func):
+        started = time.perf_counter()
+        status, body = func()
+        timings[name] = (time.perf_counter() - started) * 1000
+        if status not in expected:
+            raise RuntimeError(f"{name}: HTTP {status}")
+        return body
+
+    try:
+        session.get('/register/')  # Obtiene la cookie CSRF
+        step('register', (302,), lambda: session.post('/register/', {
+            'email': email, 'password': PASSWORD, 'confirm_password': PASSWORD,
+        }))
+        step('login', (302,), lambda: session.post('/login/', {'username': email, 'password': PASSWORD}))
+        private_key = step('generate_keys', (200,), lambda: session.post('/voting/generate-keys/', {}))
+        answers = {
+            f'pregunta_{index}': rng.choice(list(options))
+            for index, options in enumerate(election.question_options.values(), start=1)
+        }
+        step('vote', (302,), lambda: session.post(
+            f'/voting/elecciones/{election.slug}/vote/', answers, files={'private_key': ('votante.key', private_key)}
+        ))
+    except Exception as e:
+        return timings, str(e)
+    return timings, None
+
+
+class Command(BaseCommand):
+    """
+    Generador de carga local: repite el flujo registro -> llaves -> voto con muchos votantes.
+
+    Uso:
+        python manage.py load_test --url http://127.0.0.1:8000 --voters 200 --concurrency 20
+        python manage.py load_test --voters 20           # Sin servidor: cliente de pruebas de Django
+
+    Crea usuarios reales (carga-<corrida>-<n>@carga.test): úsese solo contra una base de pruebas.
+    """
+    help = "Reproduce flujos completos de votación contra runserver/gunicorn y reporta latencias (JSON)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="URL base del servidor. Sin ella se usa el cliente de pruebas de Django.")
+        parser.add_argument('--voters', type=int, default=50, help="Votantes a simular.")
+        parser.add_argument('--concurrency', type=int, default=10, help="Votantes simultáneos (hilos).")
+        parser.add_argument('--seed', type=int, default=0, help="Semilla para las respuestas aleatorias.")
+        parser.add_argument('--election', default=settings.DEFAULT_ELECTION,
+                            help="Slug de la elección (debe tener inscripción abierta).")
+        parser.add_argument('--output', help="Archivo donde guardar el JSON (por defecto, la salida estándar).")
+
+    def handle(self, *args, **options):
+        if options['voters'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--voters y --concurrency deben ser mayores que cero.")
+        # La boleta se lee de la base local: con --url debe ser la misma que usa el servidor
+        election = Election.objects.filter(slug=options['election']).first()
+        if election is None:
+            raise CommandError(f"No existe la elección '{options['election']}'.")
+
+        run_id = uuid.uuid4().hex[:8]
+        make_session = (lambda: HttpSession(options['url'])) if options['url'] else ClientSession
+
+        def one(index):
+            rng = random.Random(options['seed'] + index)
+            return run_voter(make_session(), f'carga-{run_id}-{index}@carga.test', rng, election)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            outcomes = list(executor.map(one, range(options['voters'])))
+        elapsed = time.perf_counter() - started
+
+        samples = defaultdict(list)
+        errors = defaultdict(int)
+        for timings, error in outcomes:
+            for name, value in timings.items():
+                samples[name].append(value)
+            if error:
+                errors[error] += 1
+        completed = sum(1 for timings, error in outcomes if error is None)
+
+        report = {
+            'meta': {
+                'run_id': run_id,
+                'target': options['url'] or 'django.test.Client',
+                'election': election.slug,
+                'voters': options['voters'],
+                'concurrency': options['concurrency'],
+                'elapsed_s': round(elapsed, 3),
+            },
+            'completed': completed,
+            'votes_per_second': round(completed / elapsed, 3) if elapsed else None,
+            'steps': {name: summarize(samples[name]) for name in STEPS if samples[name]},
+            'errors': dict(errors),
+        }
+        payload = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(payload + '\n')
+        self.stdout.write(payload)
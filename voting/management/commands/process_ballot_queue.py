@@ -0,0 +1,77 @@
+import json
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from voting.ballot_queue import claim_next_submission, process_submission, queue_stats, reclaim_stale_submissions
+
+
+def run_worker(poll_interval, drain_only):
+    """Bucle de un worker: reclama una solicitud, la procesa y repite."""
+    # Cada proceso debe abrir su propia conexión a la base de datos
+    connections.close_all()
+    while True:
+        submission_id = claim_next_submission()
+        if submission_id is None:
+            if drain_only:
+                return
+            time.sleep(poll_interval)
+            continue
+        try:
+            process_submission(submission_id)
+        except Exception:
+            # El error ya quedó registrado en la solicitud; el worker sigue con la siguiente
+            pass
+
+
+class Command(BaseCommand):
+    """
+    Workers locales de la cola de votos (modo BALLOT_INGESTION_MODE = 'queue').
+    Hacen la firma, verificación, cifrado y guardado fuera del hilo de la petición.
+
+    Uso:
+        python manage.py process_ballot_queue --workers 4
+        python manage.py process_ballot_queue --once     # Vacía la cola y termina
+        python manage.py process_ballot_queue --stats    # Profundidad y latencias por etapa (JSON)
+    """
+    help = "Procesa en segundo plano los votos encolados por vote_submission_view."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Número de procesos worker.")
+        parser.add_argument('--poll-interval', type=float, default=0.2, help="Segundos de espera cuando la cola está vacía.")
+        parser.add_argument('--reclaim-after', type=int, default=300,
+                            help="Segundos tras los cuales una solicitud 'processing' se considera abandonada.")
+        parser.add_argument('--once', action='store_true', help="Procesa lo pendiente y termina.")
+        parser.add_argument('--stats', action='store_true', help="Muestra las métricas de la cola y termina.")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(queue_stats(), indent=2))
+            return
+
+        reclaimed = reclaim_stale_submissions(options['reclaim_after'])
+        if reclaimed:
+            self.stdout.write(self.style.WARNING(f"Se reencolaron {reclaimed} solicitudes abandonadas."))
+
+        if options['workers'] <= 1:
+            run_worker(options['poll_interval'], options['once'])
+            return
+
+        # Cerramos la conexión del padre ANTES de crear los procesos (no se comparte entre procesos)
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=run_worker, args=(options['poll_interval'], options['once']), daemon=True)
+            for _ in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"{len(workers)} workers procesando la cola de votos...")
+
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
@@ -0,0 +1,131 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from voting.ballot_utils import count_votes_from_ballots
+from voting.models import Election, TurnoutBucket, VoteTally
+from voting.results_cache import bump_results_version
+from voting.turnout import count_turnout_from_ballots
+
+
+class Command(BaseCommand):
+    """
+    Reconstruye la tabla de contadores (VoteTally) de cada elección a partir de las
+    respuestas guardadas de cada papeleta (BallotAnswer), con un GROUP BY por elección.
+    Antes de escribir, reporta cualquier diferencia ("drift") entre ambos.
+    También revisa la participación por minuto y por hora (TurnoutBucket) contra la fecha de cada papeleta.
+
+    Uso:
+        python manage.py rebuild_tallies                       # Reporta y corrige todas
+        python manage.py rebuild_tallies --election mi-eleccion
+        python manage.py rebuild_tallies --check               # Solo reporta (falla si hay diferencias)
+    """
+    help = "Reconstruye los contadores del tablero desde la tabla de votos y reporta diferencias."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="No modifica nada; termina con error si los contadores no coinciden con los votos.",
+        )
+        parser.add_argument('--election', help="Slug de la elección (por defecto, todas).")
+
+    def handle(self, *args, **options):
+        elections = Election.objects.order_by('id')
+        if options['election']:
+            elections = elections.filter(slug=options['election'])
+            if not elections:
+                raise CommandError(f"No existe la elección '{options['election']}'.")
+
+        total_drift = 0
+        for election in elections:
+            total_drift += self.rebuild(election, options['check'])
+            total_drift += self.rebuild_turnout(election, options['check'])
+
+        if options['check'] and total_drift:
+            raise CommandError(f"Se encontraron {total_drift} contadores desalineados.")
+
+    def rebuild(self, election, check):
+        """Reporta (y si no es --check corrige) los contadores de una elección. Regresa cuántos difieren."""
+        # 1. Conteo real (GROUP BY sobre las respuestas) vs. conteo guardado
+        expected = count_votes_from_ballots(election)
+        tallies = VoteTally.objects.filter(election=election)
+        stored = {
+            (question, option): count
+            for question, option, count in tallies.values_list('question', 'option', 'count')
+        }
+
+        # 2. Buscamos diferencias en cualquiera de los dos lados
+        drift = []
+        for key in sorted(set(expected) | set(stored)):
+            real, saved = expected.get(key, 0), stored.get(key, 0)
+            if real != saved:
+                drift.append((key, saved, real))
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS(
+                f"[{election.slug}] Sin diferencias: {len(stored)} contadores coinciden con los votos."
+            ))
+            return 0
+
+        for (question, option), saved, real in drift:
+            self.stdout.write(self.style.WARNING(
+                f"  [{election.slug}] {question}:{option} -> guardado={saved} real={real} (diferencia {real - saved:+d})"
+            ))
+
+        if check:
+            return len(drift)
+
+        # 3. Reescribimos los contadores de la elección de forma atómica
+        with transaction.atomic():
+            tallies.delete()
+            VoteTally.objects.bulk_create(
+                VoteTally(election=election, question=question, option=option, count=count)
+                for (question, option), count in sorted(expected.items())
+            )
+            # El tablero cacheado debe reflejar los contadores corregidos
+            transaction.on_commit(lambda: bump_results_version(election.slug))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"[{election.slug}] Contadores reconstruidos: se corrigieron {len(drift)} diferencias."
+        ))
+        return len(drift)
+
+    def rebuild_turnout(self, election, check):
+        """Lo mismo para las filas de participación (por minuto y por hora). Regresa cuántas difieren."""
+        expected = count_turnout_from_ballots(election)
+        buckets = TurnoutBucket.objects.filter(election=election)
+        stored = {
+            (minutes, start, question, option): count
+            for minutes, start, question, option, count
+            in buckets.values_list('minutes', 'start', 'question', 'option', 'count')
+        }
+        drift = [key for key in set(expected) | set(stored) if expected.get(key, 0) != stored.get(key, 0)]
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS(
+                f"[{election.slug}] Participación sin diferencias: {len(stored)} filas por minuto y hora."
+            ))
+            return 0
+
+        # Pueden ser muchas filas (una por ventana y opción): solo mostramos las primeras
+        for key in sorted(drift)[:10]:
+            minutes, start, question, option = key
+            label = f"{question}:{option}" if question else "papeletas"
+            self.stdout.write(self.style.WARNING(
+                f"  [{election.slug}] {start:%Y-%m-%d %H:%M} (+{minutes} min) {label} -> "
+                f"guardado={stored.get(key, 0)} real={expected.get(key, 0)}"
+            ))
+        if check:
+            return len(drift)
+
+        with transaction.atomic():
+            buckets.delete()
+            TurnoutBucket.objects.bulk_create((
+                TurnoutBucket(election=election, minutes=minutes, start=start, question=question, option=option, count=count)
+                for (minutes, start, question, option), count in expected.items() if count
+            ), batch_size=2000)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"[{election.slug}] Participación reconstruida: se corrigieron {len(drift)} filas."
+        ))
+        return len(drift)
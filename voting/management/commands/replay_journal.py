@@ -0,0 +1,48 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from voting import journal
+
+
+class Command(BaseCommand):
+    """
+    Reaplica el diario de papeletas (modo BALLOT_INGESTION_MODE = 'journal').
+
+    Pasa a la base las papeletas de los segmentos que dejaron procesos terminados
+    (caída, reinicio, despliegue) y borra cada segmento al terminar. Las que ya estaban
+    en la base se saltan; los segmentos de procesos vivos (bloqueados) no se tocan.
+    Los servidores también lo hacen solos con la primera papeleta que reciben.
+
+    Uso:
+        python manage.py replay_journal
+        python manage.py replay_journal --dir /var/lib/votos/journal --json
+    """
+    help = "Pasa a la base de datos las papeletas del diario que no alcanzaron a guardarse."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=settings.JOURNAL_DIR, help="Directorio del diario (JOURNAL_DIR).")
+        parser.add_argument('--batch-size', type=int, default=settings.JOURNAL_FLUSH_BATCH,
+                            help="Papeletas por transacción.")
+        parser.add_argument('--json', action='store_true', help="Imprime los totales como JSON.")
+
+    def handle(self, *args, **options):
+        if journal.fcntl is None:
+            raise CommandError("El diario requiere candados de archivo POSIX (fcntl).")
+        segments = journal.orphan_segments(options['dir'])
+        applied, skipped, rejected = journal.replay_orphan_segments(options['dir'], options['batch_size'])
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'segments': len(segments), 'applied': applied, 'skipped': skipped, 'rejected': rejected,
+            }))
+            return
+        self.stdout.write(
+            f"{len(segments)} segmentos revisados: {applied} papeletas guardadas, "
+            f"{skipped} ya estaban en la base, {rejected} rechazadas."
+        )
+        if rejected:
+            self.stdout.write(self.style.WARNING(
+                f"Las papeletas rechazadas quedaron en {options['dir']}/{journal.REJECTED_FILE}."
+            ))
@@ -0,0 +1,54 @@
+import base64
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from voting.crypto_utils import generate_aes_key, get_key_ring, has_key_ring
+from voting.key_ring import derived_key_ring, rotate_keystore
+
+
+class Command(BaseCommand):
+    """
+    Rota la llave AES con la que se cifran los votos nuevos.
+    Las llaves anteriores se quedan en el llavero para seguir descifrando los votos viejos.
+
+    Uso:
+        python manage.py rotate_ballot_key                      # Usa BALLOT_KEYSTORE_PATH
+        python manage.py rotate_ballot_key --keystore /ruta/keystore.json
+        python manage.py rotate_ballot_key --import-derived-key   # Conserva la llave derivada de SECRET_KEY
+
+    Después de rotar, reinicia los procesos web y los workers para que carguen la llave nueva.
+    """
+    help = "Agrega una llave AES nueva al llavero y la vuelve la activa."
+    # Es la forma de crear el primer llavero: no puede exigir el chequeo voting.E001
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keystore', help="Archivo del llavero (por defecto, BALLOT_KEYSTORE_PATH).")
+        parser.add_argument('--import-derived-key', action='store_true',
+                            help="Al crear el archivo, incluye la llave derivada de SECRET_KEY (kid 'sk1') "
+                                 "para seguir abriendo las papeletas cifradas con ella.")
+
+    def handle(self, *args, **options):
+        if settings.BALLOT_AES_KEYS and not options['keystore']:
+            # Las llaves vienen de una variable de entorno: aquí no podemos editarla
+            key = base64.b64encode(generate_aes_key()).decode('ascii')
+            raise CommandError(
+                "Las llaves se leen de BALLOT_AES_KEYS. Para rotar, agrega al INICIO de esa variable "
+                f"una llave nueva (ej. 'kN:{key},...') y reinicia los procesos."
+            )
+
+        path = options['keystore'] or settings.BALLOT_KEYSTORE_PATH
+        if not path:
+            raise CommandError("Indica --keystore o configura BALLOT_KEYSTORE_PATH.")
+
+        # Si el archivo aún no existe, conserva las llaves actuales (con DEBUG, la derivada de SECRET_KEY).
+        # En producción sin llavero, la derivada solo se importa si se pide.
+        base_ring = derived_key_ring() if options['import_derived_key'] else None
+        if has_key_ring():
+            base_ring = get_key_ring()
+        key_ring = rotate_keystore(path, base_ring=base_ring)
+        self.stdout.write(self.style.SUCCESS(
+            f"Llave activa: '{key_ring.active_key_id}' ({len(key_ring.keys)} llaves en {path}). "
+            "Reinicia los procesos para usarla."
+        ))
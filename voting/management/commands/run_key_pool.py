@@ -0,0 +1,81 @@
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from voting.crypto_utils import generate_rsa_keys
+from voting.key_pool import add_key_pairs, pool_status
+from voting.models import PregeneratedKeyPair
+
+
+def _generate_pair(_):
+    # Función de nivel módulo para poder mandarla a otro proceso.
+    return generate_rsa_keys()
+
+
+class Command(BaseCommand):
+    """
+    Proceso en segundo plano que mantiene llena la reserva de llaves RSA.
+
+    Uso:
+        python manage.py run_key_pool               # Bucle infinito (proceso 'worker' del Procfile)
+        python manage.py run_key_pool --once        # Rellena una vez y termina
+        python manage.py run_key_pool --stats       # Solo muestra las métricas en JSON
+    """
+    help = "Pre-genera pares de llaves RSA para que la vista de generación solo los entregue."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Rellena la reserva una sola vez y termina.")
+        parser.add_argument('--stats', action='store_true', help="Muestra las métricas de la reserva y termina.")
+        parser.add_argument('--processes', type=int, default=1, help="Procesos para generar llaves en paralelo.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Segundos entre revisiones de la reserva.")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(pool_status(), indent=2))
+            return
+
+        executor = ProcessPoolExecutor(max_workers=options['processes']) if options['processes'] > 1 else None
+        try:
+            while True:
+                self.refill(executor, options['processes'])
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
+    def refill(self, executor, processes):
+        """Si la reserva está por debajo de la marca baja, la llena hasta el máximo respetando la tasa."""
+        size = PregeneratedKeyPair.objects.count()
+        if size >= settings.KEY_POOL_LOW_WATER:
+            return
+
+        missing = settings.KEY_POOL_MAX_SIZE - size
+        rate = settings.KEY_POOL_REFILL_RATE
+        # Generamos en lotes pequeños: así la tasa se respeta y las llaves se publican pronto.
+        batch_size = max(1, min(missing, processes, int(rate) or 1))
+        self.stdout.write(f"Reserva en {size} llaves (marca baja {settings.KEY_POOL_LOW_WATER}); generando {missing}...")
+
+        while missing > 0:
+            started = time.monotonic()
+            count = min(batch_size, missing)
+            if executor:
+                pairs = list(executor.map(_generate_pair, range(count)))
+            else:
+                pairs = [generate_rsa_keys() for _ in range(count)]
+            add_key_pairs(pairs)
+            missing -= count
+
+            # Limitador de tasa: no más de KEY_POOL_REFILL_RATE llaves por segundo.
+            if rate > 0:
+                pause = count / rate - (time.monotonic() - started)
+                if pause > 0:
+                    time.sleep(pause)
+
+        self.stdout.write(self.style.SUCCESS(f"Reserva llena: {PregeneratedKeyPair.objects.count()} llaves."))
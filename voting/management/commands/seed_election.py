@@ -0,0 +1,89 @@
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from voting.crypto_utils import ED25519, SIGNATURE_SCHEME_CHOICES
+from voting.models import Election
+from voting.results_cache import bump_results_version
+from voting.seeding import DEFAULT_BATCH_SIZE, load_seed_keys, parse_distribution, seed_electorate
+
+
+class Command(BaseCommand):
+    """
+    Crea un electorado sintético para pruebas de carga (bulk_create por lotes, sin señales).
+
+    Uso:
+        python manage.py seed_election --voters 200000 --turnout 0.65 --seed 42
+        python manage.py seed_election --voters 5000 --distribution "P1=ALTO:6,MEDIO:3,BAJO:1"
+        python manage.py seed_election --voters 5000 --keys pool --scheme rsa-pkcs1v15
+        python manage.py seed_election --voters 5000 --election consejo-2026 --prefix consejo
+
+    Los votantes son <prefijo>-<n>@seed.test, todos con la misma contraseña (--password).
+    Quienes ya votaron tienen llave pública y una papeleta firmada y cifrada de verdad.
+    Para que los logins de la prueba de carga también sean baratos: FAST_PASSWORD_HASHER=True.
+    """
+    help = "Genera votantes, perfiles y votos sintéticos en lotes para pruebas de carga."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--election', default=settings.DEFAULT_ELECTION,
+                            help="Slug de la elección (todos los votantes quedan en su padrón).")
+        parser.add_argument('--voters', type=int, default=1000, help="Número de votantes a crear.")
+        parser.add_argument('--turnout', type=float, default=0.6, help="Fracción que ya votó (0 a 1).")
+        parser.add_argument('--distribution', default='',
+                            help="Pesos por respuesta, ej. 'P1=ALTO:5,MEDIO:3,BAJO:2;P2=FACIL:1,DIFICIL:1'.")
+        parser.add_argument('--seed', type=int, default=0, help="Semilla: misma semilla, mismo electorado.")
+        parser.add_argument('--prefix', default='votante', help="Prefijo de los correos generados.")
+        parser.add_argument('--password', default='Semilla#2024', help="Contraseña común de los votantes.")
+        parser.add_argument('--keys', choices=['generate', 'pool'], default='generate',
+                            help="'generate': llaves nuevas del esquema; 'pool': pares RSA de la reserva.")
+        parser.add_argument('--scheme', default=ED25519, choices=[name for name, label in SIGNATURE_SCHEME_CHOICES],
+                            help="Esquema de firma de los votantes sintéticos (Ed25519 es el más barato).")
+        parser.add_argument('--distinct-keys', type=int, default=1000,
+                            help="Llaves distintas a repartir en ciclo entre quienes votaron.")
+        parser.add_argument('--unsigned', action='store_true',
+                            help="Papeletas con firma de relleno (mucho más rápido; verify_ballots las marcará inválidas).")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Filas por lote.")
+
+    def handle(self, *args, **options):
+        if options['voters'] < 1:
+            raise CommandError("--voters debe ser mayor que cero.")
+        if not 0 <= options['turnout'] <= 1:
+            raise CommandError("--turnout debe estar entre 0 y 1.")
+        if User.objects.filter(username__startswith=f"{options['prefix']}-", username__endswith='@seed.test').exists():
+            raise CommandError(f"Ya existen votantes con el prefijo '{options['prefix']}'. Usa otro --prefix.")
+
+        election = Election.objects.filter(slug=options['election']).first()
+        if election is None:
+            raise CommandError(f"No existe la elección '{options['election']}'.")
+
+        try:
+            weights = parse_distribution(options['distribution'], election)
+            seed_keys = None
+            if options['turnout'] > 0 and not options['unsigned']:
+                seed_keys = load_seed_keys(options['keys'], options['distinct_keys'], options['scheme'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Un solo hash para todo el electorado (en vez de uno por usuario)
+        password_hash = make_password(options['password'])
+
+        def progress(done, votes):
+            self.stdout.write(f"  {done}/{options['voters']} votantes, {votes} votos")
+
+        started = time.perf_counter()
+        result = seed_electorate(
+            election, options['voters'], options['turnout'], weights, random.Random(options['seed']),
+            options['prefix'], password_hash, seed_keys, options['batch_size'], progress,
+        )
+        elapsed = time.perf_counter() - started
+
+        # El tablero debe reflejar los votos nuevos
+        bump_results_version(election.slug)
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo: {result['voters']} votantes y {result['votes']} votos en {elapsed:.1f}s "
+            f"({result['voters'] / elapsed:.0f} votantes/s)."
+        ))
@@ -0,0 +1,133 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from voting.audit_utils import chunked, verify_ballot_rows
+from voting.models import Vote
+
+
+class Command(BaseCommand):
+    """
+    Re-verifica TODAS las firmas guardadas (Vote.digital_signature) contra la
+    llave pública de cada votante (VoterProfile.public_key).
+
+    - Lee los votos en bloques ordenados por id (iterator(), memoria constante).
+    - Reparte la verificación entre varios procesos (ProcessPoolExecutor).
+    - Guarda un punto de control: si se interrumpe, vuelve a correrlo y continúa.
+      Al llegar al final lo borra: la siguiente corrida vuelve a empezar por el primer voto.
+
+    Uso:
+        python manage.py verify_ballots
+        python manage.py verify_ballots --workers 8 --chunk-size 5000
+        python manage.py verify_ballots --restart   # Ignora el punto de control
+    """
+    help = "Re-verifica en paralelo las firmas digitales de todos los votos guardados."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Procesos de verificación.")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Votos por bloque enviado a cada proceso.")
+        parser.add_argument('--checkpoint', default='verify_ballots.checkpoint.json',
+                            help="Archivo con el progreso (para reanudar).")
+        parser.add_argument('--failures', default='verify_ballots.failures.jsonl',
+                            help="Archivo JSON Lines con un renglón por cada voto que falló.")
+        parser.add_argument('--restart', action='store_true', help="Empieza desde cero ignorando el punto de control.")
+        parser.add_argument('--json', action='store_true', help="Imprime el resumen final en JSON.")
+
+    def handle(self, *args, **options):
+        state = self.load_checkpoint(options['checkpoint'], options['restart'])
+        # Una corrida nueva (no una reanudación) empieza también con la lista de fallos vacía
+        if not state['last_id'] and os.path.exists(options['failures']):
+            os.remove(options['failures'])
+        if state['last_id']:
+            self.stdout.write(f"Reanudando después del voto #{state['last_id']}...")
+
+        started = time.monotonic()
+        # Solo traemos las columnas necesarias; cada fila viaja como tupla al proceso hijo.
+        rows = (
+            Vote.objects.filter(id__gt=state['last_id']).order_by('id')
+            .values_list('id', 'option', 'digital_signature', 'voter__public_key', 'voter__signature_scheme')
+            .iterator(chunk_size=options['chunk_size'])
+        )
+
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor, \
+                open(options['failures'], 'a', encoding='utf-8') as failures_file:
+            # Cola de trabajos en orden de envío. Procesamos los resultados en ese mismo
+            # orden para que el punto de control nunca "salte" un bloque sin verificar.
+            pending = deque()
+            max_in_flight = options['workers'] * 2
+
+            for chunk in chunked(rows, options['chunk_size']):
+                pending.append(executor.submit(verify_ballot_rows, chunk))
+                while len(pending) >= max_in_flight:
+                    self.collect(pending.popleft().result(), state, failures_file, options['checkpoint'])
+
+            while pending:
+                self.collect(pending.popleft().result(), state, failures_file, options['checkpoint'])
+
+        # Corrida completa: el punto de control ya no sirve para reanudar
+        if os.path.exists(options['checkpoint']):
+            os.remove(options['checkpoint'])
+
+        elapsed = time.monotonic() - started
+        summary = {
+            'valid': state['valid'],
+            'invalid': state['invalid'],
+            'missing_key': state['missing_key'],
+            'total': state['valid'] + state['invalid'] + state['missing_key'],
+            'last_id': state['last_id'],
+            'seconds': round(elapsed, 2),
+            'failures_file': options['failures'],
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+
+        self.stdout.write(
+            f"Votos verificados: {summary['total']} en {summary['seconds']} s\n"
+            f"  Válidos:        {summary['valid']}\n"
+            f"  Inválidos:      {summary['invalid']}\n"
+            f"  Sin llave:      {summary['missing_key']}\n"
+            f"  Lista de fallos: {summary['failures_file']}"
+        )
+
+        if summary['invalid'] or summary['missing_key']:
+            self.stdout.write(self.style.ERROR("¡Atención! Hay votos cuya firma no se pudo validar."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Todas las firmas son válidas."))
+
+    # --- Auxiliares ---
+
+    @staticmethod
+    def load_checkpoint(path, restart):
+        empty = {'last_id': 0, 'valid': 0, 'invalid': 0, 'missing_key': 0}
+        if restart or not os.path.exists(path):
+            return empty
+        with open(path, encoding='utf-8') as f:
+            return {**empty, **json.load(f)}
+
+    @staticmethod
+    def save_checkpoint(path, state):
+        # Escribimos a un archivo temporal y lo renombramos: el punto de control
+        # nunca queda a medio escribir aunque el proceso muera en ese instante.
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def collect(self, result, state, failures_file, checkpoint_path):
+        """Suma el resultado de un bloque, escribe sus fallos y avanza el punto de control."""
+        for failure in result['failures']:
+            failures_file.write(json.dumps(failure) + '\n')
+        failures_file.flush()
+
+        state['valid'] += result['valid']
+        state['invalid'] += result['invalid']
+        state['missing_key'] += result['missing_key']
+        if result['last_id'] is not None:
+            state['last_id'] = result['last_id']
+        self.save_checkpoint(checkpoint_path, state)
@@ -0,0 +1,85 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from voting.ledger import get_ledger_root
+from voting.merkle import append_leaf, leaf_hash, receipt_digest, root_from_frontier
+from voting.models import LedgerNode, Vote
+
+
+class Command(BaseCommand):
+    """
+    Recalcula el árbol de Merkle a partir de las firmas de la tabla Vote y lo compara
+    con la raíz publicada. Detecta papeletas borradas, agregadas por fuera o alteradas.
+
+    - Lee los votos en orden de posición (iterator(), memoria constante: solo la frontera).
+    - Compara cada hoja guardada con la que resulta de la firma.
+
+    Uso:
+        python manage.py verify_ledger
+        python manage.py verify_ledger --json
+    """
+    help = "Recalcula la raíz del registro público de papeletas y la compara con la publicada."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Filas leídas por consulta.")
+        parser.add_argument('--json', action='store_true', help="Imprime el resumen en JSON.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        # La raíz se lee primero: el árbol puede crecer mientras lo recorremos
+        size, published_root = get_ledger_root()
+
+        votes = (
+            Vote.objects.filter(ledger_index__lt=size).order_by('ledger_index')
+            .values_list('ledger_index', 'digital_signature')
+            .iterator(chunk_size=options['chunk_size'])
+        )
+        leaves = (
+            LedgerNode.objects.filter(level=0, position__lt=size).order_by('position')
+            .values_list('position', 'hash')
+            .iterator(chunk_size=options['chunk_size'])
+        )
+
+        frontier = []
+        count = 0
+        problems = []
+        for (index, signature), (position, stored_leaf) in zip(votes, leaves):
+            leaf = leaf_hash(receipt_digest(signature))
+            if index != count:
+                problems.append(f"Falta la papeleta en la posición {count} (sigue la {index}).")
+                break
+            if position != index or bytes(stored_leaf) != leaf:
+                problems.append(f"La hoja {index} no corresponde a la firma de su papeleta.")
+            append_leaf(frontier, count, leaf)
+            count += 1
+
+        if not problems and count != size:
+            problems.append(f"El registro tiene {size} hojas pero solo hay {count} papeletas con hoja.")
+        root = root_from_frontier(frontier)
+        if not problems and root != published_root:
+            problems.append("La raíz recalculada no coincide con la publicada.")
+
+        unlisted = Vote.objects.filter(ledger_index__isnull=True).count()
+        if unlisted:
+            problems.append(f"Hay {unlisted} papeletas fuera del registro.")
+
+        summary = {
+            'size': size,
+            'published_root': published_root.hex(),
+            'computed_root': root.hex(),
+            'seconds': round(time.monotonic() - started, 2),
+            'problems': problems,
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2))
+        else:
+            self.stdout.write(f"Hojas: {size}  Raíz publicada: {summary['published_root']}  ({summary['seconds']} s)")
+            for problem in problems:
+                self.stdout.write(self.style.WARNING(f"  {problem}"))
+
+        if problems:
+            raise CommandError("El registro público de papeletas no coincide con la tabla de votos.")
+        if not options['json']:
+            self.stdout.write(self.style.SUCCESS("El registro coincide con las papeletas guardadas."))
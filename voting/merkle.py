@@ -0,0 +1,132 @@
+import hashlib
+
+# ---------------------------------------------------------
+# ÁRBOL DE MERKLE DE PAPELETAS (estilo RFC 6962 / Certificate Transparency)
+# ---------------------------------------------------------
+# Funciones puras (sin Django) para que las usen igual el registro, las migraciones
+# y cualquier auditor externo que quiera recalcular la raíz.
+#
+#   hoja = SHA256(0x00 || SHA256(firma))        nodo = SHA256(0x01 || izquierdo || derecho)
+#
+# Los prefijos distintos impiden hacer pasar un nodo interno por una hoja.
+# Solo se guardan los subárboles COMPLETOS (nodo en nivel L, posición p cubre las hojas
+# [p * 2^L, (p + 1) * 2^L)): una vez escritos no cambian nunca. La "frontera" son las
+# raíces de los subárboles completos más a la derecha (una por cada bit encendido del
+# tamaño); con ella se agrega una hoja y se obtiene la raíz sin leer el resto del árbol.
+
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+HASH_SIZE = 32
+EMPTY_ROOT = hashlib.sha256(b'').digest()
+
+
+def receipt_digest(signature):
+    """SHA-256 de la firma (bytes): es lo que identifica a la papeleta en el árbol."""
+    return hashlib.sha256(bytes(signature)).digest()
+
+
+def leaf_hash(digest):
+    return hashlib.sha256(LEAF_PREFIX + digest).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def pack_frontier(frontier):
+    return b''.join(frontier)
+
+
+def unpack_frontier(data):
+    data = bytes(data or b'')
+    return [data[i:i + HASH_SIZE] for i in range(0, len(data), HASH_SIZE)]
+
+
+def append_leaf(frontier, size, leaf):
+    """
+    Agrega la hoja número 'size' modificando 'frontier' (lista, del nivel más alto al más bajo).
+    Regresa los nodos nuevos [(nivel, posición, hash), ...]: la hoja más los subárboles
+    que se completaron con ella (a lo mucho log2(n) + 1).
+    """
+    nodes = [(0, size, leaf)]
+    level, position, current = 0, size, leaf
+    # Mientras la posición sea impar, el hermano izquierdo ya está completo (es el último de la frontera)
+    while position & 1:
+        current = node_hash(frontier.pop(), current)
+        level += 1
+        position >>= 1
+        nodes.append((level, position, current))
+    frontier.append(current)
+    return nodes
+
+
+def root_from_frontier(frontier):
+    """Raíz del árbol a partir de su frontera: O(log n) hashes."""
+    if not frontier:
+        return EMPTY_ROOT
+    root = frontier[-1]
+    for peak in reversed(frontier[:-1]):
+        root = node_hash(peak, root)
+    return root
+
+
+def _split_point(size):
+    # Mayor potencia de 2 estrictamente menor que 'size' (RFC 6962, sección 2.1)
+    return 1 << ((size - 1).bit_length() - 1)
+
+
+def subtree_nodes(start, end):
+    """
+    Subárboles completos (nivel, posición) que cubren las hojas [start, end), de izquierda
+    a derecha. Sirve para rangos alineados como los que aparecen en una prueba de inclusión.
+    """
+    nodes = []
+    while start < end:
+        level = 0
+        while start % (2 << level) == 0 and start + (2 << level) <= end:
+            level += 1
+        nodes.append((level, start >> level))
+        start += 1 << level
+    return nodes
+
+
+def inclusion_ranges(index, size):
+    """Rangos de hojas [inicio, fin) cuyos hashes forman la prueba de la hoja 'index', de abajo hacia arriba."""
+    ranges = []
+    start, end = 0, size
+    while end - start > 1:
+        k = _split_point(end - start)
+        if index < start + k:
+            ranges.append((start + k, end))
+            end = start + k
+        else:
+            ranges.append((start, start + k))
+            start += k
+    ranges.reverse()
+    return ranges
+
+
+def range_hash(start, end, nodes):
+    """Hash del subárbol [start, end) usando los nodos completos ya leídos {(nivel, posición): hash}."""
+    hashes = [nodes[key] for key in subtree_nodes(start, end)]
+    return root_from_frontier(hashes)
+
+
+def verify_inclusion(leaf, index, size, path, root):
+    """Comprueba una prueba de inclusión (algoritmo de RFC 9162, sección 2.1.3.2)."""
+    if index >= size:
+        return False
+    fn, sn, current = index, size - 1, leaf
+    for sibling in path:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            current = node_hash(sibling, current)
+            while not fn & 1 and fn != 0:
+                fn >>= 1
+                sn >>= 1
+        else:
+            current = node_hash(current, sibling)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and current == root
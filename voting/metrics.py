@@ -0,0 +1,175 @@
+import random
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+# ---------------------------------------------------------
+# MÉTRICAS DE LA RUTA CRÍTICA (formato de texto de Prometheus)
+# ---------------------------------------------------------
+# Un porcentaje de las peticiones (METRICS_SAMPLE_RATE) se "muestrea": el middleware
+# guarda en una ContextVar un registro de la petición y cada etapa marcada con
+# span('crypto.sign'), span('ballot.commit'), ... suma su duración y sus consultas SQL.
+# Al terminar la petición todo va a histogramas en memoria que /metrics expone.
+#
+# Costo cuando NO se muestrea: cada span() es una lectura de ContextVar y regresa un
+# contexto vacío compartido. Con METRICS_SAMPLE_RATE=0 el middleware ni siquiera se carga.
+# Este módulo no importa Django (crypto_utils lo usa y corre en procesos hijos).
+#
+# Los números son POR PROCESO: con varios workers cada uno expone los suyos
+# (igual que las estadísticas de la caché de llaves públicas).
+
+# Límites superiores de los "buckets" (segundos y número de consultas)
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_current = ContextVar('voting_metrics_request', default=None)
+_NOOP = nullcontext()
+
+
+class Histogram:
+    """Histograma acumulado por combinación de etiquetas, seguro entre hilos."""
+
+    def __init__(self, name, help_text, label_name, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_name = label_name
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label, value):
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((label, list(counts), total, value_sum) for label, (counts, total, value_sum) in self._series.items())
+        for label, counts, total, value_sum in series:
+            label = label.replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{self.label_name}="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{self.label_name}="{label}",le="+Inf"}} {total}')
+            lines.append(f'{self.name}_sum{{{self.label_name}="{label}"}} {value_sum:.6f}')
+            lines.append(f'{self.name}_count{{{self.label_name}="{label}"}} {total}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+REQUEST_DURATION = Histogram(
+    'voting_request_duration_seconds', 'Duración de las peticiones muestreadas.', 'view', DURATION_BUCKETS)
+REQUEST_QUERIES = Histogram(
+    'voting_request_queries', 'Consultas SQL por petición muestreada.', 'view', QUERY_BUCKETS)
+REQUEST_DB_DURATION = Histogram(
+    'voting_request_db_seconds', 'Tiempo en la base de datos por petición muestreada.', 'view', DURATION_BUCKETS)
+STAGE_DURATION = Histogram(
+    'voting_stage_duration_seconds', 'Duración de cada etapa marcada con span().', 'stage', DURATION_BUCKETS)
+STAGE_QUERIES = Histogram(
+    'voting_stage_queries', 'Consultas SQL dentro de cada etapa.', 'stage', QUERY_BUCKETS)
+
+HISTOGRAMS = (REQUEST_DURATION, REQUEST_QUERIES, REQUEST_DB_DURATION, STAGE_DURATION, STAGE_QUERIES)
+
+
+class RequestRecorder:
+    """Lo que se mide durante UNA petición muestreada."""
+    __slots__ = ('queries', 'db_seconds', 'stages')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.stages = []
+
+    def add_query(self, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+
+
+class _Span:
+    __slots__ = ('recorder', 'name', 'started', 'queries')
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.queries = self.recorder.queries
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.recorder.stages.append(
+            (self.name, time.perf_counter() - self.started, self.recorder.queries - self.queries)
+        )
+        return False
+
+
+def span(name):
+    """Mide una etapa si la petición actual está muestreada; si no, no hace nada."""
+    recorder = _current.get()
+    if recorder is None:
+        return _NOOP
+    return _Span(recorder, name)
+
+
+def start_request(sample_rate):
+    """Decide si se muestrea la petición. Regresa (registro, token) o (None, None)."""
+    if random.random() >= sample_rate:
+        return None, None
+    recorder = RequestRecorder()
+    return recorder, _current.set(recorder)
+
+
+def finish_request(recorder, token, view_name, seconds):
+    """Pasa lo medido a los histogramas y limpia la ContextVar."""
+    _current.reset(token)
+    REQUEST_DURATION.observe(view_name, seconds)
+    REQUEST_QUERIES.observe(view_name, recorder.queries)
+    REQUEST_DB_DURATION.observe(view_name, recorder.db_seconds)
+    for name, stage_seconds, queries in recorder.stages:
+        STAGE_DURATION.observe(name, stage_seconds)
+        STAGE_QUERIES.observe(name, queries)
+
+
+def discard_request(token):
+    """Termina una petición muestreada sin pasar nada a los histogramas (benchmarks)."""
+    _current.reset(token)
+
+
+def count_query(execute, sql, params, many, context):
+    """execute_wrapper de la base de datos: cuenta las consultas de la petición muestreada."""
+    recorder = _current.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.add_query(time.perf_counter() - started)
+
+
+def render_metrics():
+    """Todos los histogramas en el formato de texto de Prometheus (versión 0.0.4)."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
+
+
+def reset_metrics():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
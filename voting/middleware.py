@@ -0,0 +1,68 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .metrics import count_query, finish_request, start_request
+
+
+def _install_query_counter(connection, **kwargs):
+    # Una sola vez por conexión (la lista de wrappers sobrevive a las reconexiones)
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def _view_name(request):
+    # Nombre de la ruta ('voting:vote_submit'), no la URL: así las etiquetas no crecen sin límite
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unmatched'
+
+
+class RequestMetricsMiddleware:
+    """
+    Mide una fracción (METRICS_SAMPLE_RATE) de las peticiones: duración total,
+    consultas SQL y su tiempo, más las etapas marcadas con metrics.span().
+    Con METRICS_SAMPLE_RATE=0 Django lo descarta al arrancar (MiddlewareNotUsed).
+    En respuestas en streaming solo cuenta hasta que la vista regresa la respuesta.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.METRICS_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.METRICS_SAMPLE_RATE
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+        connection_created.connect(_install_query_counter)
+        for connection in connections.all(initialized_only=True):
+            _install_query_counter(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recorder, token = start_request(self.sample_rate)
+        if recorder is None:
+            return self.get_response(request)
+        started = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            finish_request(recorder, token, _view_name(request), time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        # La ContextVar se copia a los hilos de sync_to_async: ahí también se cuentan las consultas
+        recorder, token = start_request(self.sample_rate)
+        if recorder is None:
+            return await self.get_response(request)
+        started = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            finish_request(recorder, token, _view_name(request), time.perf_counter() - started)
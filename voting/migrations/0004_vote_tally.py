@@ -0,0 +1,58 @@
+# Generated by Django 5.2.8 on 2026-10-17 14:11
+
+from collections import Counter
+
+from django.db import migrations, models
+
+# Lector del texto del voto copiado aquí (ballot_utils.parse_vote_content): si ese
+# módulo cambia después, esta migración sigue haciendo lo mismo.
+HEADER_KEYS = ('USUARIO', 'ELECCION')
+
+
+def parse_vote_content(vote_option):
+    results = {}
+    for part in vote_option.split('|'):
+        key, separator, value = part.partition(':')
+        if separator and key not in HEADER_KEYS:
+            results[key] = value
+    return results
+
+
+def backfill_tallies(apps, schema_editor):
+    # Llenamos los contadores con los votos que ya existían antes de esta tabla.
+    Vote = apps.get_model('voting', 'Vote')
+    VoteTally = apps.get_model('voting', 'VoteTally')
+
+    counts = Counter()
+    for option in Vote.objects.order_by('id').values_list('option', flat=True).iterator(chunk_size=2000):
+        for question, value in parse_vote_content(option).items():
+            counts[(question, value)] += 1
+
+    VoteTally.objects.bulk_create(
+        VoteTally(question=question, option=value, count=count)
+        for (question, value), count in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0003_vote_encrypted_vote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question', models.CharField(max_length=10)),
+                ('option', models.CharField(max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['question', 'id'],
+                'constraints': [models.UniqueConstraint(fields=('question', 'option'), name='unique_tally_per_option')],
+            },
+        ),
+        migrations.RunPython(backfill_tallies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 14:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0005_key_pool'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voterprofile',
+            name='signature_scheme',
+            field=models.CharField(choices=[('rsa-pkcs1v15', 'RSA-2048 PKCS#1 v1.5'), ('rsa-pss', 'RSA-2048 PSS'), ('ed25519', 'Ed25519')], default='rsa-pkcs1v15', help_text='Esquema de firma digital asociado a la llave pública.', max_length=20),
+        ),
+    ]
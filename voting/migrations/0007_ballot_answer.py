@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-17 14:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Mismo lector que 0004 (ballot_utils.parse_vote_content al escribir esta migración)
+HEADER_KEYS = ('USUARIO', 'ELECCION')
+
+
+def parse_vote_content(vote_option):
+    results = {}
+    for part in vote_option.split('|'):
+        key, separator, value = part.partition(':')
+        if separator and key not in HEADER_KEYS:
+            results[key] = value
+    return results
+
+
+def backfill_answers(apps, schema_editor):
+    # Separamos las respuestas de los votos que ya existían (una sola vez).
+    Vote = apps.get_model('voting', 'Vote')
+    BallotAnswer = apps.get_model('voting', 'BallotAnswer')
+
+    batch = []
+    for vote_id, option in Vote.objects.order_by('id').values_list('id', 'option').iterator(chunk_size=2000):
+        for question, answer in parse_vote_content(option).items():
+            batch.append(BallotAnswer(vote_id=vote_id, question=question, answer=answer))
+        if len(batch) >= 2000:
+            BallotAnswer.objects.bulk_create(batch)
+            batch = []
+    BallotAnswer.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0006_voterprofile_signature_scheme'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BallotAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question', models.CharField(max_length=10)),
+                ('answer', models.CharField(max_length=50)),
+                ('vote', models.ForeignKey(help_text='Papeleta a la que pertenece esta respuesta.', on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='voting.vote')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['question', 'answer'], name='ballot_answer_idx')],
+                'constraints': [models.UniqueConstraint(fields=('vote', 'question'), name='unique_answer_per_question')],
+            },
+        ),
+        migrations.RunPython(backfill_answers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-17 14:21
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0007_ballot_answer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BallotSubmission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('receipt', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('vote_content', models.TextField(help_text='Texto canónico del voto que se va a firmar.')),
+                ('private_key', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('pending', 'En cola'), ('processing', 'Procesando'), ('done', 'Registrado'), ('failed', 'Rechazado')], default='pending', max_length=12)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('queue_ms', models.FloatField(blank=True, null=True)),
+                ('sign_ms', models.FloatField(blank=True, null=True)),
+                ('verify_ms', models.FloatField(blank=True, null=True)),
+                ('encrypt_ms', models.FloatField(blank=True, null=True)),
+                ('commit_ms', models.FloatField(blank=True, null=True)),
+                ('vote', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='voting.vote')),
+                ('voter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='voting.voterprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='submission_status_idx')],
+            },
+        ),
+    ]
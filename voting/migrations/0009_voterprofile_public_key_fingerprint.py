@@ -0,0 +1,50 @@
+from django.db import migrations, models
+
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import ECC, RSA
+
+# Huella como la calculaba crypto_utils.public_key_fingerprint: SHA-256 (hex) del DER de la llave pública
+RSA_SCHEMES = ('rsa-pkcs1v15', 'rsa-pss')
+
+
+def public_key_fingerprint(public_key_pem, scheme):
+    scheme = scheme or 'rsa-pkcs1v15'
+    if scheme in RSA_SCHEMES:
+        der = RSA.import_key(public_key_pem).publickey().export_key('DER')
+    elif scheme == 'ed25519':
+        key = ECC.import_key(public_key_pem)
+        if key.curve.lower() != 'ed25519':
+            raise ValueError("La llave no pertenece a la curva Ed25519.")
+        der = key.public_key().export_key(format='DER')
+    else:
+        raise ValueError(f"Esquema de firma desconocido: {scheme}")
+    return SHA256.new(der).hexdigest()
+
+
+def backfill_fingerprints(apps, schema_editor):
+    # Calcula la huella de las llaves que ya estaban registradas
+    VoterProfile = apps.get_model('voting', 'VoterProfile')
+    profiles = VoterProfile.objects.exclude(public_key__isnull=True).exclude(public_key='')
+    for profile in profiles.iterator():
+        try:
+            profile.public_key_fingerprint = public_key_fingerprint(profile.public_key, profile.signature_scheme)
+        except (ValueError, IndexError, TypeError):
+            # Llave ilegible: se queda sin huella (check_key_status la reportará)
+            continue
+        profile.save(update_fields=['public_key_fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0008_ballot_submission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voterprofile',
+            name='public_key_fingerprint',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 de la llave pública (DER), en hexadecimal.', max_length=64),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
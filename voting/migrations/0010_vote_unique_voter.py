@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-17 14:34
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_votes(apps, schema_editor):
+    # Si ya hay votantes con dos papeletas, la restricción no se puede crear:
+    # mejor un mensaje claro que el error genérico de la base de datos.
+    Vote = apps.get_model('voting', 'Vote')
+    duplicated = list(
+        Vote.objects.values('voter_id').annotate(total=Count('id')).filter(total__gt=1)
+        .values_list('voter_id', flat=True)[:20]
+    )
+    if duplicated:
+        raise RuntimeError(
+            f"Hay votantes con más de un voto (VoterProfile ids: {duplicated}). "
+            "Revísalos y elimina los duplicados antes de migrar."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0009_voterprofile_public_key_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_votes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('voter',), name='unique_vote_per_voter'),
+        ),
+    ]
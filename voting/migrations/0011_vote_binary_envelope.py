@@ -0,0 +1,121 @@
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+# Convertidores de sobres de crypto_utils, congelados aquí. Sobre binario: [versión 1 byte][largo del kid 1 byte][kid][...]; versión 0 = AES-CBC.
+ENVELOPE_CBC = 0
+KEY_ID_SEPARATOR = ':'
+RAW_ENVELOPE_MARKER = '~'
+
+
+def _envelope_header(version, key_id):
+    kid = key_id.encode('ascii')
+    return bytes((version, len(kid))) + kid
+
+
+def split_envelope(envelope):
+    data = bytes(envelope)
+    if len(data) < 2 or len(data) < 2 + data[1]:
+        raise ValueError("Sobre cifrado truncado.")
+    header_size = 2 + data[1]
+    return data[0], data[2:header_size].decode('ascii'), data[:header_size], data[header_size:]
+
+
+def text_envelope_to_binary(text):
+    # "<kid>:<iv hex><cifrado hex>" (o sin kid) -> sobre binario versión 0, sin necesitar la llave
+    key_id, separator, payload = text.partition(KEY_ID_SEPARATOR)
+    if key_id == RAW_ENVELOPE_MARKER:
+        return bytes.fromhex(payload)
+    if not separator:
+        key_id, payload = '', text
+    return _envelope_header(ENVELOPE_CBC, key_id) + bytes.fromhex(payload)
+
+
+def binary_envelope_to_text(envelope):
+    # Inverso; los sobres GCM no tienen forma de texto y se guardan como '~:<hex del sobre>'
+    version, key_id, header, body = split_envelope(envelope)
+    if version != ENVELOPE_CBC:
+        return f"{RAW_ENVELOPE_MARKER}{KEY_ID_SEPARATOR}{bytes(envelope).hex()}"
+    return f"{key_id}{KEY_ID_SEPARATOR}{body.hex()}" if key_id else body.hex()
+
+
+def to_binary(apps, schema_editor):
+    # Firmas hex -> bytes y sobres de texto (CBC) -> sobre binario versión 0.
+    # No hace falta la llave AES: solo cambia la representación.
+    Vote = apps.get_model('voting', 'Vote')
+    rows = Vote.objects.order_by('id').values_list('id', 'digital_signature', 'encrypted_vote')
+    batch = []
+    for vote_id, signature_hex, encrypted_text in rows.iterator(chunk_size=BATCH_SIZE):
+        try:
+            signature = bytes.fromhex(signature_hex)
+        except ValueError:
+            signature = signature_hex.encode('utf-8')  # Firma dañada: se conserva tal cual (fallará al verificar)
+        try:
+            envelope = text_envelope_to_binary(encrypted_text) if encrypted_text else None
+        except ValueError:
+            envelope = None
+        batch.append(Vote(id=vote_id, signature_bin=signature, encrypted_bin=envelope))
+        if len(batch) >= BATCH_SIZE:
+            Vote.objects.bulk_update(batch, ['signature_bin', 'encrypted_bin'])
+            batch = []
+    if batch:
+        Vote.objects.bulk_update(batch, ['signature_bin', 'encrypted_bin'])
+
+
+def to_text(apps, schema_editor):
+    # Reversa: los sobres GCM no tienen forma de texto anterior y quedan en hex (ver binary_envelope_to_text)
+    Vote = apps.get_model('voting', 'Vote')
+    rows = Vote.objects.order_by('id').values_list('id', 'signature_bin', 'encrypted_bin')
+    batch = []
+    for vote_id, signature, envelope in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(Vote(
+            id=vote_id,
+            digital_signature=bytes(signature).hex(),
+            encrypted_vote=binary_envelope_to_text(envelope) if envelope is not None else None,
+        ))
+        if len(batch) >= BATCH_SIZE:
+            Vote.objects.bulk_update(batch, ['digital_signature', 'encrypted_vote'])
+            batch = []
+    if batch:
+        Vote.objects.bulk_update(batch, ['digital_signature', 'encrypted_vote'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0010_vote_unique_voter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='signature_bin',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='encrypted_bin',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        # Columna vieja opcional antes de copiar: al revertir, se vuelve a crear vacía y to_text() la llena
+        migrations.AlterField(
+            model_name='vote',
+            name='digital_signature',
+            field=models.TextField(null=True),
+        ),
+        migrations.RunPython(to_binary, to_text),
+        migrations.RemoveField(model_name='vote', name='digital_signature'),
+        migrations.RemoveField(model_name='vote', name='encrypted_vote'),
+        migrations.RenameField(model_name='vote', old_name='signature_bin', new_name='digital_signature'),
+        migrations.RenameField(model_name='vote', old_name='encrypted_bin', new_name='encrypted_vote'),
+        migrations.AlterField(
+            model_name='vote',
+            name='digital_signature',
+            field=models.BinaryField(help_text='Firma digital (Hash RSA) del voto, prueba de no repudio.'),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='encrypted_vote',
+            field=models.BinaryField(blank=True, help_text='Voto cifrado con AES-256-GCM (sobre binario versionado).', null=True),
+        ),
+    ]
@@ -0,0 +1,121 @@
+# Generated by Django 5.2.8 on 2026-10-17 14:42
+
+import hashlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+# Lo que usa esta migración de voting/merkle.py, copiado (el árbol no puede cambiar de forma):
+#   hoja = SHA256(0x00 || SHA256(firma))        nodo = SHA256(0x01 || izquierdo || derecho)
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+EMPTY_ROOT = hashlib.sha256(b'').digest()
+
+
+def receipt_digest(signature):
+    return hashlib.sha256(bytes(signature)).digest()
+
+
+def leaf_hash(digest):
+    return hashlib.sha256(LEAF_PREFIX + digest).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def pack_frontier(frontier):
+    return b''.join(frontier)
+
+
+def append_leaf(frontier, size, leaf):
+    # Agrega la hoja 'size' a la frontera; regresa la hoja y los subárboles que completa
+    nodes = [(0, size, leaf)]
+    level, position, current = 0, size, leaf
+    while position & 1:
+        current = node_hash(frontier.pop(), current)
+        level += 1
+        position >>= 1
+        nodes.append((level, position, current))
+    frontier.append(current)
+    return nodes
+
+
+def root_from_frontier(frontier):
+    if not frontier:
+        return EMPTY_ROOT
+    root = frontier[-1]
+    for peak in reversed(frontier[:-1]):
+        root = node_hash(peak, root)
+    return root
+
+
+def build_ledger(apps, schema_editor):
+    # Los votos que ya existen entran al registro en orden de id
+    Vote = apps.get_model('voting', 'Vote')
+    LedgerNode = apps.get_model('voting', 'LedgerNode')
+    LedgerHead = apps.get_model('voting', 'LedgerHead')
+
+    frontier = []
+    size = 0
+    votes, nodes = [], []
+
+    def flush():
+        Vote.objects.bulk_update(votes, ['ledger_index'])
+        LedgerNode.objects.bulk_create(nodes)
+        votes.clear()
+        nodes.clear()
+
+    rows = Vote.objects.order_by('id').values_list('id', 'digital_signature')
+    for vote_id, signature in rows.iterator(chunk_size=BATCH_SIZE):
+        nodes.extend(
+            LedgerNode(level=level, position=position, hash=digest)
+            for level, position, digest in append_leaf(frontier, size, leaf_hash(receipt_digest(signature)))
+        )
+        votes.append(Vote(id=vote_id, ledger_index=size))
+        size += 1
+        if len(votes) >= BATCH_SIZE:
+            flush()
+    flush()
+
+    LedgerHead.objects.create(pk=1, size=size, root=root_from_frontier(frontier), frontier=pack_frontier(frontier))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0011_vote_binary_envelope'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerHead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('root', models.BinaryField(max_length=32)),
+                ('frontier', models.BinaryField(default=b'')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='ledger_index',
+            field=models.PositiveBigIntegerField(blank=True, help_text='Número de hoja de esta papeleta en el registro público.', null=True, unique=True),
+        ),
+        migrations.CreateModel(
+            name='LedgerNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('position', models.PositiveBigIntegerField()),
+                ('hash', models.BinaryField(max_length=32)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('level', 0)), fields=['hash'], name='ledger_leaf_hash_idx')],
+                'constraints': [models.UniqueConstraint(fields=('level', 'position'), name='unique_ledger_node')],
+            },
+        ),
+        migrations.RunPython(build_ledger, migrations.RunPython.noop),
+    ]
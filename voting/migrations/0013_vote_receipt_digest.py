@@ -0,0 +1,45 @@
+import hashlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def receipt_digest(signature):
+    # Como merkle.receipt_digest: SHA-256 de la firma
+    return hashlib.sha256(bytes(signature)).digest()
+
+
+def fill_receipt_digests(apps, schema_editor):
+    # SHA-256 de cada firma ya guardada, por lotes en orden de id
+    Vote = apps.get_model('voting', 'Vote')
+    rows = Vote.objects.order_by('id').values_list('id', 'digital_signature')
+    batch = []
+    for vote_id, signature in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(Vote(id=vote_id, receipt_digest=receipt_digest(signature)))
+        if len(batch) >= BATCH_SIZE:
+            Vote.objects.bulk_update(batch, ['receipt_digest'])
+            batch = []
+    if batch:
+        Vote.objects.bulk_update(batch, ['receipt_digest'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0012_ballot_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='receipt_digest',
+            field=models.BinaryField(max_length=32, null=True),
+        ),
+        migrations.RunPython(fill_receipt_digests, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='vote',
+            name='receipt_digest',
+            field=models.BinaryField(db_index=True, help_text='SHA-256 de la firma digital (búsqueda pública de comprobantes).', max_length=32),
+        ),
+    ]
@@ -0,0 +1,216 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+# Boleta original (la encuesta de cátedra) copiada aquí tal cual: la migración no debe
+# depender de código que pueda cambiar después.
+DEFAULT_ELECTION_SLUG = 'encuesta-catedra'
+DEFAULT_QUESTIONS = [
+    {
+        'key': 'P1', 'title': 'Interés General', 'chart_title': 'Distribución de Interés General',
+        'text': '¿Cuál fue tu nivel de interés general en los temas vistos en la clase?',
+        'help': 'El interés general en los conceptos de criptografía.',
+        'options': [
+            {'code': 'ALTO', 'label': 'Alto'},
+            {'code': 'MEDIO', 'label': 'Medio'},
+            {'code': 'BAJO', 'label': 'Bajo'},
+        ],
+    },
+    {
+        'key': 'P2', 'title': 'Dificultad', 'chart_title': 'Dificultad de Tareas y Proyectos',
+        'text': 'En general, ¿cómo te pareció la dificultad de las tareas y proyectos del curso?',
+        'help': 'Evaluación del nivel de dificultad.',
+        'options': [
+            {'code': 'FACIL', 'label': 'Fáciles'},
+            {'code': 'ADECUADO', 'label': 'Adecuados'},
+            {'code': 'DIFICIL', 'label': 'Difíciles'},
+        ],
+    },
+    {
+        'key': 'P3', 'title': 'Utilidad', 'chart_title': 'Utilidad de los Conceptos Aprendidos',
+        'text': '¿Consideras que los conceptos aprendidos en la clase te serán útiles?',
+        'help': 'Aplicabilidad práctica y profesional de los conocimientos.',
+        'options': [
+            {'code': 'MUCHO', 'label': 'Sí, mucho'},
+            {'code': 'TAL-VEZ', 'label': 'Tal vez'},
+            {'code': 'NO-DUDA', 'label': 'No, lo dudo'},
+        ],
+    },
+    {
+        'key': 'P4', 'title': 'Ritmo', 'chart_title': 'Ritmo de Cobertura de Temas',
+        'text': '¿Cómo calificarías el ritmo al que se cubrieron los temas durante el semestre?',
+        'help': 'Evaluación de la velocidad de enseñanza.',
+        'options': [
+            {'code': 'RAPIDO', 'label': 'Muy rápido'},
+            {'code': 'ADECUADO', 'label': 'Adecuados'},
+            {'code': 'LENTO', 'label': 'Muy lento'},
+        ],
+    },
+]
+
+
+def create_default_election(apps, schema_editor):
+    # Todo lo que ya existe pertenece a la encuesta original
+    Election = apps.get_model('voting', 'Election')
+    ElectionVoter = apps.get_model('voting', 'ElectionVoter')
+    VoterProfile = apps.get_model('voting', 'VoterProfile')
+    Vote = apps.get_model('voting', 'Vote')
+
+    election = Election.objects.create(
+        slug=DEFAULT_ELECTION_SLUG, name='Encuesta Final de Cátedra', questions=DEFAULT_QUESTIONS,
+    )
+    for model_name in ('Vote', 'BallotAnswer', 'VoteTally', 'BallotSubmission'):
+        apps.get_model('voting', model_name).objects.update(election=election)
+
+    # El padrón: quien tenía has_voted o ya tiene papeleta cuenta como "ya votó"
+    voted = set(VoterProfile.objects.filter(has_voted=True).values_list('id', flat=True))
+    voted.update(Vote.objects.values_list('voter_id', flat=True))
+    ElectionVoter.objects.bulk_create(
+        (ElectionVoter(election=election, voter_id=voter_id, has_voted=True) for voter_id in sorted(voted)),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def restore_has_voted(apps, schema_editor):
+    ElectionVoter = apps.get_model('voting', 'ElectionVoter')
+    VoterProfile = apps.get_model('voting', 'VoterProfile')
+    voter_ids = ElectionVoter.objects.filter(
+        election__slug=DEFAULT_ELECTION_SLUG, has_voted=True
+    ).values_list('voter_id', flat=True)
+    VoterProfile.objects.filter(id__in=voter_ids).update(has_voted=True)
+    # Lo que quede de otras elecciones (contadores en cero, envíos en cola) no cabe en el esquema viejo
+    for model_name in ('BallotAnswer', 'VoteTally', 'BallotSubmission'):
+        apps.get_model('voting', model_name).objects.exclude(election__slug=DEFAULT_ELECTION_SLUG).delete()
+    # Las tablas de elecciones y padrón se borran al revertir los CreateModel
+
+
+def ensure_single_election(apps, schema_editor):
+    # Antes de las elecciones solo había una boleta y un voto por votante: no se puede
+    # regresar si otra elección ya tiene papeletas (se perderían o chocarían).
+    Vote = apps.get_model('voting', 'Vote')
+    if Vote.objects.exclude(election__slug=DEFAULT_ELECTION_SLUG).exists():
+        raise RuntimeError(
+            f"Hay votos en elecciones distintas de '{DEFAULT_ELECTION_SLUG}': no se puede revertir esta migración."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0013_vote_receipt_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Election',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(unique=True)),
+                ('name', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('questions', models.JSONField(help_text='Preguntas de la boleta con sus opciones (ver formato en models.py).')),
+                ('is_open', models.BooleanField(default=True)),
+                ('open_enrollment', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ElectionVoter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('has_voted', models.BooleanField(default=False)),
+                ('election', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='roll', to='voting.election')),
+                ('voter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='elections', to='voting.voterprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['election', 'has_voted'], name='election_turnout_idx')],
+                'constraints': [models.UniqueConstraint(fields=('election', 'voter'), name='unique_voter_per_election')],
+            },
+        ),
+        # Primero opcional, se llena y después se vuelve obligatorio
+        migrations.AddField(
+            model_name='vote',
+            name='election',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='votes', to='voting.election'),
+        ),
+        migrations.AddField(
+            model_name='ballotanswer',
+            name='election',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='voting.election'),
+        ),
+        migrations.AddField(
+            model_name='votetally',
+            name='election',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='voting.election'),
+        ),
+        migrations.AddField(
+            model_name='ballotsubmission',
+            name='election',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='voting.election'),
+        ),
+        migrations.RunPython(create_default_election, restore_has_voted),
+        migrations.AlterField(
+            model_name='vote',
+            name='election',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='votes', to='voting.election'),
+        ),
+        migrations.AlterField(
+            model_name='ballotanswer',
+            name='election',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='voting.election'),
+        ),
+        migrations.AlterField(
+            model_name='votetally',
+            name='election',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='voting.election'),
+        ),
+        migrations.AlterField(
+            model_name='ballotsubmission',
+            name='election',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='voting.election'),
+        ),
+        # Índices y restricciones: ahora todos empiezan por la elección
+        migrations.RemoveConstraint(
+            model_name='vote',
+            name='unique_vote_per_voter',
+        ),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('election', 'voter'), name='unique_vote_per_election'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['election', 'id'], name='vote_election_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='ballotanswer',
+            name='ballot_answer_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ballotanswer',
+            index=models.Index(fields=['election', 'question', 'answer'], name='ballot_answer_election_idx'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='votetally',
+            name='unique_tally_per_option',
+        ),
+        migrations.AddConstraint(
+            model_name='votetally',
+            constraint=models.UniqueConstraint(fields=('election', 'question', 'option'), name='unique_tally_per_election_option'),
+        ),
+        migrations.AlterModelOptions(
+            name='votetally',
+            options={'ordering': ['election', 'question', 'id']},
+        ),
+        # El "ya votó" global se reemplaza por el padrón de cada elección
+        migrations.RemoveField(
+            model_name='voterprofile',
+            name='has_voted',
+        ),
+        # Al revertir, esto corre primero
+        migrations.RunPython(migrations.RunPython.noop, ensure_single_election),
+    ]
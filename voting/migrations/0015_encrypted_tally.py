@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-17 15:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0014_elections'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='election',
+            name='tally_public_key',
+            field=models.TextField(blank=True, help_text='Llave pública del conteo cifrado aditivo (vacío = sin conteo cifrado).'),
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='tally_ciphertext',
+            field=models.BinaryField(blank=True, help_text='Cifrados ElGamal exponenciales de cada opción (conteo cifrado aditivo).', null=True),
+        ),
+        migrations.CreateModel(
+            name='EncryptedTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ciphertexts', models.BinaryField(help_text='Agregado cifrado por opción (ver homomorphic.add_ballots).')),
+                ('ballots', models.PositiveIntegerField(default=0)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('election', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='encrypted_tally_row', to='voting.election')),
+            ],
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.8 on 2026-10-17 15:27
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMinute
+
+BATCH_SIZE = 2000
+
+# Ventanas de turnout.RESOLUTIONS / bucket_start (minuto y hora)
+RESOLUTIONS = (1, 60)
+
+
+def bucket_start(when, minutes):
+    start = when.replace(second=0, microsecond=0)
+    return start.replace(minute=0) if minutes == 60 else start
+
+
+def fill_turnout_buckets(apps, schema_editor):
+    # Participación de las elecciones que ya tienen votos: GROUP BY por minuto sobre las
+    # papeletas y sus respuestas (como turnout.count_turnout_from_ballots); las horas se suman aquí
+    Vote = apps.get_model('voting', 'Vote')
+    BallotAnswer = apps.get_model('voting', 'BallotAnswer')
+    TurnoutBucket = apps.get_model('voting', 'TurnoutBucket')
+
+    ballots = (
+        Vote.objects.annotate(minute=TruncMinute('timestamp'))
+        .values_list('election_id', 'minute').annotate(total=Count('id')).order_by()
+    )
+    by_minute = [(election_id, minute, '', '', total) for election_id, minute, total in ballots]
+    by_minute.extend(
+        BallotAnswer.objects.annotate(minute=TruncMinute('vote__timestamp'))
+        .values_list('election_id', 'minute', 'question', 'answer').annotate(total=Count('id')).order_by()
+    )
+    counts = Counter()
+    for election_id, minute, question, option, total in by_minute:
+        for minutes in RESOLUTIONS:
+            counts[(election_id, minutes, bucket_start(minute, minutes), question, option)] += total
+
+    TurnoutBucket.objects.bulk_create(
+        (
+            TurnoutBucket(
+                election_id=election_id, minutes=minutes, start=start, question=question, option=option, count=count
+            )
+            for (election_id, minutes, start, question, option), count in counts.items()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0015_encrypted_tally'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TurnoutBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minutes', models.PositiveSmallIntegerField(default=1)),
+                ('start', models.DateTimeField()),
+                ('question', models.CharField(blank=True, default='', max_length=10)),
+                ('option', models.CharField(blank=True, default='', max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['election', 'timestamp'], name='vote_election_time_idx'),
+        ),
+        migrations.AddField(
+            model_name='turnoutbucket',
+            name='election',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='voting.election'),
+        ),
+        migrations.AddConstraint(
+            model_name='turnoutbucket',
+            constraint=models.UniqueConstraint(fields=('election', 'minutes', 'start', 'question', 'option'), name='unique_turnout_bucket'),
+        ),
+        migrations.RunPython(fill_turnout_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+def discard_plaintext_pool(apps, schema_editor):
+    # La reserva solo es un caché: las filas con la llave privada en PEM plano se borran
+    # en vez de cifrarse aquí, y 'run_key_pool' la vuelve a llenar ya cifrada.
+    apps.get_model('voting', 'PregeneratedKeyPair').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0017_vote_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(discard_plaintext_pool, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='pregeneratedkeypair',
+            name='private_key',
+        ),
+        migrations.AddField(
+            model_name='pregeneratedkeypair',
+            name='sealed_private_key',
+            field=models.BinaryField(default=b''),
+            preserve_default=False,
+        ),
+    ]
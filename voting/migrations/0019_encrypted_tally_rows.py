@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# Copia de homomorphic.empty_aggregate(): Enc(0) trivial por opción, cada cifrado un par
+# de puntos al infinito en jacobianas (1, 1, 0) de 32 bytes por coordenada.
+COORDINATE_SIZE = 32
+INFINITY = (1, 1, 0)
+
+
+def empty_aggregate(size):
+    point = b''.join(coordinate.to_bytes(COORDINATE_SIZE, 'big') for coordinate in INFINITY)
+    return point * (2 * size)
+
+
+def create_missing_tallies(apps, schema_editor):
+    # Elecciones con conteo cifrado sin fila de agregado: antes la creaba el primer voto
+    Election = apps.get_model('voting', 'Election')
+    EncryptedTally = apps.get_model('voting', 'EncryptedTally')
+    elections = Election.objects.exclude(tally_public_key='').filter(encrypted_tally_row__isnull=True)
+    EncryptedTally.objects.bulk_create(
+        EncryptedTally(
+            election=election,
+            ciphertexts=empty_aggregate(sum(len(question['options']) for question in election.questions)),
+        )
+        for election in elections
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0018_seal_pool_private_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_tallies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def reject_plaintext_submissions(apps, schema_editor):
+    # Las solicitudes que aún esperan guardan la llave en PEM plano. No se cifran aquí
+    # (la migración no conoce el llavero): se rechazan y el votante vuelve a enviar su voto.
+    BallotSubmission = apps.get_model('voting', 'BallotSubmission')
+    BallotSubmission.objects.filter(status__in=['pending', 'processing']).update(
+        status='failed',
+        error="La cola se actualizó mientras tu voto esperaba. Vuelve a enviar tu voto.",
+        finished_at=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0019_encrypted_tally_rows'),
+    ]
+
+    operations = [
+        migrations.RunPython(reject_plaintext_submissions, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='ballotsubmission',
+            name='private_key',
+        ),
+        migrations.AddField(
+            model_name='ballotsubmission',
+            name='sealed_private_key',
+            field=models.BinaryField(blank=True, default=b''),
+            preserve_default=False,
+        ),
+    ]
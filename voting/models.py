@@ -1,9 +1,17 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
 # Importamos el modelo de usuario por defecto de Django
 from django.contrib.auth.models import User 
+import re
+import uuid
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from .crypto_utils import SIGNATURE_SCHEME_CHOICES, DEFAULT_SIGNATURE_SCHEME, public_key_fingerprint
+from .homomorphic import empty_aggregate
+
 # ---------------------------------------------------------
 # 1. MODELO DE PERFIL DE VOTANTE (VoterProfile)
 # ---------------------------------------------------------
@@ -22,14 +30,48 @@ class VoterProfile(models.Model):
         null=True,          
         help_text="Llave pública RSA del votante, usada para verificar la firma digital."
     )
-    
-    # ESTO ES CRÍTICO: Este campo actúa como un interruptor.
-    # False = Puede votar. True = Ya votó, bloquéalo.
-    has_voted = models.BooleanField(default=False) 
+
+    # Esquema de firma con el que se generó la llave pública (RSA PKCS#1 v1.5, RSA-PSS o Ed25519).
+    # La verificación del voto y la herramienta de llaves usan este dato para saber cómo leerla.
+    signature_scheme = models.CharField(
+        max_length=20,
+        choices=SIGNATURE_SCHEME_CHOICES,
+        default=DEFAULT_SIGNATURE_SCHEME,
+        help_text="Esquema de firma digital asociado a la llave pública."
+    )
+
+    # Huella SHA-256 (hex) de la llave pública en DER.
+    # Sirve para comparar llaves sin volver a exportar PEM y como parte de la llave de la caché.
+    public_key_fingerprint = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text="SHA-256 de la llave pública (DER), en hexadecimal."
+    )
+
+    # Si ya votó o no se guarda POR ELECCIÓN en el padrón (ElectionVoter.has_voted).
 
     def __str__(self):
         return f"Perfil de {self.user.username}"
 
+    def set_public_key(self, public_key_pem, scheme):
+        """Registra la llave pública, su esquema y su huella (no guarda; falta save())."""
+        self.public_key = public_key_pem
+        self.signature_scheme = scheme
+        self.public_key_fingerprint = public_key_fingerprint(public_key_pem, scheme)
+
+    def ensure_fingerprint(self):
+        """Calcula y guarda la huella si el perfil es anterior a esta columna."""
+        if self.public_key and not self.public_key_fingerprint:
+            self.public_key_fingerprint = public_key_fingerprint(self.public_key, self.signature_scheme)
+            self.save(update_fields=['public_key_fingerprint'])
+        return self.public_key_fingerprint
+
+    @property
+    def public_key_cache_key(self):
+        """Llave de PUBLIC_KEY_CACHE: cambia sola si el votante registra otra llave."""
+        return (self.pk, self.ensure_fingerprint())
+
 # ---------------------------------------------------------
 # SEÑAL (AUTOMATIZACIÓN)
 # ---------------------------------------------------------
@@ -41,12 +83,129 @@ def create_user_profile(sender, instance, created, **kwargs):
     if created:
         VoterProfile.objects.create(user=instance)
 
+# ---------------------------------------------------------
+# 1.1 ELECCIONES (Election)
+# ---------------------------------------------------------
+# Cada elección define sus propias preguntas y opciones. Votos, respuestas, contadores
+# y padrón llevan la elección en sus índices compuestos, así cada consulta del tablero,
+# la auditoría o el conteo solo recorre las filas de UNA elección.
+#
+# Formato de 'questions' (lista, en orden):
+#   [{"key": "P1", "title": "Interés", "text": "¿...?", "help": "...", "chart_title": "...",
+#     "options": [{"code": "ALTO", "label": "Alto"}, ...]}, ...]
+QUESTION_KEY_PATTERN = r'^[A-Z][A-Z0-9]*$'
+OPTION_CODE_PATTERN = r'^[A-Z0-9][A-Z0-9\-]*$'
+
+
+class Election(models.Model):
+    # Identificador corto para las URLs (ej: /voting/elecciones/consejo-2026/vote/)
+    slug = models.SlugField(max_length=50, unique=True)
+    name = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    questions = models.JSONField(help_text="Preguntas de la boleta con sus opciones (ver formato en models.py).")
+
+    # Cerrada = ya no acepta votos (los resultados y la auditoría siguen disponibles)
+    is_open = models.BooleanField(default=True)
+
+    # Inscripción abierta: cualquier votante registrado puede votar (su fila del padrón
+    # se crea al votar). Cerrada: solo quienes ya están en ElectionVoter.
+    open_enrollment = models.BooleanField(default=True)
+
+    # Conteo cifrado (opcional): llave pública ElGamal (P-256, PEM) con la que se cifra cada
+    # opción de cada papeleta. La secreta la guarda quien escruta (ver voting/homomorphic.py).
+    tally_public_key = models.TextField(
+        blank=True,
+        help_text="Llave pública del conteo cifrado aditivo (vacío = sin conteo cifrado)."
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        if not isinstance(self.questions, list) or not self.questions:
+            raise ValidationError({'questions': "Debe ser una lista con al menos una pregunta."})
+        seen = set()
+        for question in self.questions:
+            key = question.get('key', '') if isinstance(question, dict) else ''
+            if not re.match(QUESTION_KEY_PATTERN, key) or key in seen or key in ('USUARIO', 'ELECCION'):
+                raise ValidationError({'questions': f"Clave de pregunta inválida o repetida: '{key}'."})
+            seen.add(key)
+            codes = [option.get('code', '') for option in question.get('options') or []]
+            if not codes or len(set(codes)) != len(codes) or not all(re.match(OPTION_CODE_PATTERN, code) for code in codes):
+                raise ValidationError({'questions': f"Opciones inválidas o repetidas en '{key}'."})
+
+    @cached_property
+    def question_options(self):
+        """{'P1': {'ALTO': 'Alto', ...}, ...} en el orden de la boleta."""
+        return {
+            question['key']: {option['code']: option['label'] for option in question['options']}
+            for question in self.questions
+        }
+
+    @property
+    def question_keys(self):
+        return tuple(self.question_options)
+
+    def get_label(self, key, code):
+        """Texto legible de una respuesta (ej: 'RAPIDO' -> 'Muy rápido')."""
+        return self.question_options.get(key, {}).get(code, code)
+
+    def is_valid_answer(self, key, code):
+        return code in self.question_options.get(key, {})
+
+    @property
+    def encrypted_tally(self):
+        return bool(self.tally_public_key)
+
+    @cached_property
+    def tally_slots(self):
+        """[('P1', 'ALTO'), ('P1', 'MEDIO'), ...]: una posición por opción en el conteo cifrado."""
+        return [(key, code) for key, options in self.question_options.items() for code in options]
+
+
+# ---------------------------------------------------------
+# 1.2 PADRÓN POR ELECCIÓN (ElectionVoter)
+# ---------------------------------------------------------
+# Una fila por votante y elección. has_voted es el "interruptor" que antes vivía en
+# VoterProfile: False = puede votar, True = ya votó en ESTA elección.
+class ElectionVoter(models.Model):
+    # Sin índice propio: el índice único (election, voter) ya empieza por la elección
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name='roll', db_index=False)
+    voter = models.ForeignKey(VoterProfile, on_delete=models.CASCADE, related_name='elections')
+    has_voted = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['election', 'voter'], name='unique_voter_per_election'),
+        ]
+        indexes = [
+            # Participación de una elección: COUNT(*) ... WHERE election = X AND has_voted
+            models.Index(fields=['election', 'has_voted'], name='election_turnout_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.voter} en {self.election.slug}"
+
+
 # ---------------------------------------------------------
 # 2. MODELO DE VOTO (Vote)
 # ---------------------------------------------------------
 # Esta tabla actúa como la "Urna Digital". 
 # Cada fila aquí es una papeleta depositada.
 class Vote(models.Model):
+    # Elección a la que pertenece la papeleta (sin índice propio: ver los índices compuestos)
+    election = models.ForeignKey(
+        Election,
+        on_delete=models.PROTECT,
+        related_name='votes',
+        db_index=False,
+    )
+
     # Vinculo el voto con el perfil del votante para saber quién fue.
     voter = models.ForeignKey(
         'VoterProfile', 
@@ -63,21 +222,321 @@ class Vote(models.Model):
     # SEGURIDAD (Integridad y No Repudio):
     # Guardo el hash firmado. Si alguien intenta alterar el voto en la base de datos,
     # esta firma ya no coincidirá y sabremos que hubo trampa.
-    digital_signature = models.TextField(
+    # Se guarda en bytes (la mitad que en hexadecimal); para mostrarla, crypto_utils.to_hex().
+    digital_signature = models.BinaryField(
         help_text="Firma digital (Hash RSA) del voto, prueba de no repudio."
     )
     
     # SEGURIDAD (Confidencialidad):
-    # Además del texto plano, guardo el voto encriptado con AES.
-    # Esto demuestra que sé ocultar la información sensible.
-    encrypted_vote = models.TextField(
+    # Además del texto plano, guardo el voto encriptado con AES-GCM.
+    # Es el "sobre" binario de crypto_utils (versión + id de llave + nonce + etiqueta + cifrado).
+    encrypted_vote = models.BinaryField(
         blank=True,
         null=True,
-        help_text="Voto cifrado con AES-256 para demostrar confidencialidad."
+        help_text="Voto cifrado con AES-256-GCM (sobre binario versionado)."
     )
     
     # Guardo la fecha y hora exacta del voto para auditoría.
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # (default en vez de auto_now_add: el diario guarda la hora del comprobante, no la del flusher)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
+
+    # SHA-256 de la firma (32 bytes fijos, con índice): el comprobante del votante se busca
+    # con una sola consulta indexada en vez de comparar la firma completa fila por fila.
+    receipt_digest = models.BinaryField(
+        max_length=32,
+        db_index=True,
+        help_text="SHA-256 de la firma digital (búsqueda pública de comprobantes)."
+    )
+
+    # Conteo cifrado: Enc(0/1) de cada opción de la boleta (Election.tally_slots), solo en
+    # elecciones con tally_public_key. Permite reconstruir el agregado de EncryptedTally.
+    tally_ciphertext = models.BinaryField(
+        null=True,
+        blank=True,
+        help_text="Cifrados ElGamal exponenciales de cada opción (conteo cifrado aditivo)."
+    )
+
+    # Posición de la papeleta en el registro público (hoja del árbol de Merkle, ver LedgerNode).
+    ledger_index = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        unique=True,
+        help_text="Número de hoja de esta papeleta en el registro público."
+    )
+
+    class Meta:
+        constraints = [
+            # Un votante, una papeleta POR ELECCIÓN: la base de datos rechaza el segundo voto
+            # aunque dos peticiones pasen la validación al mismo tiempo.
+            models.UniqueConstraint(fields=['election', 'voter'], name='unique_vote_per_election'),
+        ]
+        indexes = [
+            # Auditoría y exportación: WHERE election = X ORDER BY id (paginación por cursor)
+            models.Index(fields=['election', 'id'], name='vote_election_idx'),
+            # Filtros por fecha de la auditoría y reconstrucción de TurnoutBucket (rango de timestamp)
+            models.Index(fields=['election', 'timestamp'], name='vote_election_time_idx'),
+        ]
 
     def __str__(self):
         return f"Voto de {self.voter.user.username} por {self.option}"
+
+
+# SEÑAL: Cada voto nuevo invalida la foto cacheada del tablero de resultados.
+# Esperamos al COMMIT: si la transacción se revierte, los resultados no cambiaron.
+@receiver(post_save, sender=Vote)
+def invalidate_results_snapshot(sender, instance, created, **kwargs):
+    if created:
+        from .results_cache import bump_results_version
+        slug = instance.election.slug
+        transaction.on_commit(lambda: bump_results_version(slug))
+
+
+# ---------------------------------------------------------
+# 2.1 RESPUESTAS ESTRUCTURADAS (BallotAnswer)
+# ---------------------------------------------------------
+# Vote.option guarda el texto firmado ('USUARIO:x|P1:ALTO|P2:FACIL...') y NO se toca,
+# porque la firma digital depende de ese texto exacto.
+# Aquí guardamos las mismas respuestas ya separadas (una fila por pregunta),
+# para que conteos y filtros sean consultas indexadas en lugar de expresiones regulares.
+class BallotAnswer(models.Model):
+    # Copia de Vote.election: permite contar y filtrar sin unir con la tabla de votos
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, db_index=False)
+    vote = models.ForeignKey(
+        Vote,
+        on_delete=models.CASCADE,
+        related_name='answers',
+        help_text="Papeleta a la que pertenece esta respuesta."
+    )
+
+    # Código de la pregunta (ej: 'P1') y de la respuesta (ej: 'ALTO')
+    question = models.CharField(max_length=10)
+    answer = models.CharField(max_length=50)
+
+    class Meta:
+        constraints = [
+            # Una papeleta solo puede responder una vez cada pregunta
+            models.UniqueConstraint(fields=['vote', 'question'], name='unique_answer_per_question'),
+        ]
+        indexes = [
+            # Índice para el GROUP BY (pregunta, respuesta) y los filtros de auditoría de una elección
+            models.Index(fields=['election', 'question', 'answer'], name='ballot_answer_election_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.question}:{self.answer} (voto #{self.vote_id})"
+
+
+# ---------------------------------------------------------
+# 3. MODELO DE CONTEO (VoteTally)
+# ---------------------------------------------------------
+# Contador persistente por pregunta/opción.
+# En lugar de re-leer y re-parsear TODAS las papeletas cada vez que alguien abre
+# el tablero, cada voto suma +1 aquí dentro de la misma transacción que lo guarda.
+# Así el tablero se arma con una sola consulta pequeña (a lo mucho ~12 filas).
+class VoteTally(models.Model):
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, db_index=False)
+
+    # Código de la pregunta (ej: 'P1')
+    question = models.CharField(max_length=10)
+
+    # Código de la opción tal como viaja en el voto (ej: 'ALTO')
+    option = models.CharField(max_length=50)
+
+    # Número de votos acumulados para esta combinación pregunta/opción.
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Solo puede existir un contador por cada pregunta/opción de cada elección.
+        constraints = [
+            models.UniqueConstraint(fields=['election', 'question', 'option'], name='unique_tally_per_election_option'),
+        ]
+        ordering = ['election', 'question', 'id']
+
+    def __str__(self):
+        return f"{self.question}:{self.option} = {self.count}"
+
+
+# ---------------------------------------------------------
+# 3.1 CONTEO CIFRADO (EncryptedTally)
+# ---------------------------------------------------------
+# Una fila por elección con conteo cifrado: la suma homomórfica de los cifrados de todas
+# sus papeletas (un par de puntos por opción). Se actualiza en la transacción de cada voto
+# con un UPDATE condicional sobre 'version' (si otro voto ganó, se relee y se reintenta).
+# La fila nace con la elección (create_encrypted_tally): el voto solo la actualiza.
+class EncryptedTally(models.Model):
+    election = models.OneToOneField(Election, on_delete=models.CASCADE, related_name='encrypted_tally_row')
+    ciphertexts = models.BinaryField(help_text="Agregado cifrado por opción (ver homomorphic.add_ballots).")
+    ballots = models.PositiveIntegerField(default=0)
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Conteo cifrado de {self.election.slug} ({self.ballots} papeletas)"
+
+
+@receiver(post_save, sender=Election)
+def create_encrypted_tally(sender, instance, **kwargs):
+    # Crearla en el primer voto chocaba (IntegrityError) entre dos primeros votos simultáneos
+    if instance.encrypted_tally:
+        EncryptedTally.objects.get_or_create(
+            election=instance, defaults={'ciphertexts': empty_aggregate(len(instance.tally_slots))}
+        )
+
+
+# ---------------------------------------------------------
+# 3.2 PARTICIPACIÓN EN EL TIEMPO (TurnoutBucket)
+# ---------------------------------------------------------
+# Como VoteTally, pero por ventana de tiempo: cada voto suma +1 a la fila de su minuto
+# y a la de su hora (question='' cuenta papeletas; las demás, cada respuesta), en la
+# misma transacción. Las gráficas de participación leen estas filas en vez de recorrer
+# millones de papeletas (ni sumar miles de minutos para armar las horas).
+class TurnoutBucket(models.Model):
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, db_index=False)
+
+    # Ancho de la ventana en minutos: 1 (por minuto) o 60 (por hora)
+    minutes = models.PositiveSmallIntegerField(default=1)
+
+    # Inicio de la ventana, en la hora local de TIME_ZONE como Vote.timestamp
+    start = models.DateTimeField()
+
+    # '' y '' = papeletas del minuto; si no, la pregunta ('P1') y la opción ('ALTO')
+    question = models.CharField(max_length=10, blank=True, default='')
+    option = models.CharField(max_length=50, blank=True, default='')
+
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # La restricción es también el índice de las consultas:
+            # WHERE election = X AND minutes = 60 AND start BETWEEN ...
+            models.UniqueConstraint(
+                fields=['election', 'minutes', 'start', 'question', 'option'], name='unique_turnout_bucket'
+            ),
+        ]
+
+    def __str__(self):
+        label = f"{self.question}:{self.option}" if self.question else "papeletas"
+        return f"{self.start:%Y-%m-%d %H:%M} (+{self.minutes} min) {label} = {self.count}"
+
+
+# ---------------------------------------------------------
+# 4. RESERVA DE LLAVES PRE-GENERADAS (PregeneratedKeyPair)
+# ---------------------------------------------------------
+# Generar una llave RSA de 2048 bits tarda cientos de milisegundos de CPU.
+# Un proceso en segundo plano (manage.py run_key_pool) llena esta tabla con
+# pares listos, y la vista de generación solo "saca" uno (casi instantáneo).
+# OJO: la fila se BORRA en cuanto se entrega; la llave privada nunca se reutiliza.
+# La privada se guarda cifrada con el llavero de papeletas (voting/key_pool.py), no en PEM.
+class PregeneratedKeyPair(models.Model):
+    public_key = models.TextField()
+    sealed_private_key = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Par de llaves pre-generado #{self.pk}"
+
+
+# Métricas de la reserva: cuántas veces hubo llave lista (hit),
+# cuántas tuvimos que generarla en caliente (miss) y cuántas generó el proceso de fondo.
+class KeyPoolStats(models.Model):
+    hits = models.PositiveBigIntegerField(default=0)
+    misses = models.PositiveBigIntegerField(default=0)
+    generated = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Reserva de llaves: {self.hits} hits / {self.misses} misses"
+
+
+# ---------------------------------------------------------
+# 5. COLA DE INGESTA DE VOTOS (BallotSubmission)
+# ---------------------------------------------------------
+# En modo "cola" (settings.BALLOT_INGESTION_MODE = 'queue') la vista NO firma ni cifra:
+# solo valida y guarda aquí la solicitud. Los procesos de 'manage.py process_ballot_queue'
+# la toman, hacen la criptografía, guardan el Vote y marcan el resultado.
+# El votante consulta el estado con su comprobante (receipt).
+class BallotSubmission(models.Model):
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'En cola'),
+        (PROCESSING, 'Procesando'),
+        (DONE, 'Registrado'),
+        (FAILED, 'Rechazado'),
+    ]
+
+    # Comprobante público para consultar el estado (no revela el id interno)
+    receipt = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    voter = models.ForeignKey(VoterProfile, on_delete=models.CASCADE, related_name='submissions')
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name='submissions')
+    vote_content = models.TextField(help_text="Texto canónico del voto que se va a firmar.")
+
+    # La llave privada subida se guarda SOLO mientras la solicitud espera en la cola,
+    # y cifrada con el llavero de papeletas (un respaldo de la base no la expone).
+    # El worker la borra en cuanto termina (con éxito o con error).
+    sealed_private_key = models.BinaryField(blank=True)
+
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(blank=True)
+    vote = models.OneToOneField(Vote, on_delete=models.SET_NULL, null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Latencia (ms) de cada etapa, para las métricas de la cola
+    queue_ms = models.FloatField(null=True, blank=True)
+    sign_ms = models.FloatField(null=True, blank=True)
+    verify_ms = models.FloatField(null=True, blank=True)
+    encrypt_ms = models.FloatField(null=True, blank=True)
+    commit_ms = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Los workers buscan "la siguiente pendiente": WHERE status = ... ORDER BY id
+            models.Index(fields=['status', 'id'], name='submission_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Solicitud {self.receipt} ({self.get_status_display()})"
+
+
+# ---------------------------------------------------------
+# 6. REGISTRO PÚBLICO DE PAPELETAS (árbol de Merkle)
+# ---------------------------------------------------------
+# Cada voto confirmado se agrega como hoja (SHA-256 de su firma) a un árbol de Merkle
+# de solo-agregar (ver merkle.py). Los auditores comparan la raíz publicada: si alguien
+# borra o cambia una papeleta, la raíz ya no coincide. Cada votante puede pedir la
+# prueba de inclusión de su comprobante (O(log n) hashes) sin confiar en la fila de Vote.
+
+# Nodos de subárboles completos: se escriben una vez y no cambian nunca.
+class LedgerNode(models.Model):
+    # Nivel 0 = hojas; el nodo (nivel, posición) cubre 2^nivel hojas
+    level = models.PositiveSmallIntegerField()
+    position = models.PositiveBigIntegerField()
+    hash = models.BinaryField(max_length=32)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['level', 'position'], name='unique_ledger_node'),
+        ]
+        indexes = [
+            # Buscar la hoja de un comprobante: solo se indexan las hojas
+            models.Index(fields=['hash'], condition=models.Q(level=0), name='ledger_leaf_hash_idx'),
+        ]
+
+    def __str__(self):
+        return f"Nodo ({self.level}, {self.position})"
+
+
+# Estado actual del árbol (una sola fila): tamaño, raíz y frontera.
+# Se bloquea al agregar un lote de hojas (ver voting/ledger.py), así las posiciones no se repiten.
+class LedgerHead(models.Model):
+    size = models.PositiveBigIntegerField(default=0)
+    root = models.BinaryField(max_length=32)
+    # Raíces de los subárboles completos más a la derecha, concatenadas (32 bytes cada una)
+    frontier = models.BinaryField(default=b'')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Registro de papeletas: {self.size} hojas"
@@ -0,0 +1,71 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .merkle import receipt_digest
+from .models import Vote
+
+# ---------------------------------------------------------
+# CONSULTA PÚBLICA DE COMPROBANTES (tablero de papeletas)
+# ---------------------------------------------------------
+# Cualquiera puede preguntar si un comprobante (la firma en hex) está en la urna, sin login.
+# - La búsqueda es UNA consulta por el índice de Vote.receipt_digest (32 bytes fijos).
+# - Los comprobantes que no existen se recuerdan en caché unos segundos: quien prueba
+#   firmas al azar no llega a la base de datos. Al confirmar un voto se borra su marca.
+# - Cada cliente tiene un límite de consultas por ventana de tiempo (contador en caché).
+
+
+def _missing_key(digest):
+    return f'receipt:missing:{digest.hex()}'
+
+
+def client_id(request):
+    """IP del cliente. Detrás de un proxy de confianza se usa el primer X-Forwarded-For."""
+    if settings.RECEIPT_TRUST_X_FORWARDED_FOR:
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def check_rate_limit(client):
+    """
+    Cuenta una consulta del cliente en la ventana actual.
+    Regresa 0 si puede seguir, o los segundos que faltan para la siguiente ventana.
+    """
+    window = settings.RECEIPT_LOOKUP_WINDOW
+    now = time.time()
+    key = f'receipt:rate:{client}:{int(now // window)}'
+    # add() crea el contador solo si no existe; incr() es atómico en cachés compartidas
+    cache.add(key, 0, window)
+    try:
+        used = cache.incr(key)
+    except ValueError:
+        used = 1  # La llave expiró justo entre add() e incr()
+    if used > settings.RECEIPT_LOOKUP_RATE:
+        return int(window - now % window) + 1
+    return 0
+
+
+def lookup_receipt(signature):
+    """
+    Busca la papeleta de una firma (bytes). Regresa un diccionario público
+    (sin datos del votante) o None si no existe.
+    """
+    digest = receipt_digest(signature)
+    if cache.get(_missing_key(digest)):
+        return None
+
+    row = Vote.objects.filter(receipt_digest=digest).values_list('timestamp', 'ledger_index').first()
+    if row is not None:
+        recorded_at, ledger_index = row
+        return {'recorded_at': recorded_at, 'ledger_index': ledger_index}
+
+    cache.set(_missing_key(digest), True, settings.RECEIPT_NEGATIVE_CACHE_TIMEOUT)
+    return None
+
+
+def forget_missing_receipt(signature):
+    """Borra la marca de "no existe" de una firma recién confirmada."""
+    cache.delete(_missing_key(receipt_digest(signature)))
@@ -0,0 +1,131 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .ballot_utils import aget_tally_results, get_tally_results
+from .db_router import reading_from_replica
+from .models import Vote
+
+# ---------------------------------------------------------
+# FOTO CACHEADA DE RESULTADOS (Snapshot)
+# ---------------------------------------------------------
+# Muchas personas recargan el tablero durante la elección y todas reciben los
+# mismos números. En lugar de recalcularlos en cada petición, guardamos una
+# "foto" en la caché de Django, identificada por un número de versión.
+# Cada voto nuevo sube la versión de SU elección (señal post_save de Vote), así la
+# siguiente petición arma una foto nueva y la anterior simplemente deja de usarse.
+# Las llaves usan el slug de la elección: el ETag se calcula sin tocar la base de datos.
+
+
+def _version_key(slug):
+    return f'results:version:{slug}'
+
+
+def _snapshot_key(slug, version):
+    return f'results:snapshot:{slug}:{version}'
+
+
+def _version_timeout():
+    # Con caché compartida la versión no expira: sin votos nuevos el ETag no cambia y los
+    # clientes que consultan siguen recibiendo 304. Con la caché en memoria de cada proceso,
+    # un voto solo sube la versión del worker que lo guardó: ahí RESULTS_CACHE_TIMEOUT acota
+    # cuánto puede atrasarse la de los demás workers.
+    if settings.CACHES['default']['BACKEND'].endswith('.LocMemCache'):
+        return settings.RESULTS_CACHE_TIMEOUT
+    return None
+
+
+def get_results_version(slug):
+    """
+    Versión actual de los resultados de una elección.
+    Arranca en la hora actual (ms) en vez de en 1: si la llave se desaloja o la caché
+    se reinicia, la versión nueva nunca coincide con un ETag viejo de algún cliente.
+    """
+    version = cache.get(_version_key(slug))
+    if version is None:
+        cache.add(_version_key(slug), int(time.time() * 1000), _version_timeout())
+        version = cache.get(_version_key(slug))
+    return version
+
+
+async def aget_results_version(slug):
+    version = await cache.aget(_version_key(slug))
+    if version is None:
+        await cache.aadd(_version_key(slug), int(time.time() * 1000), _version_timeout())
+        version = await cache.aget(_version_key(slug))
+    return version
+
+
+def bump_results_version(slug):
+    """Invalida la foto actual de una elección. Se llama cuando se confirma un voto nuevo."""
+    try:
+        cache.incr(_version_key(slug))
+    except ValueError:
+        # La llave no existía (o se desalojó): la creamos con una versión nueva
+        get_results_version(slug)
+
+
+def build_results_snapshot(election, version):
+    """Arma la foto de resultados desde la tabla de contadores (2 consultas pequeñas)."""
+    total_votes = Vote.objects.filter(election=election).count()
+    return _snapshot(election, version, get_tally_results(election), total_votes)
+
+
+async def abuild_results_snapshot(election, version):
+    total_votes = await Vote.objects.filter(election=election).acount()
+    return _snapshot(election, version, await aget_tally_results(election), total_votes)
+
+
+def _snapshot(election, version, tally_results, total_votes):
+    questions = {}
+    for question in election.questions:
+        key = question['key']
+        rows = tally_results.get(key, [])
+        questions[key] = {
+            'title': question.get('chart_title') or question.get('title') or key,
+            'codes': [option for option, count in rows],
+            'options': [election.get_label(key, option) for option, count in rows],
+            'counts': [count for option, count in rows],
+        }
+    return {
+        'election': election.slug,
+        'version': version,
+        'total_votes': total_votes,
+        'questions': questions,
+    }
+
+
+def _snapshot_timeout():
+    # Armada desde la réplica puede ir un poco atrás de la versión: se guarda solo unos
+    # segundos (si no, esa foto atrasada quedaría hasta el siguiente voto)
+    timeout = settings.RESULTS_CACHE_TIMEOUT
+    if reading_from_replica():
+        timeout = min(timeout, settings.DATABASE_REPLICA_PIN_SECONDS)
+    return timeout
+
+
+def get_results_snapshot(election):
+    """Regresa la foto de la versión actual, armándola solo si aún no está en caché."""
+    version = get_results_version(election.slug)
+    snapshot = cache.get(_snapshot_key(election.slug, version))
+    if snapshot is None:
+        snapshot = build_results_snapshot(election, version)
+        cache.set(_snapshot_key(election.slug, version), snapshot, _snapshot_timeout())
+    return snapshot
+
+
+async def aget_results_snapshot(election):
+    """get_results_snapshot sin bloquear el event loop (caché y ORM asíncronos)."""
+    version = await aget_results_version(election.slug)
+    snapshot = await cache.aget(_snapshot_key(election.slug, version))
+    if snapshot is None:
+        snapshot = await abuild_results_snapshot(election, version)
+        await cache.aset(_snapshot_key(election.slug, version), snapshot, _snapshot_timeout())
+    return snapshot
+
+
+def results_etag(request, election=None, **kwargs):
+    """ETag de los resultados: solo depende de la versión (no toca la base de datos)."""
+    slug = election or settings.DEFAULT_ELECTION
+    return f"results-{slug}-v{get_results_version(slug)}"
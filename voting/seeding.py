@@ -0,0 +1,175 @@
+import itertools
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .ballot_utils import add_to_tally, build_vote_content
+from .crypto_utils import encrypt_vote_aes, get_scheme, key_fingerprint
+from .encrypted_tally import add_to_encrypted_tally, encrypt_answers
+from .key_pool import pop_key_pairs
+from .ledger import append_signatures
+from .merkle import receipt_digest
+from .models import BallotAnswer, ElectionVoter, Vote, VoterProfile
+from .turnout import add_to_turnout, turnout_counts
+
+# ---------------------------------------------------------
+# ELECTORADO SINTÉTICO (pruebas de carga)
+# ---------------------------------------------------------
+# Crear votantes uno por uno pasa por la señal create_user_profile (un INSERT extra
+# por usuario) y por PBKDF2 (cientos de ms por contraseña). Aquí todo se inserta con
+# bulk_create por lotes: las señales no se disparan y la contraseña se hashea UNA vez.
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+class SeedKey:
+    """Material de llave ya leído: la llave privada (objeto), su PEM público y su huella."""
+
+    def __init__(self, scheme, public_key_pem, private_key):
+        self.scheme = scheme
+        self.public_key_pem = public_key_pem
+        self.private_key = private_key
+        self.fingerprint = key_fingerprint(private_key, scheme.name)
+
+
+def load_seed_keys(source, count, scheme_name):
+    """
+    Prepara 'count' llaves para los votantes sintéticos.
+    - source='pool':     pares RSA de la reserva PregeneratedKeyPair (se consumen).
+    - source='generate': llaves nuevas del esquema indicado (Ed25519 es casi gratis).
+    Las llaves se reparten en ciclo entre los votantes: son datos de prueba.
+    """
+    scheme = get_scheme(scheme_name)
+    if source == 'pool':
+        if scheme.key_type != 'rsa':
+            raise ValueError("La reserva solo tiene llaves RSA: usa un esquema RSA o source='generate'.")
+        pairs = pop_key_pairs(count)
+        if not pairs:
+            raise ValueError("La reserva de llaves está vacía (ejecuta 'manage.py run_key_pool --once').")
+    else:
+        pairs = [scheme.generate_keys() for _ in range(count)]
+
+    return [SeedKey(scheme, public_key_pem, scheme.import_key(private_key_pem)) for public_key_pem, private_key_pem in pairs]
+
+
+def parse_distribution(value, election):
+    """
+    Convierte 'P1=ALTO:5,MEDIO:3,BAJO:2;P3=MUCHO:1,NO-DUDA:1' en pesos por pregunta de la elección.
+    Las preguntas que no aparecen se reparten de forma uniforme.
+    """
+    weights = {key: {option: 1 for option in options} for key, options in election.question_options.items()}
+    for chunk in filter(None, (part.strip() for part in (value or '').split(';'))):
+        key, _, options = chunk.partition('=')
+        key = key.strip().upper()
+        if key not in weights:
+            raise ValueError(f"Pregunta desconocida en la distribución: '{key}'")
+        question_weights = {}
+        for item in options.split(','):
+            option, _, weight = item.partition(':')
+            option = option.strip().upper()
+            if not election.is_valid_answer(key, option):
+                raise ValueError(f"Opción inválida para {key}: '{option}'")
+            question_weights[option] = float(weight or 1)
+        weights[key] = question_weights
+    return weights
+
+
+def _ballot_sampler(weights, rng):
+    # Una lista de opciones y pesos acumulados por pregunta: rng.choices es O(log n)
+    tables = {
+        key: (list(options), list(itertools.accumulate(options.values())))
+        for key, options in weights.items()
+    }
+
+    def sample():
+        return {key: rng.choices(options, cum_weights=cumulative)[0] for key, (options, cumulative) in tables.items()}
+    return sample
+
+
+def seed_electorate(election, voters, turnout, weights, rng, prefix, password_hash, seed_keys=None,
+                    batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Inserta 'voters' usuarios con su perfil, inscritos en el padrón de 'election';
+    una fracción 'turnout' ya votó.
+    Con 'seed_keys' cada papeleta lleva firma y cifrado reales (verificables con verify_ballots);
+    sin ellas la firma es de relleno (solo sirve para medir conteos).
+    Cada lote va en su propia transacción. Regresa {'voters': N, 'votes': M}.
+    """
+    sample = _ballot_sampler(weights, rng)
+    key_cycle = itertools.cycle(seed_keys) if seed_keys else None
+    total_votes = 0
+
+    for start in range(0, voters, batch_size):
+        stop = min(voters, start + batch_size)
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=f'{prefix}-{i}@seed.test', email=f'{prefix}-{i}@seed.test', password=password_hash)
+                for i in range(start, stop)
+            ])
+
+            # Quién votó y con qué llave (las llaves solo para quienes votaron)
+            profiles = []
+            roll = []
+            ballots = []
+            for user in users:
+                voted = rng.random() < turnout
+                seed_key = next(key_cycle) if (voted and key_cycle) else None
+                profile = VoterProfile(user=user)
+                if seed_key is not None:
+                    profile.public_key = seed_key.public_key_pem
+                    profile.signature_scheme = seed_key.scheme.name
+                    profile.public_key_fingerprint = seed_key.fingerprint
+                profiles.append(profile)
+                roll.append((profile, voted))
+                if voted:
+                    ballots.append((profile, seed_key, sample()))
+            VoterProfile.objects.bulk_create(profiles)
+            ElectionVoter.objects.bulk_create([
+                ElectionVoter(election=election, voter=profile, has_voted=voted) for profile, voted in roll
+            ])
+
+            votes = []
+            for profile, seed_key, answers in ballots:
+                vote_content = build_vote_content(profile.user.username, answers, election)
+                if seed_key is not None:
+                    signature = seed_key.scheme.sign_with_key(vote_content, seed_key.private_key)
+                    encrypted_vote = encrypt_vote_aes(vote_content)
+                else:
+                    signature = encrypted_vote = b'\x00'
+                votes.append(Vote(
+                    election=election, voter=profile, option=vote_content,
+                    digital_signature=signature, encrypted_vote=encrypted_vote,
+                    receipt_digest=receipt_digest(signature),
+                    tally_ciphertext=encrypt_answers(election, answers) if election.encrypted_tally else None,
+                ))
+            # Todo el lote entra al registro público con una sola actualización de la raíz
+            first_index = append_signatures(vote.digital_signature for vote in votes)
+            for offset, vote in enumerate(votes):
+                vote.ledger_index = first_index + offset
+            Vote.objects.bulk_create(votes)
+
+            BallotAnswer.objects.bulk_create([
+                BallotAnswer(election=election, vote=vote, question=question, answer=answer)
+                for vote, (profile, seed_key, answers) in zip(votes, ballots)
+                for question, answer in answers.items()
+            ], batch_size=batch_size)
+
+            # Contadores del tablero: un UPDATE por opción, no uno por voto
+            counts = {}
+            for profile, seed_key, answers in ballots:
+                for item in answers.items():
+                    counts[item] = counts.get(item, 0) + 1
+            add_to_tally(election, counts)
+            # Participación por minuto y por hora (el lote cae en uno o dos minutos: pocas filas)
+            add_to_turnout(election, turnout_counts(
+                (vote.timestamp, answers) for vote, (profile, seed_key, answers) in zip(votes, ballots)
+            ))
+            # Conteo cifrado: todo el lote se suma al agregado en una sola pasada
+            if election.encrypted_tally:
+                add_to_encrypted_tally(election, [vote.tally_ciphertext for vote in votes])
+
+        total_votes += len(votes)
+        if progress:
+            progress(stop, total_votes)
+
+    return {'voters': voters, 'votes': total_votes}
@@ -0,0 +1,225 @@
+// ---------------------------------------------------------
+// MODO NAVEGADOR (WebCrypto): llaves y firmas del lado del votante
+// ---------------------------------------------------------
+// La llave privada se genera aquí y se guarda en IndexedDB como CryptoKey NO exportable;
+// al servidor solo le llega la llave pública (SPKI en PEM) y, al votar, la firma en
+// hexadecimal del texto canónico 'USUARIO:x|ELECCION:e|P1:...' (ver build_vote_content).
+// Si el navegador no tiene la llave (otro equipo, datos borrados) se usa el archivo .key.
+(function () {
+    'use strict';
+
+    const DB_NAME = 'voting-keys';
+    const STORE = 'keys';
+    const RSA_PARAMS = { modulusLength: 2048, publicExponent: new Uint8Array([1, 0, 1]), hash: 'SHA-256' };
+
+    // Mismos nombres que SIGNATURE_SCHEMES en crypto_utils.py
+    const ALGORITHMS = {
+        'ed25519': {
+            key: { name: 'Ed25519' },
+            sign: { name: 'Ed25519' },
+        },
+        'rsa-pkcs1v15': {
+            key: { name: 'RSASSA-PKCS1-v1_5', ...RSA_PARAMS },
+            sign: { name: 'RSASSA-PKCS1-v1_5' },
+        },
+        'rsa-pss': {
+            // Sal de 32 bytes = la que usa pss.new() de PyCryptodome con SHA-256
+            key: { name: 'RSA-PSS', ...RSA_PARAMS },
+            sign: { name: 'RSA-PSS', saltLength: 32 },
+        },
+    };
+
+    // --- IndexedDB: una llave por usuario (varios votantes pueden compartir equipo) ---
+
+    function openDb() {
+        return new Promise((resolve, reject) => {
+            const request = indexedDB.open(DB_NAME, 1);
+            request.onupgradeneeded = () => request.result.createObjectStore(STORE);
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    async function withStore(mode, action) {
+        const db = await openDb();
+        return new Promise((resolve, reject) => {
+            const request = action(db.transaction(STORE, mode).objectStore(STORE));
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        }).finally(() => db.close());
+    }
+
+    function loadKey(username) {
+        return withStore('readonly', (store) => store.get(username));
+    }
+
+    function storeKey(username, record) {
+        return withStore('readwrite', (store) => store.put(record, username));
+    }
+
+    // --- Formatos ---
+
+    function toPem(buffer, label) {
+        const base64 = btoa(String.fromCharCode(...new Uint8Array(buffer)));
+        const lines = base64.match(/.{1,64}/g).join('\n');
+        return `-----BEGIN ${label}-----\n${lines}\n-----END ${label}-----\n`;
+    }
+
+    function toHex(buffer) {
+        return Array.from(new Uint8Array(buffer), (byte) => byte.toString(16).padStart(2, '0')).join('');
+    }
+
+    // --- Llaves ---
+
+    async function generateKeyPair(schemes) {
+        // El primer esquema permitido que el navegador soporte (Ed25519 no existe en navegadores viejos)
+        for (const scheme of schemes) {
+            const algorithm = ALGORITHMS[scheme];
+            if (!algorithm) continue;
+            try {
+                const pair = await crypto.subtle.generateKey(algorithm.key, true, ['sign', 'verify']);
+                return { scheme, pair };
+            } catch (error) {
+                // NotSupportedError: probamos el siguiente esquema
+            }
+        }
+        throw new Error('Este navegador no soporta ninguno de los esquemas de firma permitidos.');
+    }
+
+    async function createBrowserKey(config, csrfToken) {
+        const { scheme, pair } = await generateKeyPair(config.schemes);
+        const spki = await crypto.subtle.exportKey('spki', pair.publicKey);
+        const pkcs8 = await crypto.subtle.exportKey('pkcs8', pair.privateKey);
+        // La copia que se queda en el navegador ya NO se puede exportar (ni leer desde JavaScript)
+        const privateKey = await crypto.subtle.importKey('pkcs8', pkcs8, ALGORITHMS[scheme].key, false, ['sign']);
+
+        const body = new FormData();
+        body.append('signature_scheme', scheme);
+        body.append('public_key', toPem(spki, 'PUBLIC KEY'));
+        const response = await fetch(config.register_url, {
+            method: 'POST', body, credentials: 'same-origin', headers: { 'X-CSRFToken': csrfToken },
+        });
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.error || 'No se pudo registrar la llave pública.');
+
+        await storeKey(config.username, { scheme, fingerprint: data.fingerprint, privateKey });
+        // Respaldo opcional en PKCS#8: sirve como archivo .key en otro equipo
+        return { scheme, fingerprint: data.fingerprint, backupPem: toPem(pkcs8, 'PRIVATE KEY') };
+    }
+
+    function voteContent(form, config) {
+        // Idéntico a build_vote_content(): el servidor arma el mismo texto y verifica contra él
+        const parts = [`USUARIO:${config.username}`, `ELECCION:${config.election}`];
+        config.questions.forEach((key, index) => {
+            parts.push(`${key}:${form.elements[`pregunta_${index + 1}`].value}`);
+        });
+        return parts.join('|');
+    }
+
+    async function signBallot(record, content) {
+        const signature = await crypto.subtle.sign(
+            ALGORITHMS[record.scheme].sign, record.privateKey, new TextEncoder().encode(content)
+        );
+        return toHex(signature);
+    }
+
+    // --- Páginas ---
+
+    function readConfig() {
+        const element = document.getElementById('clientSigning');
+        return element ? JSON.parse(element.textContent) : null;
+    }
+
+    function csrfToken(root) {
+        return root.querySelector('input[name=csrfmiddlewaretoken]').value;
+    }
+
+    function show(element, visible) {
+        if (element) element.classList.toggle('d-none', !visible);
+    }
+
+    async function setupKeyGeneration(config) {
+        const panel = document.getElementById('browser-keygen');
+        if (!panel) return;
+        const button = panel.querySelector('[data-action=generate]');
+        const status = panel.querySelector('[data-role=status]');
+        const backup = panel.querySelector('[data-role=backup]');
+        const next = panel.querySelector('[data-role=next]');
+
+        if (!window.crypto || !crypto.subtle || !window.indexedDB) {
+            status.textContent = 'Este navegador no permite generar llaves: usa el archivo .key.';
+            button.disabled = true;
+            return;
+        }
+        const record = await loadKey(config.username).catch(() => null);
+        if (record && record.fingerprint === config.fingerprint) {
+            status.textContent = 'Este navegador ya guarda tu llave: puedes votar directamente.';
+            show(next, true);
+        }
+
+        button.addEventListener('click', async () => {
+            button.disabled = true;
+            status.textContent = 'Generando llave en tu navegador...';
+            try {
+                const created = await createBrowserKey(config, csrfToken(panel));
+                status.textContent = `Llave ${created.scheme} registrada (huella ${created.fingerprint.slice(0, 16)}...).`;
+                backup.href = URL.createObjectURL(new Blob([created.backupPem], { type: 'application/x-pem-file' }));
+                show(backup, true);
+                show(next, true);
+            } catch (error) {
+                status.textContent = error.message;
+                button.disabled = false;
+            }
+        });
+    }
+
+    async function setupBallot(config) {
+        const form = document.getElementById('ballot-form');
+        if (!form || !window.crypto || !crypto.subtle || !window.indexedDB) return;
+        const record = await loadKey(config.username).catch(() => null);
+        // Sin llave en este navegador (o es otra llave): se queda el modo archivo
+        if (!record || record.fingerprint !== config.fingerprint) return;
+
+        const browserPanel = document.getElementById('browser-signing');
+        const uploadPanel = document.getElementById('key-upload');
+        const fileInput = form.elements['private_key'];
+        const signatureInput = form.elements['signature'];
+        let browserMode = true;
+
+        const applyMode = () => {
+            show(browserPanel, browserMode);
+            show(uploadPanel, !browserMode);
+            fileInput.required = !browserMode;
+            fileInput.disabled = browserMode;
+        };
+        applyMode();
+        browserPanel.querySelector('[data-action=use-file]').addEventListener('click', () => {
+            browserMode = false;
+            applyMode();
+        });
+
+        form.addEventListener('submit', async (event) => {
+            if (!browserMode || signatureInput.value) return;
+            event.preventDefault();
+            try {
+                signatureInput.value = await signBallot(record, voteContent(form, config));
+                form.submit();
+            } catch (error) {
+                // La llave del navegador no sirvió: regresamos al archivo .key
+                browserMode = false;
+                applyMode();
+                alert(`No se pudo firmar en el navegador (${error.message}). Sube tu archivo de llave.`);
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', () => {
+        const config = readConfig();
+        if (!config) return;
+        if (config.election) {
+            setupBallot(config);
+        } else {
+            setupKeyGeneration(config);
+        }
+    });
+})();
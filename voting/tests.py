@@ -1,3 +1,1259 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from importlib import import_module, reload
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from Crypto.Cipher import AES
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import ECC, RSA
+from Crypto.Signature import eddsa, pss
+from Crypto.Util.Padding import pad
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import clear_url_caches, resolve, reverse
+
+from . import homomorphic, journal as journal_module
+from .ballot_pipeline import AlreadyVoted, BallotRejected, NotEligible, commit_ballot, seal_ballot, seal_signed_ballot
+from .ballot_queue import claim_next_submission, enqueue_submission, process_submission
+from .ballot_utils import build_vote_content, count_votes_from_ballots, get_tally_results, parse_vote_content
+from .crypto_utils import (
+    ENVELOPE_CBC, ENVELOPE_GCM, PUBLIC_KEY_CACHE, RAW_ENVELOPE_MARKER, AESKeyRing, PublicKeyCache,
+    binary_envelope_to_text, decrypt_vote_aes, encrypt_vote_aes, generate_aes_key, get_scheme,
+    normalize_client_public_key, private_key_fingerprint, public_key_fingerprint, sign_vote, text_envelope_to_binary,
+    verify_signature,
+)
+from .db_router import PIN_SESSION_KEY, REPLICA_ALIAS, ReplicaRouter, pin_primary, replica_reads
+from .elections import enroll_voters, has_voted
+from .encrypted_tally import decrypt_tally
+from .journal import BallotJournal, REJECTED_FILE, flush_entries, journal_ballot, make_entry, record_rejected
+from .key_pool import add_key_pairs, pop_key_pairs, take_key_pair
+from .key_ring import build_key_ring, check_key_ring
+from .ledger import append_all_pending, get_ledger_root, inclusion_proof
+from .merkle import verify_inclusion
+from .models import (
+    BallotSubmission, Election, ElectionVoter, EncryptedTally, PregeneratedKeyPair, TurnoutBucket, Vote, VoteTally,
+    VoterProfile,
+)
+from .receipts import lookup_receipt
+from .results_cache import get_results_snapshot, get_results_version
+from .turnout import count_turnout_from_ballots, record_vote_turnout, turnout_series
+
+BALLOT = [
+    {'key': 'P1', 'title': 'Pregunta 1', 'options': [
+        {'code': 'SI', 'label': 'Sí'}, {'code': 'NO', 'label': 'No'},
+    ]},
+]
+
+
+def make_voter(username, scheme='ed25519'):
+    """Usuario con su perfil y una llave registrada; regresa (perfil, llave privada PEM)."""
+    user = User.objects.create_user(username, username, 'Passw0rd!')
+    public_key_pem, private_key_pem = get_scheme(scheme).generate_keys()
+    profile = user.voterprofile
+    profile.set_public_key(public_key_pem, scheme)
+    profile.save()
+    return profile, private_key_pem
+
+
+def cast_vote(profile, private_key_pem, election, answers):
+    """Firma y guarda un voto por el camino normal (seal_ballot + commit_ballot); regresa el Vote."""
+    vote_content = build_vote_content(profile.user.username, answers, election)
+    signature, encrypted_vote = seal_ballot(vote_content, private_key_pem, profile.public_key, profile.signature_scheme)
+    return commit_ballot(profile, election, vote_content, answers, signature, encrypted_vote)
+
+
+# ---------------------------------------------------------
+# VOTOS SIMULTÁNEOS DEL MISMO VOTANTE
+# ---------------------------------------------------------
+
+class ConcurrentBallotTests(TransactionTestCase):
+    """
+    Varias peticiones del mismo votante llegan a la vez: solo una papeleta se guarda
+    y las demás reciben AlreadyVoted (el UPDATE condicional del padrón y las
+    restricciones únicas (election, voter) deciden, no una consulta previa).
+    """
+    submissions = 8
+
+    def setUp(self):
+        self.election = Election.objects.create(slug='simultanea', name='Simultánea', questions=BALLOT)
+        self.profile, private_key_pem = make_voter('concurrente@x.com')
+        answers = {'P1': 'SI'}
+        vote_content = build_vote_content(self.profile.user.username, answers, self.election)
+        # Cada intento lleva su propia firma: lo único que los distingue es la restricción (election, voter)
+        self.ballots = [
+            (vote_content, answers, *seal_ballot(vote_content, private_key_pem, self.profile.public_key, 'ed25519'))
+            for _ in range(self.submissions)
+        ]
+
+    def test_parallel_submissions_store_one_ballot(self):
+        barrier = threading.Barrier(self.submissions)
+        outcomes = []
+
+        def submit(vote_content, answers, signature, encrypted_vote):
+            try:
+                barrier.wait()
+                commit_ballot(self.profile, self.election, vote_content, answers, signature, encrypted_vote)
+                outcomes.append('ok')
+            except AlreadyVoted as e:
+                outcomes.append(str(e))
+            except Exception as e:
+                outcomes.append(repr(e))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit, args=ballot) for ballot in self.ballots]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(outcomes.count('ok'), 1, outcomes)
+        rejected = [outcome for outcome in outcomes if outcome != 'ok']
+        self.assertEqual(len(rejected), self.submissions - 1)
+        self.assertTrue(all(outcome.startswith("Ya has votado") for outcome in rejected), rejected)
+        self.assertEqual(Vote.objects.filter(election=self.election, voter=self.profile).count(), 1)
+        self.assertTrue(ElectionVoter.objects.get(election=self.election, voter=self.profile).has_voted)
+
+    def test_reset_flag_still_hits_unique_constraint(self):
+        vote_content, answers, signature, encrypted_vote = self.ballots[0]
+        commit_ballot(self.profile, self.election, vote_content, answers, signature, encrypted_vote)
+        # has_voted se reinició a mano: la restricción única (election, voter) de Vote sigue rechazando
+        ElectionVoter.objects.filter(election=self.election, voter=self.profile).update(has_voted=False)
+        vote_content, answers, signature, encrypted_vote = self.ballots[1]
+        with self.assertRaises(AlreadyVoted):
+            commit_ballot(self.profile, self.election, vote_content, answers, signature, encrypted_vote)
+        self.assertEqual(Vote.objects.filter(election=self.election, voter=self.profile).count(), 1)
+
+
+class CommitConflictTests(TestCase):
+    """Un IntegrityError que no es la restricción (election, voter) no debe decir "ya votaste"."""
+
+    def test_other_integrity_error_is_not_already_voted(self):
+        election = Election.objects.create(slug='conflicto', name='Conflicto', questions=BALLOT)
+        profile, private_key_pem = make_voter('conflicto@x.com')
+        answers = {'P1': 'NO'}
+        vote_content = build_vote_content(profile.user.username, answers, election)
+        signature, encrypted_vote = seal_ballot(vote_content, private_key_pem, profile.public_key, 'ed25519')
+
+        with mock.patch('voting.ballot_pipeline.record_vote_tally', side_effect=IntegrityError):
+            with self.assertRaises(BallotRejected) as raised:
+                commit_ballot(profile, election, vote_content, answers, signature, encrypted_vote)
+        self.assertNotIsInstance(raised.exception, AlreadyVoted)
+        self.assertFalse(ElectionVoter.objects.filter(election=election, voter=profile, has_voted=True).exists())
+
+        # El reintento entra; el siguiente, ya sí, es "ya votaste"
+        commit_ballot(profile, election, vote_content, answers, signature, encrypted_vote)
+        with self.assertRaises(AlreadyVoted):
+            commit_ballot(profile, election, vote_content, answers, signature, encrypted_vote)
+
+
+# ---------------------------------------------------------
+# VARIAS ELECCIONES (padrón, contadores y resultados por elección)
+# ---------------------------------------------------------
+
+class MultiElectionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.first = Election.objects.create(slug='primera', name='Primera', questions=BALLOT)
+        self.second = Election.objects.create(slug='segunda', name='Segunda', questions=BALLOT)
+
+    def test_one_ballot_per_election(self):
+        profile, private_key_pem = make_voter('dos-elecciones@x.com')
+        cast_vote(profile, private_key_pem, self.first, {'P1': 'SI'})
+        cast_vote(profile, private_key_pem, self.second, {'P1': 'NO'})
+        with self.assertRaises(AlreadyVoted):
+            cast_vote(profile, private_key_pem, self.first, {'P1': 'NO'})
+
+        self.assertEqual(Vote.objects.filter(voter=profile).count(), 2)
+        self.assertTrue(has_voted(profile, self.first))
+        self.assertTrue(has_voted(profile, self.second))
+
+    def test_closed_roll_rejects_unenrolled_voter(self):
+        closed = Election.objects.create(slug='cerrada', name='Cerrada', questions=BALLOT, open_enrollment=False)
+        profile, private_key_pem = make_voter('fuera@x.com')
+        with self.assertRaises(NotEligible):
+            cast_vote(profile, private_key_pem, closed, {'P1': 'SI'})
+        self.assertFalse(Vote.objects.filter(election=closed).exists())
+        self.assertFalse(ElectionVoter.objects.filter(election=closed).exists())
+
+        enroll_voters(closed, [profile.id])
+        cast_vote(profile, private_key_pem, closed, {'P1': 'SI'})
+        self.assertTrue(ElectionVoter.objects.get(election=closed, voter=profile).has_voted)
+
+    def test_tallies_and_snapshots_stay_per_election(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for number in range(2):
+                cast_vote(*make_voter(f'primera{number}@x.com'), self.first, {'P1': 'SI'})
+        first_snapshot = get_results_snapshot(self.first)
+        second_version = get_results_version(self.second.slug)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(*make_voter('segunda@x.com'), self.second, {'P1': 'NO'})
+
+        self.assertEqual(get_tally_results(self.first), {'P1': [('SI', 2)]})
+        self.assertEqual(get_tally_results(self.second), {'P1': [('NO', 1)]})
+        # Un voto en la segunda no invalida la foto de la primera...
+        self.assertEqual(get_results_snapshot(self.first), first_snapshot)
+        self.assertEqual(first_snapshot['total_votes'], 2)
+        self.assertEqual(first_snapshot['questions']['P1']['counts'], [2])
+        # ...y sí la de la segunda
+        second_snapshot = get_results_snapshot(self.second)
+        self.assertNotEqual(second_snapshot['version'], second_version)
+        self.assertEqual(second_snapshot['total_votes'], 1)
+        self.assertEqual(second_snapshot['questions']['P1']['codes'], ['NO'])
+
+
+# ---------------------------------------------------------
+# FIRMA EN EL NAVEGADOR (WebCrypto)
+# ---------------------------------------------------------
+
+def browser_key_pair(scheme):
+    """Par de llaves como lo arma client_keys.js: la privada y la pública en SPKI/PEM a 64 columnas."""
+    if scheme == 'ed25519':
+        private_key = ECC.generate(curve='Ed25519')
+        spki = private_key.public_key().export_key(format='DER')
+    else:
+        private_key = RSA.generate(2048)
+        spki = private_key.publickey().export_key('DER')
+    body = base64.b64encode(spki).decode('ascii')
+    lines = '\n'.join(body[start:start + 64] for start in range(0, len(body), 64))
+    return private_key, f"-----BEGIN PUBLIC KEY-----\n{lines}\n-----END PUBLIC KEY-----\n"
+
+
+def browser_sign(scheme, private_key, vote_content):
+    """crypto.subtle.sign: Ed25519 sobre el texto, RSA-PSS con SHA-256 y saltLength 32."""
+    data = vote_content.encode('utf-8')
+    if scheme == 'ed25519':
+        return eddsa.new(private_key, 'rfc8032').sign(data)
+    return pss.new(private_key, salt_bytes=32).sign(SHA256.new(data))
+
+
+class ClientSigningTests(TestCase):
+    vote_content = 'USUARIO:web@x.com|ELECCION:web|P1:SI'
+
+    def test_browser_signature_is_accepted_and_tampering_rejected(self):
+        for scheme in ('rsa-pss', 'ed25519'):
+            with self.subTest(scheme=scheme):
+                private_key, spki_pem = browser_key_pair(scheme)
+                public_key_pem = normalize_client_public_key(spki_pem, scheme)
+                signature = browser_sign(scheme, private_key, self.vote_content)
+
+                encrypted_vote = seal_signed_ballot(self.vote_content, signature, public_key_pem, scheme)
+                self.assertEqual(decrypt_vote_aes(encrypted_vote), self.vote_content)
+
+                tampered = bytes([signature[0] ^ 1]) + signature[1:]
+                with self.assertRaises(BallotRejected):
+                    seal_signed_ballot(self.vote_content, tampered, public_key_pem, scheme)
+                # La firma tampoco vale para otro texto (otra respuesta)
+                with self.assertRaises(BallotRejected):
+                    seal_signed_ballot(self.vote_content.replace('P1:SI', 'P1:NO'), signature, public_key_pem, scheme)
+
+    @override_settings(CLIENT_SIGNING_ENABLED=True, CLIENT_SIGNATURE_SCHEMES=['ed25519', 'rsa-pss'])
+    def test_public_key_registration_returns_fingerprint(self):
+        user = User.objects.create_user('web@x.com', 'web@x.com', 'Passw0rd!')
+        self.client.force_login(user)
+        private_key, spki_pem = browser_key_pair('ed25519')
+
+        response = self.client.post(reverse('voting:register_public_key'), {
+            'signature_scheme': 'ed25519', 'public_key': spki_pem,
+        })
+        self.assertEqual(response.status_code, 200)
+        profile = user.voterprofile
+        profile.refresh_from_db()
+        self.assertEqual(response.json(), {
+            'signature_scheme': 'ed25519',
+            'fingerprint': public_key_fingerprint(spki_pem, 'ed25519'),
+        })
+        self.assertEqual(profile.public_key_fingerprint, response.json()['fingerprint'])
+
+        # La llave privada nunca se acepta
+        response = self.client.post(reverse('voting:register_public_key'), {
+            'signature_scheme': 'ed25519', 'public_key': private_key.export_key(format='PEM'),
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+# ---------------------------------------------------------
+# VISTAS ASÍNCRONAS (ASYNC_VIEWS) Y POOL CRIPTOGRÁFICO
+# ---------------------------------------------------------
+
+def reload_voting_urls():
+    # voting/urls.py elige las vistas al importarse según ASYNC_VIEWS; el urls.py raíz
+    # guarda su URLResolver (con los patrones ya cargados), así que se recargan ambos
+    reload(import_module('voting.urls'))
+    reload(import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+class AsyncViewTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with override_settings(ASYNC_VIEWS=True):
+            reload_voting_urls()
+        cls.addClassCleanup(reload_voting_urls)
+
+    def setUp(self):
+        self.election = Election.objects.create(slug='asincrona', name='Asíncrona', questions=BALLOT)
+        self.profile, self.private_key_pem = make_voter('async@x.com')
+        # El pool de procesos se cambia por hilos del mismo proceso (sin arrancar Django en hijos)
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        self.submit = mock.patch.object(executor, 'submit', wraps=executor.submit).start()
+        mock.patch('voting.crypto_pool.get_crypto_pool', return_value=executor).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def key_file(self, private_key_pem):
+        return SimpleUploadedFile('llave.key', private_key_pem.encode('utf-8'))
+
+    async def test_vote_submission(self):
+        url = reverse('voting:election_vote', args=[self.election.slug])
+        self.assertTrue(iscoroutinefunction(resolve(url).func))
+        await self.async_client.aforce_login(self.profile.user)
+
+        response = await self.async_client.post(url, {
+            'pregunta_1': 'SI', 'private_key': self.key_file(self.private_key_pem),
+        })
+        self.assertRedirects(response, reverse('voting:success_page'), fetch_redirect_response=False)
+        vote = await Vote.objects.aget(election=self.election, voter=self.profile)
+        self.assertTrue(vote.option.endswith('|P1:SI'))
+        # Firma, verificación y cifrado pasaron por el pool
+        self.assertEqual(self.submit.call_count, 1)
+
+        response = await self.async_client.post(url, {
+            'pregunta_1': 'NO', 'private_key': self.key_file(self.private_key_pem),
+        })
+        self.assertRedirects(response, reverse('voting:success_page'), fetch_redirect_response=False)
+        self.assertEqual(await Vote.objects.filter(voter=self.profile).acount(), 1)
+
+    async def test_check_key_status(self):
+        url = reverse('voting:election_check_key', args=[self.election.slug])
+        self.assertTrue(iscoroutinefunction(resolve(url).func))
+        await self.async_client.aforce_login(self.profile.user)
+        other_public_key, other_private_key = get_scheme('ed25519').generate_keys()
+
+        for private_key_pem, expected in ((self.private_key_pem, 'valid_ready'), (other_private_key, 'mismatch')):
+            response = await self.async_client.post(url, {'private_key': self.key_file(private_key_pem)})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['key_status'], expected)
+        self.assertEqual(self.submit.call_count, 2)
+
+
+# ---------------------------------------------------------
+# DIARIO DE PAPELETAS
+# ---------------------------------------------------------
+
+class JournalTests(TransactionTestCase):
+
+    def setUp(self):
+        self.election = Election.objects.create(slug='diario', name='Diario', questions=BALLOT)
+        self.directory = tempfile.mkdtemp()
+
+    def sealed(self, username, answers, election=None):
+        profile, private_key_pem = make_voter(username)
+        vote_content = build_vote_content(profile.user.username, answers, election or self.election)
+        signature, encrypted_vote = seal_ballot(vote_content, private_key_pem, profile.public_key, 'ed25519')
+        return profile, vote_content, answers, signature, encrypted_vote
+
+    def test_voter_is_claimed_before_the_receipt(self):
+        journal = BallotJournal(self.directory, 0, 0.01, 100, 1 << 20)
+        profile, *ballot = self.sealed('diario@x.com', {'P1': 'SI'})
+        with mock.patch('voting.journal._journal', journal):
+            journal_ballot(profile, self.election, *ballot)
+            # Otro worker ya no puede dar un segundo comprobante: la marca está en la base
+            self.assertTrue(ElectionVoter.objects.get(election=self.election, voter=profile).has_voted)
+            with self.assertRaises(AlreadyVoted):
+                journal_ballot(profile, self.election, *ballot)
+            self.assertTrue(journal.drain())
+        connection.close()
+
+        vote = Vote.objects.get(election=self.election, voter=profile)
+        entry = make_entry(profile, self.election, *ballot)
+        # La hora del voto es la del comprobante, no la del flusher
+        self.assertLess(abs(entry['journaled_at'] - vote.timestamp.timestamp()), 5)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, REJECTED_FILE)))
+
+    def test_bad_entry_is_rejected_alone(self):
+        good_profile, *good = self.sealed('bueno@x.com', {'P1': 'SI'})
+        bad_profile, *bad = self.sealed('malo@x.com', {'P1': 'NO'})
+        good_entry = make_entry(good_profile, self.election, *good)
+        bad_entry = make_entry(bad_profile, self.election, *bad)
+        bad_entry['signature'] = '%%% no es base64'
+        ElectionVoter.objects.create(election=self.election, voter=bad_profile, has_voted=True)
+
+        failed = flush_entries([bad_entry, good_entry])
+        record_rejected(self.directory, failed)
+
+        self.assertEqual(failed, [bad_entry])
+        self.assertTrue(Vote.objects.filter(election=self.election, voter=good_profile).exists())
+        # La papeleta mala queda en rejected.jsonl y el votante puede volver a votar
+        with open(os.path.join(self.directory, REJECTED_FILE)) as f:
+            self.assertEqual([json.loads(line)['voter'] for line in f], [bad_profile.id])
+        self.assertFalse(ElectionVoter.objects.get(election=self.election, voter=bad_profile).has_voted)
+
+    def test_partial_flush_is_not_rejected_on_retry(self):
+        other = Election.objects.create(slug='diario-2', name='Diario 2', questions=BALLOT)
+        first_profile, *first = self.sealed('primero@x.com', {'P1': 'SI'})
+        second_profile, *second = self.sealed('segundo@x.com', {'P1': 'NO'}, other)
+
+        # La primera elección del lote se confirma; en la segunda la base se cae (una vez)
+        flush_election = journal_module._flush_election
+        outages = []
+
+        def flaky_flush(election, entries):
+            if election == other and len(outages) < 2:
+                outages.append(election)
+                raise OperationalError('la base no responde')
+            return flush_election(election, entries)
+
+        # Un group commit largo junta las dos papeletas en el mismo lote del flusher
+        journal = BallotJournal(self.directory, 300, 0.01, 100, 1 << 20)
+        with mock.patch('voting.journal._journal', journal), \
+                mock.patch('voting.journal._flush_election', side_effect=flaky_flush):
+            threads = [
+                threading.Thread(target=journal_ballot, args=(first_profile, self.election, *first)),
+                threading.Thread(target=journal_ballot, args=(second_profile, other, *second)),
+            ]
+            for thread in threads:
+                thread.start()
+                time.sleep(0.05)
+            for thread in threads:
+                thread.join()
+            self.assertTrue(journal.drain())
+        connection.close()
+
+        self.assertEqual(len(outages), 2)
+        self.assertTrue(Vote.objects.filter(election=self.election, voter=first_profile).exists())
+        self.assertTrue(Vote.objects.filter(election=other, voter=second_profile).exists())
+        # La papeleta que ya estaba guardada no se reporta como rechazada al reintentar el lote
+        self.assertEqual(journal.stats['rejected'], 0)
+        self.assertEqual(journal.stats['flushed'], 2)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, REJECTED_FILE)))
+        self.assertTrue(ElectionVoter.objects.get(election=self.election, voter=first_profile).has_voted)
+
+
+# ---------------------------------------------------------
+# REGISTRO PÚBLICO: HOJAS AGREGADAS DESPUÉS DEL COMMIT
+# ---------------------------------------------------------
+
+class LedgerAppendTests(TestCase):
+
+    def test_pending_ballots_are_appended_in_one_batch(self):
+        election = Election.objects.create(slug='registro', name='Registro', questions=BALLOT)
+        signatures = []
+        for number in range(3):
+            profile, private_key_pem = make_voter(f'registro{number}@x.com')
+            answers = {'P1': 'SI'}
+            vote_content = build_vote_content(profile.user.username, answers, election)
+            signature, encrypted_vote = seal_ballot(vote_content, private_key_pem, profile.public_key, 'ed25519')
+            commit_ballot(profile, election, vote_content, answers, signature, encrypted_vote)
+            signatures.append(signature)
+
+        # El voto no toca el árbol dentro de su transacción: su hoja queda pendiente
+        self.assertEqual(get_ledger_root()[0], 0)
+        self.assertEqual(Vote.objects.filter(ledger_index__isnull=True).count(), 3)
+
+        self.assertEqual(append_all_pending(), 3)
+        self.assertEqual(append_all_pending(), 0)
+        self.assertEqual(list(Vote.objects.order_by('id').values_list('ledger_index', flat=True)), [0, 1, 2])
+        size, root = get_ledger_root()
+        self.assertEqual(size, 3)
+        for signature in signatures:
+            proof = inclusion_proof(signature)
+            self.assertTrue(verify_inclusion(proof['leaf'], proof['index'], proof['size'], proof['path'], root))
+
+    @override_settings(RECEIPT_LOOKUP_RATE=2, RECEIPT_LOOKUP_WINDOW=60)
+    def test_proof_endpoint_is_rate_limited(self):
+        cache.clear()
+        election = Election.objects.create(slug='prueba', name='Prueba', questions=BALLOT)
+        vote = cast_vote(*make_voter('prueba@x.com'), election, {'P1': 'SI'})
+        url = reverse('voting:ledger_proof', args=[bytes(vote.digital_signature).hex()])
+
+        # El primer GET agrega la hoja pendiente y responde la prueba
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['index'], 0)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        # Ni la base ni el anexador se tocan una vez agotado el límite
+        with mock.patch('voting.views.ensure_in_ledger') as ensure, self.assertNumQueries(0):
+            response = self.client.get(reverse('voting:ledger_proof', args=['00' * 64]))
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        ensure.assert_not_called()
+
+
+# ---------------------------------------------------------
+# CONSULTA PÚBLICA DE COMPROBANTES
+# ---------------------------------------------------------
+
+class ReceiptLookupTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.election = Election.objects.create(slug='comprobante', name='Comprobante', questions=BALLOT)
+        self.profile, private_key_pem = make_voter('comprobante@x.com')
+        self.answers = {'P1': 'SI'}
+        self.vote_content = build_vote_content(self.profile.user.username, self.answers, self.election)
+        self.signature, self.encrypted_vote = seal_ballot(
+            self.vote_content, private_key_pem, self.profile.public_key, 'ed25519'
+        )
+
+    def commit(self):
+        # Se ejecutan los on_commit del voto (forget_missing_receipt); el anexador del registro no
+        with mock.patch('voting.ballot_pipeline.schedule_ledger_append'), \
+                self.captureOnCommitCallbacks(execute=True):
+            return commit_ballot(
+                self.profile, self.election, self.vote_content, self.answers, self.signature, self.encrypted_vote
+            )
+
+    def test_missing_receipt_is_cached_until_the_ballot_commits(self):
+        self.assertIsNone(lookup_receipt(self.signature))
+        # La respuesta "no existe" sale de la caché, sin consultar la base
+        with self.assertNumQueries(0):
+            self.assertIsNone(lookup_receipt(self.signature))
+
+        vote = self.commit()
+        self.assertEqual(lookup_receipt(self.signature), {'recorded_at': vote.timestamp, 'ledger_index': None})
+
+    @override_settings(RECEIPT_LOOKUP_RATE=2, RECEIPT_LOOKUP_WINDOW=60)
+    def test_receipt_check_view(self):
+        self.commit()
+        response = self.client.get(reverse('voting:receipt_check', args=[self.signature.hex()]))
+        self.assertEqual(response.status_code, 200)
+        found = response.json()
+        # La hoja pendiente se agrega al consultarla
+        self.assertEqual((found['found'], found['ledger_index']), (True, 0))
+        self.assertNotIn('voter', found)
+
+        response = self.client.get(reverse('voting:receipt_check', args=['ab' * 64]))
+        self.assertEqual((response.status_code, response.json()), (404, {'found': False}))
+
+        response = self.client.get(reverse('voting:receipt_check', args=[self.signature.hex()]))
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+
+# ---------------------------------------------------------
+# HUELLAS Y CACHÉ DE LLAVES PÚBLICAS (PublicKeyCache)
+# ---------------------------------------------------------
+
+class PublicKeyCacheTests(TestCase):
+
+    def setUp(self):
+        PUBLIC_KEY_CACHE.clear()
+        self.addCleanup(PUBLIC_KEY_CACHE.clear)
+
+    def test_fingerprint_matches_for_the_pair(self):
+        for scheme in ('rsa-pss', 'ed25519'):
+            public_key_pem, private_key_pem = get_scheme(scheme).generate_keys()
+            other_public_key, _ = get_scheme(scheme).generate_keys()
+            fingerprint = public_key_fingerprint(public_key_pem, scheme)
+            self.assertEqual(len(fingerprint), 64)
+            # La privada da la huella de su pública: así se comparan llaves sin exportar PEM
+            self.assertEqual(private_key_fingerprint(private_key_pem, scheme), fingerprint)
+            self.assertNotEqual(public_key_fingerprint(other_public_key, scheme), fingerprint)
+
+    def test_cache_key_follows_the_registered_key(self):
+        profile, _ = make_voter('huella@x.com')
+        cache_key = profile.public_key_cache_key
+        self.assertEqual(cache_key, (profile.pk, public_key_fingerprint(profile.public_key, 'ed25519')))
+
+        # Perfil anterior a la columna: la huella se calcula y se guarda al pedirla
+        VoterProfile.objects.filter(pk=profile.pk).update(public_key_fingerprint='')
+        profile.refresh_from_db()
+        self.assertEqual(profile.public_key_cache_key, cache_key)
+        self.assertEqual(VoterProfile.objects.get(pk=profile.pk).public_key_fingerprint, cache_key[1])
+
+        profile.set_public_key(get_scheme('ed25519').generate_keys()[0], 'ed25519')
+        self.assertNotEqual(profile.public_key_cache_key, cache_key)
+
+    def test_lru_eviction_and_stats(self):
+        key_cache = PublicKeyCache(maxsize=2)
+        pems = [get_scheme('ed25519').generate_keys()[0] for _ in range(3)]
+
+        first = key_cache.get('a', pems[0], 'ed25519')
+        # Un acierto no vuelve a leer el PEM (aunque venga basura)
+        self.assertIs(key_cache.get('a', 'no es un PEM', 'ed25519'), first)
+        key_cache.get('b', pems[1], 'ed25519')
+        key_cache.get('a', pems[0], 'ed25519')
+        key_cache.get('c', pems[2], 'ed25519')  # Saca a 'b', el menos usado
+
+        self.assertEqual(key_cache.stats(), {'size': 2, 'maxsize': 2, 'hits': 2, 'misses': 3, 'hit_rate': 0.4})
+        self.assertIs(key_cache.get('a', pems[0], 'ed25519'), first)
+        with self.assertRaises(ValueError):
+            key_cache.get('b', 'no es un PEM', 'ed25519')
+
+    def test_verification_reuses_the_cached_key(self):
+        profile, private_key_pem = make_voter('cacheada@x.com')
+        cache_key = profile.public_key_cache_key
+        vote_content = 'Votante:cacheada@x.com|P1:SI'
+        signature = sign_vote(vote_content, private_key_pem, 'ed25519')
+
+        for _ in range(3):
+            self.assertTrue(verify_signature(vote_content, signature, profile.public_key, 'ed25519', cache_key=cache_key))
+        self.assertEqual(PUBLIC_KEY_CACHE.stats()['misses'], 1)
+        self.assertEqual(PUBLIC_KEY_CACHE.stats()['hits'], 2)
+        self.assertFalse(verify_signature(vote_content + 'X', signature, profile.public_key, 'ed25519', cache_key=cache_key))
+
+
+# ---------------------------------------------------------
+# SOBRES CIFRADOS (AES-GCM y los formatos CBC anteriores)
+# ---------------------------------------------------------
+
+def legacy_cbc_payload(key, plaintext):
+    """IV + cifrado AES-CBC con relleno PKCS#7, como se guardaban los votos antes de GCM."""
+    iv = os.urandom(16)
+    return iv + AES.new(key, AES.MODE_CBC, iv=iv).encrypt(pad(plaintext.encode('utf-8'), AES.block_size))
+
+
+class AESEnvelopeTests(TestCase):
+
+    def setUp(self):
+        self.old_key, self.new_key = generate_aes_key(), generate_aes_key()
+        self.key_ring = AESKeyRing({'k2': self.new_key, 'k1': self.old_key}, 'k2')
+        self.vote_content = 'USUARIO:sobre@x.com|P1:SI'
+
+    def test_gcm_round_trip(self):
+        envelope = self.key_ring.encrypt(self.vote_content)
+        self.assertEqual(envelope[:4], bytes((ENVELOPE_GCM, 2)) + b'k2')
+        # Nonce nuevo en cada sobre
+        self.assertNotEqual(self.key_ring.encrypt(self.vote_content), envelope)
+        self.assertEqual(self.key_ring.decrypt(envelope), self.vote_content)
+        self.assertEqual(self.key_ring.decrypt(memoryview(envelope)), self.vote_content)
+
+        with mock.patch('voting.crypto_utils._key_ring', self.key_ring):
+            self.assertEqual(decrypt_vote_aes(encrypt_vote_aes(self.vote_content)), self.vote_content)
+
+        # Después de rotar, el sobre se sigue abriendo con la llave que indica su kid
+        rotated = AESKeyRing({'k3': generate_aes_key(), 'k2': self.new_key}, 'k3')
+        self.assertEqual(rotated.decrypt(envelope), self.vote_content)
+        with self.assertRaises(ValueError):
+            AESKeyRing({'k3': generate_aes_key()}, 'k3').decrypt(envelope)
+
+    def test_gcm_rejects_tampering(self):
+        envelope = self.key_ring.encrypt(self.vote_content)
+        tampered_body = envelope[:-1] + bytes((envelope[-1] ^ 1,))
+        # La cabecera también está autenticada: cambiar la versión o el kid no pasa
+        relabeled = AESKeyRing({'k2': self.new_key, 'k9': self.new_key}, 'k2')
+        for bad_envelope, key_ring in ((tampered_body, self.key_ring),
+                                       (envelope[:2] + b'k9' + envelope[4:], relabeled),
+                                       (envelope[:5], self.key_ring)):
+            with self.assertRaises(ValueError):
+                key_ring.decrypt(bad_envelope)
+
+    def test_legacy_cbc_envelopes(self):
+        payload = legacy_cbc_payload(self.old_key, self.vote_content)
+        text_envelope = f'k1:{payload.hex()}'
+
+        # Sobre de texto tal como estaba en la columna anterior
+        self.assertEqual(self.key_ring.decrypt(text_envelope), self.vote_content)
+
+        # Convertido a binario versión 0 (migración 0011) y de regreso, sin pérdida
+        binary = text_envelope_to_binary(text_envelope)
+        self.assertEqual(binary[:4], bytes((ENVELOPE_CBC, 2)) + b'k1')
+        self.assertEqual(self.key_ring.decrypt(binary), self.vote_content)
+        self.assertEqual(binary_envelope_to_text(binary), text_envelope)
+
+        # Los votos anteriores al llavero no traen kid: no hay con qué abrirlos
+        with self.assertRaises(ValueError):
+            self.key_ring.decrypt(payload.hex())
+
+    def test_gcm_envelope_survives_reverting_to_text(self):
+        envelope = self.key_ring.encrypt(self.vote_content)
+        text_envelope = binary_envelope_to_text(envelope)
+        self.assertTrue(text_envelope.startswith(f'{RAW_ENVELOPE_MARKER}:'))
+        self.assertEqual(text_envelope_to_binary(text_envelope), envelope)
+        self.assertEqual(self.key_ring.decrypt(text_envelope), self.vote_content)
+
+
+# ---------------------------------------------------------
+# LLAVERO AES EN PRODUCCIÓN
+# ---------------------------------------------------------
+
+class KeyRingConfigurationTests(TestCase):
+
+    @override_settings(DEBUG=False, BALLOT_AES_KEYS='', BALLOT_KEYSTORE_PATH='')
+    def test_no_derived_key_without_debug(self):
+        self.assertIsNone(build_key_ring())
+        with mock.patch('voting.crypto_utils._key_ring', None):
+            errors = check_key_ring()
+            with self.assertRaises(RuntimeError):
+                encrypt_vote_aes("USUARIO:x|P1:SI")
+        self.assertEqual([error.id for error in errors], ['voting.E001'])
+
+    @override_settings(DEBUG=True, BALLOT_AES_KEYS='', BALLOT_KEYSTORE_PATH='')
+    def test_derived_key_in_debug(self):
+        self.assertEqual(build_key_ring().active_key_id, 'sk1')
+        self.assertEqual(check_key_ring(), [])
+
+
+# ---------------------------------------------------------
+# RESERVA DE LLAVES: PRIVADAS CIFRADAS EN LA BASE
+# ---------------------------------------------------------
+
+class KeyPoolTests(TestCase):
+
+    @override_settings(KEY_POOL_ENABLED=True)
+    def test_private_keys_are_sealed_at_rest(self):
+        pairs = [get_scheme('rsa-pkcs1v15').generate_keys() for _ in range(2)]
+        add_key_pairs(pairs)
+
+        for sealed in PregeneratedKeyPair.objects.values_list('sealed_private_key', flat=True):
+            self.assertNotIn(b'PRIVATE KEY', bytes(sealed))
+        self.assertEqual(take_key_pair('rsa-pkcs1v15'), pairs[0])
+        self.assertEqual(pop_key_pairs(5), [pairs[1]])
+        self.assertFalse(PregeneratedKeyPair.objects.exists())
+
+
+# ---------------------------------------------------------
+# COLA DE INGESTA (BallotSubmission)
+# ---------------------------------------------------------
+
+class BallotQueueTests(TestCase):
+
+    def assertNoPlaintextKey(self, private_key_pem):
+        # Se revisan las filas tal como quedan en la tabla (lo que vería un respaldo de la base)
+        key_line = private_key_pem.strip().splitlines()[1].encode()
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT * FROM {BallotSubmission._meta.db_table}")
+            rows = cursor.fetchall()
+        for row in rows:
+            for value in row:
+                if isinstance(value, str):
+                    value = value.encode()
+                if isinstance(value, (bytes, memoryview)):
+                    self.assertNotIn(b'PRIVATE KEY', bytes(value))
+                    self.assertNotIn(key_line, bytes(value))
+
+    def test_private_key_is_sealed_while_queued(self):
+        election = Election.objects.create(slug='cola', name='Cola', questions=BALLOT)
+        profile, private_key_pem = make_voter('cola@x.com')
+        vote_content = build_vote_content(profile.user.username, {'P1': 'SI'}, election)
+
+        submission = enqueue_submission(profile, election, vote_content, private_key_pem)
+        self.assertNoPlaintextKey(private_key_pem)
+        self.assertTrue(BallotSubmission.objects.get(pk=submission.pk).sealed_private_key)
+
+        process_submission(claim_next_submission())
+        submission.refresh_from_db()
+        self.assertEqual(submission.status, BallotSubmission.DONE, submission.error)
+        self.assertEqual(bytes(submission.sealed_private_key), b'')
+        self.assertNoPlaintextKey(private_key_pem)
+        self.assertEqual(submission.vote.election, election)
+
+
+# ---------------------------------------------------------
+# CONTEO CIFRADO (ElGamal exponencial sobre P-256)
+# ---------------------------------------------------------
+
+def reference_multiply(scalar, point=None):
+    """k·P con PyCryptodome (implementación independiente) en coordenadas afines."""
+    x, y = point or homomorphic._G
+    result = ECC.EccPoint(x, y, curve='P-256') * scalar
+    return int(result.x), int(result.y)
+
+
+class HomomorphicTests(TestCase):
+
+    def test_point_multiplication_known_answers(self):
+        # 2·G de P-256 (vector publicado) y múltiplos grandes contra PyCryptodome
+        two_g = (
+            0x7cf27b188d034f7e8a52380304b51ac3c08969e277f21b35a60b48fc47669978,
+            0x07775510db8ed040293d9ac69f7430dbba7dade63ce982299e04b79d227873d1,
+        )
+        self.assertEqual(homomorphic._to_affine_batch([homomorphic._multiply(homomorphic._G, 2)])[0], two_g)
+        table = homomorphic._generator_table()
+        for scalar in (1, 3, 255, 256, 2 ** 128 + 12345, homomorphic._N - 1):
+            expected = reference_multiply(scalar)
+            self.assertEqual(homomorphic._to_affine_batch([homomorphic._multiply(homomorphic._G, scalar)])[0], expected)
+            self.assertEqual(homomorphic._to_affine_batch([table.multiply(scalar)])[0], expected)
+
+    def test_encryption_known_answer(self):
+        public_key_pem, secret_key_pem = homomorphic.generate_tally_keys()
+        public_key = homomorphic.load_public_key(public_key_pem)
+        r = 0x1234567890abcdef
+        with mock.patch('voting.homomorphic.secrets.randbelow', return_value=r - 1):
+            points = homomorphic._decode_affine(public_key.encrypt_bits([0, 1]))
+        r_h = reference_multiply(r, public_key.point)
+        # Enc(0) = (r·G, r·H) y Enc(1) = (r·G, G + r·H)
+        self.assertEqual(points[0], reference_multiply(r))
+        self.assertEqual(points[1], r_h)
+        self.assertEqual(points[2], reference_multiply(r))
+        expected = ECC.EccPoint(*r_h, curve='P-256') + ECC.EccPoint(*homomorphic._G, curve='P-256')
+        self.assertEqual(points[3], (int(expected.x), int(expected.y)))
+
+    def test_encrypt_add_decrypt_round_trip(self):
+        public_key_pem, secret_key_pem = homomorphic.generate_tally_keys()
+        public_key = homomorphic.load_public_key(public_key_pem)
+        secret = homomorphic.load_secret_key(secret_key_pem, public_key_pem)
+        ballots = [[1, 0, 0], [0, 1, 0], [1, 0, 0], [0, 0, 1], [1, 0, 0]]
+        ciphertexts = [public_key.encrypt_bits(bits) for bits in ballots]
+
+        # Voto por voto o en un solo lote, el agregado cifra lo mismo
+        incremental = homomorphic.empty_aggregate(3)
+        for ciphertext in ciphertexts:
+            incremental = homomorphic.add_ballots(incremental, [ciphertext])
+        batch = homomorphic.add_ballots(homomorphic.empty_aggregate(3), ciphertexts)
+        self.assertTrue(homomorphic.same_aggregate(incremental, batch))
+
+        self.assertEqual(homomorphic.decrypt_counts(secret, batch, len(ballots)), [3, 1, 1])
+        self.assertEqual(homomorphic.decrypt_counts(secret, homomorphic.empty_aggregate(3), 0), [0, 0, 0])
+        other_secret_pem = homomorphic.generate_tally_keys()[1]
+        with self.assertRaises(ValueError):
+            homomorphic.load_secret_key(other_secret_pem, public_key_pem)
+
+
+class EncryptedTallyTests(TestCase):
+
+    def setUp(self):
+        public_key_pem, self.secret_key_pem = homomorphic.generate_tally_keys()
+        self.election = Election.objects.create(
+            slug='cifrada', name='Cifrada', questions=BALLOT, tally_public_key=public_key_pem,
+        )
+
+    def cast(self, username, answers):
+        profile, private_key_pem = make_voter(username)
+        vote_content = build_vote_content(profile.user.username, answers, self.election)
+        signature, encrypted_vote = seal_ballot(vote_content, private_key_pem, profile.public_key, 'ed25519')
+        return commit_ballot(profile, self.election, vote_content, answers, signature, encrypted_vote)
+
+    def test_aggregate_row_is_created_with_the_election(self):
+        tally = EncryptedTally.objects.get(election=self.election)
+        self.assertEqual(tally.ballots, 0)
+        self.cast('cifrada1@x.com', {'P1': 'SI'})
+        self.cast('cifrada2@x.com', {'P1': 'NO'})
+        self.cast('cifrada3@x.com', {'P1': 'SI'})
+        counts, ballots = decrypt_tally(self.election, self.secret_key_pem)
+        self.assertEqual(ballots, 3)
+        self.assertEqual(counts, {('P1', 'SI'): 2, ('P1', 'NO'): 1})
+
+    def test_contention_is_a_retryable_rejection(self):
+        with mock.patch('voting.encrypted_tally.MAX_UPDATE_ATTEMPTS', 0):
+            with self.assertRaises(BallotRejected) as raised:
+                self.cast('contencion@x.com', {'P1': 'SI'})
+        self.assertNotIsInstance(raised.exception, AlreadyVoted)
+        self.assertFalse(Vote.objects.filter(election=self.election).exists())
+        self.assertFalse(ElectionVoter.objects.filter(election=self.election, has_voted=True).exists())
+
+
+# ---------------------------------------------------------
+# COMANDOS DE MEDICIÓN (configuración mínima)
+# ---------------------------------------------------------
+
+def run_command(name, *args):
+    out = io.StringIO()
+    call_command(name, *args, stdout=out, stderr=io.StringIO())
+    return out.getvalue()
+
+
+class BenchmarkCommandTests(TestCase):
+
+    def test_bench_voting(self):
+        report = json.loads(run_command(
+            'bench_voting', '--iterations', '2', '--keygen', '1', '--sizes', '20', '--aggregation-iterations', '1',
+        ))
+        self.assertEqual(report['meta']['iterations'], 2)
+        self.assertTrue(report['results'])
+        for name, result in report['results'].items():
+            self.assertGreaterEqual(result['p50_ms'], 0, name)
+
+        # Contra sí misma no hay regresión; contra una línea base imposible, sí
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(report, f)
+        run_command('bench_voting', '--only', 'metrics', '--iterations', '2', '--baseline', f.name, '--threshold', '1000')
+        with open(f.name, 'w') as baseline:
+            json.dump({'results': {name: {**result, 'p50_ms': 1e-9} for name, result in report['results'].items()}}, baseline)
+        with self.assertRaises(CommandError):
+            run_command('bench_voting', '--only', 'metrics', '--iterations', '2', '--baseline', f.name)
+        os.remove(f.name)
+
+    def test_bench_signatures(self):
+        report = json.loads(run_command('bench_signatures', '--keygen', '1', '--iterations', '2', '--json'))
+        self.assertIn('public_key_cache', report)
+        for scheme in ('rsa-pkcs1v15', 'rsa-pss', 'ed25519'):
+            self.assertGreater(report[scheme]['signature_bytes'], 0)
+            self.assertGreaterEqual(report[scheme]['verify_ms'], 0)
+        self.assertIn('ed25519', run_command('bench_signatures', '--keygen', '1', '--iterations', '1'))
+
+
+class LoadTestCommandTests(TransactionTestCase):
+    # Los votantes simulados corren en hilos (sus propias conexiones): hace falta COMMIT real
+
+    def test_load_test_with_test_client(self):
+        election = Election.objects.create(slug='carga', name='Carga', questions=BALLOT)
+        report = json.loads(run_command('load_test', '--voters', '3', '--concurrency', '2', '--election', 'carga'))
+        connection.close()
+
+        self.assertEqual(report['errors'], {})
+        self.assertEqual(report['completed'], 3)
+        self.assertEqual(set(report['steps']), {'register', 'login', 'generate_keys', 'vote'})
+        self.assertEqual(report['steps']['vote']['n'], 3)
+        self.assertEqual(Vote.objects.filter(election=election).count(), 3)
+
+
+class VerifyBallotsCommandTests(TestCase):
+
+    def test_each_run_verifies_every_ballot(self):
+        election = Election.objects.create(slug='auditoria', name='Auditoría', questions=BALLOT)
+        votes = [cast_vote(*make_voter(f'firma{i}@x.com'), election, {'P1': 'SI'}) for i in range(3)]
+        directory = tempfile.mkdtemp()
+        checkpoint = os.path.join(directory, 'checkpoint.json')
+        failures = os.path.join(directory, 'failures.jsonl')
+
+        def verify():
+            return json.loads(run_command(
+                'verify_ballots', '--workers', '1', '--chunk-size', '2',
+                '--checkpoint', checkpoint, '--failures', failures, '--json',
+            ))
+
+        first = verify()
+        self.assertEqual((first['valid'], first['invalid'], first['total']), (3, 0, 3))
+        self.assertFalse(os.path.exists(checkpoint))
+
+        # La segunda corrida vuelve a revisar desde el primer voto: ve la alteración del más antiguo
+        Vote.objects.filter(pk=votes[0].pk).update(option=votes[0].option.replace('P1:SI', 'P1:NO'))
+        second = verify()
+        self.assertEqual((second['valid'], second['invalid'], second['total']), (2, 1, 3))
+        self.assertFalse(os.path.exists(checkpoint))
+        with open(failures) as f:
+            self.assertEqual([json.loads(line)['vote_id'] for line in f], [votes[0].pk])
+
+
+# ---------------------------------------------------------
+# VERSIÓN DE RESULTADOS (ETag)
+# ---------------------------------------------------------
+
+class ResultsVersionTests(TestCase):
+
+    def version_timeout(self):
+        fake_cache = mock.Mock()
+        fake_cache.get.side_effect = [None, 1234]
+        with mock.patch('voting.results_cache.cache', fake_cache):
+            self.assertEqual(get_results_version('etag'), 1234)
+        key, version, timeout = fake_cache.add.call_args.args
+        return timeout
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.gettempdir(),
+    }})
+    def test_shared_cache_version_never_expires(self):
+        # Sin votos nuevos el ETag se mantiene y los clientes siguen recibiendo 304
+        self.assertIsNone(self.version_timeout())
+
+    @override_settings(RESULTS_CACHE_TIMEOUT=30)
+    def test_per_process_cache_version_is_bounded(self):
+        self.assertEqual(self.version_timeout(), 30)
+
+
+# ---------------------------------------------------------
+# CONTADORES DEL TABLERO (VoteTally)
+# ---------------------------------------------------------
+
+SURVEY = BALLOT + [
+    {'key': 'P2', 'title': 'Pregunta 2', 'options': [
+        {'code': 'ALTO', 'label': 'Alto'}, {'code': 'MEDIO', 'label': 'Medio'}, {'code': 'BAJO', 'label': 'Bajo'},
+    ]},
+]
+
+
+class VoteTallyTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.election = Election.objects.create(slug='contadores', name='Contadores', questions=SURVEY)
+        ballots = [{'P1': 'SI', 'P2': 'ALTO'}, {'P1': 'SI', 'P2': 'BAJO'}, {'P1': 'NO', 'P2': 'ALTO'}]
+        for number, answers in enumerate(ballots):
+            cast_vote(*make_voter(f'contador{number}@x.com'), self.election, answers)
+
+    def test_counters_match_a_recount(self):
+        counters = Counter({
+            (question, option): count
+            for question, rows in get_tally_results(self.election).items() for option, count in rows
+        })
+        self.assertEqual(counters, Counter({('P1', 'SI'): 2, ('P1', 'NO'): 1, ('P2', 'ALTO'): 2, ('P2', 'BAJO'): 1}))
+        # Contra las respuestas estructuradas y contra el texto firmado de cada papeleta
+        self.assertEqual(counters, count_votes_from_ballots(self.election))
+        from_votes = Counter(
+            item for option in Vote.objects.filter(election=self.election).values_list('option', flat=True)
+            for item in parse_vote_content(option).items()
+        )
+        self.assertEqual(counters, from_votes)
+
+    def test_dashboard_reads_the_counters(self):
+        # Si el tablero recontara las papeletas no vería este cambio hecho solo en VoteTally
+        VoteTally.objects.filter(election=self.election, question='P1', option='SI').update(count=40)
+        self.client.force_login(User.objects.get(username='contador0@x.com'))
+
+        response = self.client.get(reverse('voting:election_results', args=[self.election.slug]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_votes'], 3)
+        charts = {chart['key']: dict(zip(chart['options'], chart['counts'])) for chart in response.context['charts']}
+        self.assertEqual(charts['P1'], {'Sí': 40, 'No': 1})
+        self.assertEqual(charts['P2'], {'Alto': 2, 'Bajo': 1})
+
+
+# ---------------------------------------------------------
+# AUDITORÍA (paginación por cursor y exportación en streaming)
+# ---------------------------------------------------------
+
+class AuditViewTests(TestCase):
+
+    def setUp(self):
+        self.election = Election.objects.create(slug='auditada', name='Auditada', questions=BALLOT)
+        self.vote_ids = [
+            cast_vote(*make_voter(f'auditado{number}@x.com'), self.election, {'P1': answer}).id
+            for number, answer in enumerate(['SI', 'NO', 'SI', 'NO', 'SI'])
+        ]
+        self.client.force_login(User.objects.create_user('auditora', password='x', is_staff=True))
+        self.url = reverse('voting:election_audit', args=[self.election.slug])
+
+    def page_ids(self, response):
+        return [row['id'] for row in response.context['votes']]
+
+    @mock.patch('voting.views.AUDIT_PAGE_SIZE', 2)
+    def test_keyset_pagination(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.page_ids(response), self.vote_ids[:2])
+        self.assertIsNone(response.context['previous_query'])
+
+        response = self.client.get(f"{self.url}?{response.context['next_query']}")
+        self.assertEqual(self.page_ids(response), self.vote_ids[2:4])
+
+        last_page = self.client.get(f"{self.url}?{response.context['next_query']}")
+        self.assertEqual(self.page_ids(last_page), self.vote_ids[4:])
+        self.assertIsNone(last_page.context['next_query'])
+
+        # '?before=' regresa a la página anterior en orden ascendente
+        response = self.client.get(f"{self.url}?{last_page.context['previous_query']}")
+        self.assertEqual(self.page_ids(response), self.vote_ids[2:4])
+        response = self.client.get(f"{self.url}?{response.context['previous_query']}")
+        self.assertEqual(self.page_ids(response), self.vote_ids[:2])
+        self.assertIsNone(response.context['previous_query'])
+
+    @mock.patch('voting.views.AUDIT_PAGE_SIZE', 2)
+    def test_pagination_keeps_filters(self):
+        response = self.client.get(self.url, {'opcion': 'p1:si'})
+        self.assertEqual(self.page_ids(response), [self.vote_ids[0], self.vote_ids[2]])
+        self.assertIn('opcion=P1%3ASI', response.context['next_query'])
+
+        response = self.client.get(f"{self.url}?{response.context['next_query']}")
+        self.assertEqual(self.page_ids(response), [self.vote_ids[4]])
+
+    @mock.patch('voting.views.AUDIT_EXPORT_CHUNK_SIZE', 2)
+    def test_streamed_export(self):
+        url = reverse('voting:election_audit_export', args=[self.election.slug])
+
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        self.assertEqual(rows[0][:4], ['id', 'voter_username', 'timestamp', 'P1'])
+        # Los bloques del cursor no repiten ni pierden votos
+        self.assertEqual([int(row[0]) for row in rows[1:]], self.vote_ids)
+
+        response = self.client.get(url, {'formato': 'ndjson', 'opcion': 'P1:NO'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual([record['id'] for record in records], [self.vote_ids[1], self.vote_ids[3]])
+        self.assertEqual({record['voter_username'] for record in records}, {'auditado1@x.com', 'auditado3@x.com'})
+
+    def test_staff_only(self):
+        self.client.force_login(User.objects.get(username='auditado0@x.com'))
+        for url in (self.url, reverse('voting:election_audit_export', args=[self.election.slug])):
+            response = self.client.get(url)
+            self.assertRedirects(response, reverse('voting:election_results', args=[self.election.slug]),
+                                 fetch_redirect_response=False)
+
+
+# ---------------------------------------------------------
+# LECTURAS EN RÉPLICA (ReplicaRouter)
+# ---------------------------------------------------------
+
+@mock.patch('voting.db_router.replica_configured', return_value=True)
+class ReplicaRouterTests(TestCase):
+    """La réplica se simula con replica_configured(): se revisa a qué alias manda el router cada consulta."""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.request = RequestFactory().get('/')
+        self.request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+
+    def read_alias(self):
+        return self.router.db_for_read(Vote)
+
+    def test_only_marked_views_read_from_replica(self, _configured):
+        @replica_reads
+        def view(request):
+            return HttpResponse(self.read_alias())
+
+        self.assertEqual(self.read_alias(), 'default')
+        self.assertEqual(view(self.request).content, b'replica')
+        self.assertEqual(self.read_alias(), 'default')
+        # Escrituras y migraciones nunca van a la réplica
+        self.assertEqual(self.router.db_for_write(Vote), 'default')
+        self.assertFalse(self.router.allow_migrate(REPLICA_ALIAS, 'voting'))
+        self.assertTrue(self.router.allow_migrate('default', 'voting'))
+
+    def test_streamed_chunks_read_from_replica(self, _configured):
+        @replica_reads
+        def view(request):
+            return StreamingHttpResponse(self.read_alias() for _ in range(2))
+
+        response = view(self.request)
+        self.assertEqual(self.read_alias(), 'default')
+        self.assertEqual(list(response.streaming_content), [b'replica', b'replica'])
+
+    def test_pinned_session_reads_from_primary(self, _configured):
+        @replica_reads
+        def view(request):
+            return HttpResponse(self.read_alias())
+
+        @replica_reads
+        async def async_view(request):
+            return HttpResponse(self.read_alias())
+
+        pin_primary(self.request)
+        self.assertEqual(view(self.request).content, b'default')
+        self.assertEqual(async_to_sync(async_view)(self.request).content, b'default')
+
+        self.request.session[PIN_SESSION_KEY] = time.time() - 1
+        self.assertEqual(view(self.request).content, b'replica')
+        self.assertEqual(async_to_sync(async_view)(self.request).content, b'replica')
+
+    def test_without_replica_everything_reads_default(self, configured):
+        configured.return_value = False
+
+        @replica_reads
+        def view(request):
+            return HttpResponse(self.read_alias())
+
+        self.assertEqual(view(self.request).content, b'default')
+        pin_primary(self.request)
+        self.assertNotIn(PIN_SESSION_KEY, self.request.session)
+
+
+# ---------------------------------------------------------
+# PARTICIPACIÓN POR MINUTO Y POR HORA (TurnoutBucket)
+# ---------------------------------------------------------
+
+class TurnoutTests(TestCase):
+    # Dos votos en el minuto 10:14 y uno en el 10:15, todos en la hora de las 10:00
+    ballots = [
+        (datetime(2026, 3, 1, 10, 14, 5), {'P1': 'SI'}),
+        (datetime(2026, 3, 1, 10, 14, 50), {'P1': 'NO'}),
+        (datetime(2026, 3, 1, 10, 15, 30), {'P1': 'SI'}),
+    ]
+    by_minute = [
+        {'start': '2026-03-01T10:14:00', 'votes': 2, 'answers': {'P1': {'SI': 1, 'NO': 1}}},
+        {'start': '2026-03-01T10:15:00', 'votes': 1, 'answers': {'P1': {'SI': 1}}},
+    ]
+    by_hour = [
+        {'start': '2026-03-01T10:00:00', 'votes': 3, 'answers': {'P1': {'SI': 2, 'NO': 1}}},
+    ]
+
+    def setUp(self):
+        self.election = Election.objects.create(slug='participacion', name='Participación', questions=BALLOT)
+
+    def assertSeries(self):
+        self.assertEqual(turnout_series(self.election, 'minuto')['buckets'], self.by_minute)
+        self.assertEqual(turnout_series(self.election, 'hora')['buckets'], self.by_hour)
+
+    def test_votes_fill_minute_and_hour_buckets(self):
+        for when, answers in self.ballots:
+            record_vote_turnout(self.election, when, answers)
+        self.assertSeries()
+
+    def test_migration_backfill_matches_live_counts(self):
+        for number, (when, answers) in enumerate(self.ballots):
+            vote = cast_vote(*make_voter(f'participa{number}@x.com'), self.election, answers)
+            Vote.objects.filter(pk=vote.pk).update(timestamp=when)
+        # Como una base anterior a 0016: papeletas sin filas de participación
+        TurnoutBucket.objects.all().delete()
+
+        import_module('voting.migrations.0016_turnout_buckets').fill_turnout_buckets(django_apps, None)
+        self.assertSeries()
+        self.assertEqual(
+            Counter({
+                (minutes, start, question, option): count
+                for minutes, start, question, option, count in TurnoutBucket.objects.values_list(
+                    'minutes', 'start', 'question', 'option', 'count')
+            }),
+            count_turnout_from_ballots(self.election),
+        )
+
+
+# ---------------------------------------------------------
+# MIGRACIONES DE DATOS (respuestas estructuradas)
+# ---------------------------------------------------------
+
+class BallotBackfillMigrationTests(TransactionTestCase):
+    """0004 llena VoteTally y 0007 BallotAnswer a partir del texto de los votos viejos."""
+
+    legacy_options = [
+        'USUARIO:ana|P1:ALTO|P2:FACIL|P3:TAL-VEZ|P4:RAPIDO',
+        'USUARIO:beto|P1:ALTO|P2:DIFICIL|P3:NO-DUDA|P4:LENTO',
+        'USUARIO:caro|P1:BAJO|P2:FACIL|P3:MUCHO|P4:RAPIDO',
+    ]
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('voting', target)])
+        return executor.loader.project_state([('voting', target)]).apps
+
+    def tearDown(self):
+        # El resto de las pruebas espera el esquema completo
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_legacy_votes_are_normalized(self):
+        apps = self.migrate('0003_vote_encrypted_vote')
+        User = apps.get_model('auth', 'User')
+        VoterProfile = apps.get_model('voting', 'VoterProfile')
+        LegacyVote = apps.get_model('voting', 'Vote')
+        for option in self.legacy_options:
+            username = option.split('|')[0].split(':')[1]
+            profile = VoterProfile.objects.create(user=User.objects.create(username=username), has_voted=True)
+            LegacyVote.objects.create(voter=profile, option=option, digital_signature='ab' * 16)
+
+        apps = self.migrate('0004_vote_tally')
+        tallies = {
+            (question, option): count
+            for question, option, count in apps.get_model('voting', 'VoteTally').objects.values_list('question', 'option', 'count')
+        }
+        self.assertEqual(tallies, {
+            ('P1', 'ALTO'): 2, ('P1', 'BAJO'): 1,
+            ('P2', 'FACIL'): 2, ('P2', 'DIFICIL'): 1,
+            ('P3', 'TAL-VEZ'): 1, ('P3', 'NO-DUDA'): 1, ('P3', 'MUCHO'): 1,
+            ('P4', 'RAPIDO'): 2, ('P4', 'LENTO'): 1,
+        })
+
+        apps = self.migrate('0007_ballot_answer')
+        answers = apps.get_model('voting', 'BallotAnswer').objects.order_by('question')
+        self.assertEqual(
+            list(answers.filter(vote__voter__user__username='ana').values_list('question', 'answer')),
+            [('P1', 'ALTO'), ('P2', 'FACIL'), ('P3', 'TAL-VEZ'), ('P4', 'RAPIDO')],
+        )
+        # Cuatro respuestas por papeleta y ninguna para la cabecera USUARIO
+        self.assertEqual(answers.count(), 4 * len(self.legacy_options))
+        self.assertFalse(answers.filter(question='USUARIO').exists())
@@ -0,0 +1,133 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncMinute
+
+from .models import BallotAnswer, TurnoutBucket, Vote
+
+# ---------------------------------------------------------
+# PARTICIPACIÓN EN EL TIEMPO (TurnoutBucket)
+# ---------------------------------------------------------
+# Cada voto suma +1 a las filas de SU minuto y de SU hora (papeletas y cada respuesta),
+# en la misma transacción que lo guarda. Las gráficas leen esas filas: el costo depende
+# de cuántas ventanas se piden (x opciones de la boleta), no de cuántas papeletas hay.
+
+# Resolución -> ancho de la ventana en minutos (TurnoutBucket.minutes)
+RESOLUTIONS = {'minuto': 1, 'hora': 60}
+
+# Por minuto: sin 'desde' se muestran las últimas 6 horas con votos y nunca más de 12
+# (720 puntos por serie, ~10k filas con una boleta de 12 opciones); por hora, toda la elección.
+DEFAULT_MINUTE_WINDOW = timedelta(hours=6)
+MAX_MINUTE_WINDOW = timedelta(hours=12)
+
+
+def bucket_start(when, minutes=1):
+    """Inicio del minuto (o de la hora) de un instante, en la misma hora local que Vote.timestamp."""
+    start = when.replace(second=0, microsecond=0)
+    return start.replace(minute=0) if minutes == 60 else start
+
+
+def turnout_counts(ballots):
+    """
+    Cuenta papeletas y respuestas por minuto y por hora: [(timestamp, {'P1': 'ALTO', ...}), ...]
+    -> {(1, minuto, '', ''): papeletas, (1, minuto, 'P1', 'ALTO'): n, (60, hora, '', ''): ..., ...}
+    """
+    counts = Counter()
+    for when, answers in ballots:
+        for minutes in RESOLUTIONS.values():
+            start = bucket_start(when, minutes)
+            counts[(minutes, start, '', '')] += 1
+            for question, option in answers.items():
+                counts[(minutes, start, question, option)] += 1
+    return counts
+
+
+def add_to_turnout(election, counts):
+    """
+    Suma cantidades a las filas de participación de una elección (ver turnout_counts).
+    Debe llamarse DENTRO de la transacción que guarda los votos; un UPDATE por fila, como add_to_tally.
+    """
+    for (minutes, start, question, option), amount in counts.items():
+        bucket = TurnoutBucket.objects.filter(
+            election=election, minutes=minutes, start=start, question=question, option=option
+        )
+        if bucket.update(count=F('count') + amount):
+            continue
+        # Primer voto de la ventana para esta opción. El savepoint permite reintentar si otro proceso la creó
+        try:
+            with transaction.atomic():
+                TurnoutBucket.objects.create(
+                    election=election, minutes=minutes, start=start, question=question, option=option, count=amount
+                )
+        except IntegrityError:
+            bucket.update(count=F('count') + amount)
+
+
+def record_vote_turnout(election, when, answers):
+    """Suma un voto (su minuto, su hora y sus respuestas). Dentro del transaction.atomic() del Vote."""
+    add_to_turnout(election, turnout_counts([(when, answers)]))
+
+
+def count_turnout_from_ballots(election):
+    """
+    Recalcula las filas de participación desde las papeletas (GROUP BY por minuto sobre
+    el índice (election, timestamp); las horas se suman aquí). Es la fuente de verdad para rebuild_tallies.
+    """
+    by_minute = []
+    ballots = (
+        Vote.objects.filter(election=election).annotate(minute=TruncMinute('timestamp'))
+        .values_list('minute').annotate(total=Count('id')).order_by()
+    )
+    by_minute.extend((minute, '', '', total) for minute, total in ballots)
+    answers = (
+        BallotAnswer.objects.filter(election=election).annotate(minute=TruncMinute('vote__timestamp'))
+        .values_list('minute', 'question', 'answer').annotate(total=Count('id')).order_by()
+    )
+    by_minute.extend(answers)
+
+    counts = Counter()
+    for minute, question, option, total in by_minute:
+        for minutes in RESOLUTIONS.values():
+            counts[(minutes, bucket_start(minute, minutes), question, option)] += total
+    return counts
+
+
+def turnout_series(election, resolution='minuto', since=None, until=None):
+    """
+    Votos por minuto u hora y las respuestas de cada ventana, listos para JSON:
+    {'resolution': 'hora', 'buckets': [{'start': '2025-11-17T10:00:00', 'votes': 12,
+      'answers': {'P1': {'ALTO': 7, 'BAJO': 5}, ...}}, ...]}
+    Solo ventanas con votos; una consulta indexada sobre TurnoutBucket.
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Resolución no válida: {resolution}")
+    rows = TurnoutBucket.objects.filter(election=election, minutes=RESOLUTIONS[resolution])
+    if resolution == 'minuto':
+        end = until or rows.order_by('-start').values_list('start', flat=True).first()
+        if end is not None:
+            earliest = end - MAX_MINUTE_WINDOW + timedelta(minutes=1)
+            since = max(since, earliest) if since else end - DEFAULT_MINUTE_WINDOW + timedelta(minutes=1)
+    if since is not None:
+        # La ventana que contiene 'desde' también cuenta
+        since = bucket_start(since, RESOLUTIONS[resolution])
+        rows = rows.filter(start__gte=since)
+    if until is not None:
+        rows = rows.filter(start__lte=until)
+
+    buckets = {}
+    rows = rows.values_list('start', 'question', 'option', 'count').order_by('start')
+    for window, question, option, count in rows:
+        bucket = buckets.setdefault(window, {'start': window.isoformat(), 'votes': 0, 'answers': {}})
+        if question:
+            bucket['answers'].setdefault(question, {})[option] = count
+        else:
+            bucket['votes'] = count
+    return {
+        'election': election.slug,
+        'resolution': resolution,
+        'since': since.isoformat() if since else None,
+        'until': until.isoformat() if until else None,
+        'buckets': list(buckets.values()),
+    }
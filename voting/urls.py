@@ -1,6 +1,14 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Con ASYNC_VIEWS (servidor ASGI) el voto, la verificación de llave y los resultados en JSON
+# usan sus versiones asíncronas; las URLs y los nombres no cambian.
+if settings.ASYNC_VIEWS:
+    from . import async_views as ballot_views
+else:
+    ballot_views = views
+
 # ---------------------------------------------------------
 # CONFIGURACIÓN DEL ESPACIO DE NOMBRES (Namespace)
 # ---------------------------------------------------------
@@ -21,9 +29,14 @@ urlpatterns = [
     
     # Paso 1 de seguridad: Generar y descargar llaves RSA
     path('generate-keys/', views.key_generation_view, name='generate_keys'),
+    # ...o generarlas en el navegador (WebCrypto): solo se registra la llave pública
+    path('generate-keys/browser/', views.register_public_key_view, name='register_public_key'),
     
     # Paso 2: Formulario de votación (donde se firma y encripta)
-    path('vote/', views.vote_submission_view, name='vote_submit'), 
+    path('vote/', ballot_views.vote_submission_view, name='vote_submit'), 
+    
+    # Paso 2.1 (modo cola): estado del voto mientras los workers lo procesan
+    path('vote/estado/<uuid:receipt>/', views.submission_status_view, name='submission_status'),
     
     # Paso 3: Pantalla final con el comprobante
     path('success/', views.success_page, name='success_page'), 
@@ -34,10 +47,40 @@ urlpatterns = [
     # Tablero Público: Gráficos de resultados (visible para todos)
     path('results/', views.results_dashboard_view, name='results_dashboard'), 
     
+    # Los mismos resultados en JSON, con ETag (respuestas 304 baratas para quien consulta seguido)
+    path('results/data/', ballot_views.results_data_view, name='results_data'),
+    
     # Auditoría Detallada: Tabla técnica con hashes (SOLO para Admins)
     path('auditoria/', views.audit_view, name='audit_view'), 
     
-    # Verificación Personal: El usuario revisa su propio historial de voto
+    # Exportación completa de la auditoría en streaming (CSV o NDJSON, SOLO Admins)
+    path('auditoria/exportar/', views.audit_export, name='audit_export'),
+    path('participacion/', views.turnout_view, name='turnout'),
+    path('participacion/datos/', views.turnout_data_view, name='turnout_data'),
+    
+    # Registro público de papeletas: raíz del árbol de Merkle y prueba de inclusión de un comprobante
+    path('ledger/root/', views.ledger_root_view, name='ledger_root'),
+    path('ledger/proof/<str:receipt>/', views.ledger_proof_view, name='ledger_proof'),
+    
+    # Consulta pública de un comprobante (sin login, con límite de consultas por cliente)
+    path('receipt/<str:receipt>/', views.receipt_check_view, name='receipt_check'),
+    
+    # ---------------------------------------------------------
+    # 2.1 ELECCIONES (varias a la vez)
+    # ---------------------------------------------------------
+    # Las rutas de arriba sin slug atienden a la elección predeterminada (settings.DEFAULT_ELECTION);
+    # estas reciben el slug de la elección en la URL.
+    path('elecciones/', views.election_list_view, name='election_list'),
+    path('elecciones/<slug:election>/vote/', ballot_views.vote_submission_view, name='election_vote'),
+    path('elecciones/<slug:election>/results/', views.results_dashboard_view, name='election_results'),
+    path('elecciones/<slug:election>/results/data/', ballot_views.results_data_view, name='election_results_data'),
+    path('elecciones/<slug:election>/auditoria/', views.audit_view, name='election_audit'),
+    path('elecciones/<slug:election>/auditoria/exportar/', views.audit_export, name='election_audit_export'),
+    path('elecciones/<slug:election>/participacion/', views.turnout_view, name='election_turnout'),
+    path('elecciones/<slug:election>/participacion/datos/', views.turnout_data_view, name='election_turnout_data'),
+    path('elecciones/<slug:election>/verificar-llave/', ballot_views.check_key_status, name='election_check_key'),
+    
+    # Verificación Personal: El usuario revisa su propio historial de voto (todas las elecciones)
     path('verify/', views.verification_page, name='verification_page'),
     
     # Página de créditos del equipo y materia
@@ -55,5 +98,12 @@ urlpatterns = [
     # 4. HERRAMIENTAS EXTRA
     # ---------------------------------------------------------
     # Herramienta para que el usuario pruebe si su archivo .key es válido
-    path('verificar-llave/', views.check_key_status, name='check_key'),
-]
\ No newline at end of file
+    path('verificar-llave/', ballot_views.check_key_status, name='check_key'),
+]
+
+# Resultados en vivo por Server-Sent Events: solo bajo ASGI (ver RESULTS_STREAM_ENABLED)
+if settings.RESULTS_STREAM_ENABLED:
+    urlpatterns += [
+        path('results/stream/', views.results_stream_view, name='results_stream'),
+        path('elecciones/<slug:election>/results/stream/', views.results_stream_view, name='election_results_stream'),
+    ]
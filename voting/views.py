@@ -1,58 +1,57 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, Http404
+from django.http import HttpResponse, Http404, StreamingHttpResponse, JsonResponse
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag, require_POST
 from django.contrib import messages
-from django.db import transaction
 from django.urls import reverse
 # Importamos las funciones de autenticación real
 from django.contrib.auth import login, logout, authenticate
+import asyncio
+import csv
+import itertools
 import json
-from collections import Counter
-import re 
+from datetime import datetime
+from urllib.parse import urlencode
 from django.conf import settings 
+from asgiref.sync import sync_to_async
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.crypto import constant_time_compare
 
 # --- IMPORTACIONES LOCALES ---
 # Traigo mis herramientas de seguridad y mis modelos de base de datos
-from .crypto_utils import generate_rsa_keys, sign_vote, encrypt_vote_aes, verify_signature
-from .models import VoterProfile, Vote 
+from .crypto_utils import private_key_fingerprint, get_scheme, to_hex, normalize_client_public_key
+# Etapas del voto (firma, verificación, cifrado, guardado) y cola de ingesta local
+from .ballot_pipeline import AlreadyVoted, BallotRejected, seal_ballot, seal_signed_ballot, commit_ballot
+from .ballot_queue import QueueFull, enqueue_submission, has_open_submission
+# Reserva de llaves pre-generadas (evita RSA.generate dentro de la petición)
+from .key_pool import take_key_pair
+from .models import VoterProfile, Vote, BallotSubmission, Election, ElectionVoter
+# Elecciones y padrón: resolución del slug (o la predeterminada) y el "ya votó" por elección
+from .elections import get_election_or_404, has_voted, has_voted_anywhere, is_eligible
+# Diario de papeletas (modo 'journal'): respuesta tras el fsync, guardado por lotes
+from .journal import journal_ballot
+# Réplica de lectura para tablero y auditoría; el votante que acaba de escribir lee del primario
+from .db_router import pin_primary, replica_reads
+# Participación por minuto/hora (filas acumuladas, no recorridos de la tabla de votos)
+from .turnout import RESOLUTIONS, turnout_series
+# Funciones de la boleta: texto canónico del voto y respuestas estructuradas
+from .ballot_utils import build_vote_content, get_answers_for_votes
+# Foto cacheada de resultados (tablero y endpoint JSON con ETag)
+from .results_cache import get_results_snapshot, results_etag
+# Registro público de papeletas (árbol de Merkle): raíz y pruebas de inclusión
+from .ledger import ensure_in_ledger, get_ledger_root, inclusion_proof
+# Consulta pública de comprobantes (índice por SHA-256, límite por cliente y caché de "no existe")
+from .receipts import check_rate_limit, client_id, lookup_receipt
+# Difusión en vivo de votos nuevos a los tableros conectados (SSE)
+from .broadcast import get_broadcast
+# Métricas de la ruta crítica: etapas medidas (span) y exportación en formato Prometheus
+from .metrics import render_metrics, span
 # IMPORTANTE: Importamos los nuevos formularios que creamos en forms.py
 from .forms import CustomRegisterForm, CustomLoginForm, KeyCheckForm
 
-from Crypto.PublicKey import RSA
-
-# ---------------------------------------------------------
-# FUNCIONES AUXILIARES (Procesamiento de Texto)
-# ---------------------------------------------------------
-
-def parse_vote_content(vote_option):
-    """
-    Convierte el texto crudo del voto (ej: 'P1:ALTO|P2:FACIL') 
-    en un diccionario de Python fácil de leer.
-    """
-    results = {}
-    # Patrón: (P#):(VALOR)
-    matches = re.findall(r'(P\d+):([A-Z0-9\-]+)', vote_option)
-    for key, value in matches:
-        results[key] = value
-    return results
-
-def get_legible_label(key, value):
-    """
-    Traduce los códigos internos (ej: 'RAPIDO') a texto legible para humanos (ej: 'Muy rápido').
-    Esto se usa para mostrar gráficos y tablas bonitas.
-    """
-    if key == 'P1': 
-        return {'ALTO': 'Alto', 'MEDIO': 'Medio', 'BAJO': 'Bajo'}.get(value, value)
-    if key == 'P2': 
-        return {'FACIL': 'Fáciles', 'ADECUADO': 'Adecuados', 'DIFICIL': 'Difíciles'}.get(value, value)
-    if key == 'P3': 
-        return {'MUCHO': 'Sí, mucho', 'TAL-VEZ': 'Tal vez', 'NO-DUDA': 'No, lo dudo'}.get(value, value)
-    if key == 'P4': 
-        return {'RAPIDO': 'Muy rápido', 'ADECUADO': 'Adecuados', 'LENTO': 'Muy lento'}.get(value, value)
-    return value
-# --- Fin de Funciones Auxiliares ---
-
-
 # ---------------------------------------------------------
 # VISTAS DE NAVEGACIÓN BÁSICA
 # ---------------------------------------------------------
@@ -159,21 +158,25 @@ def key_generation_view(request):
     profile = get_object_or_404(VoterProfile, user=request.user)
 
     # 🛑 RESTRICCIÓN DE INTEGRIDAD 🛑
-    # Si el usuario ya votó, NO le dejo generar llaves nuevas.
+    # Si el usuario ya votó (en cualquier elección), NO le dejo generar llaves nuevas.
     # Esto evita que alguien repudie su voto anterior diciendo "esa no era mi llave".
-    if profile.has_voted:
+    if has_voted_anywhere(profile):
         messages.error(request, 
                        "Tu voto ya ha sido emitido: No es posible generar una nueva llave pública una vez que se ha registrado un voto.")
         return redirect('voting:verification_page') 
 
     # Si el usuario es nuevo o no ha votado:
     if request.method == 'POST':
-        # Llamamos a la función matemática para crear las llaves
-        public_key_pem, private_key_pem = generate_rsa_keys()
+        # Tomamos un par ya generado de la reserva (si está vacía, se genera en caliente)
+        scheme = settings.SIGNATURE_SCHEME
+        with span('keys.take_pair'):
+            public_key_pem, private_key_pem = take_key_pair(scheme)
         
         # Guardamos la PÚBLICA en la base de datos (la identidad visible)
-        profile.public_key = public_key_pem
-        profile.save()
+        # junto con el esquema de firma con el que deberá verificarse.
+        profile.set_public_key(public_key_pem, scheme)
+        # Solo las columnas de la llave: nunca reescribimos el resto del perfil con valores viejos
+        profile.save(update_fields=['public_key', 'signature_scheme', 'public_key_fingerprint'])
         
         # Preparamos la PRIVADA para descargarla como archivo (el secreto del usuario)
         safe_filename = "".join([c for c in request.user.username if c.isalpha() or c.isdigit() or c==' ']).rstrip()
@@ -185,7 +188,60 @@ def key_generation_view(request):
         messages.success(request, "Llave privada generada y descargada con éxito. Guárdala de forma segura. Ya puedes votar.")
         return response 
     
-    return render(request, 'voting/key_generation.html', {'profile': profile})
+    return render(request, 'voting/key_generation.html', {
+        'profile': profile,
+        'client_signing': client_signing_context(request, profile),
+    })
+
+
+def client_signing_context(request, profile, election=None):
+    """
+    Datos que necesita el JavaScript del modo navegador (WebCrypto), para json_script.
+    En la boleta incluye lo necesario para armar el MISMO texto canónico que build_vote_content.
+    Regresa None si el modo está apagado (CLIENT_SIGNING_ENABLED).
+    """
+    if not settings.CLIENT_SIGNING_ENABLED:
+        return None
+    context = {
+        'username': request.user.username,
+        'schemes': settings.CLIENT_SIGNATURE_SCHEMES,
+        'register_url': reverse('voting:register_public_key'),
+        'fingerprint': profile.public_key_fingerprint or None,
+    }
+    if election is not None:
+        context['election'] = election.slug
+        context['questions'] = election.question_keys
+    return context
+
+
+@login_required
+@require_POST
+def register_public_key_view(request):
+    """
+    Modo navegador: registra la llave PÚBLICA generada con WebCrypto.
+    La llave privada nunca llega al servidor (ni a la reserva de llaves).
+    Responde JSON con el esquema y la huella que el navegador guarda junto a su llave.
+    """
+    if not settings.CLIENT_SIGNING_ENABLED:
+        raise Http404
+    profile = get_object_or_404(VoterProfile, user=request.user)
+
+    # Misma restricción que al generar en el servidor: después de votar no se cambia de llave
+    if has_voted_anywhere(profile):
+        return JsonResponse({'error': "Tu voto ya ha sido emitido: no es posible registrar una nueva llave."}, status=409)
+
+    scheme = request.POST.get('signature_scheme', '')
+    if scheme not in settings.CLIENT_SIGNATURE_SCHEMES:
+        return JsonResponse({'error': f"Esquema de firma no permitido: {scheme}"}, status=400)
+    try:
+        public_key_pem = normalize_client_public_key(request.POST.get('public_key', ''), scheme)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    profile.set_public_key(public_key_pem, scheme)
+    profile.save(update_fields=['public_key', 'signature_scheme', 'public_key_fingerprint'])
+    messages.success(request, "Llave generada en tu navegador. Ya puedes votar desde este navegador.")
+    return JsonResponse({'signature_scheme': scheme, 'fingerprint': profile.public_key_fingerprint})
 
 
 # ---------------------------------------------------------
@@ -193,135 +249,246 @@ def key_generation_view(request):
 # ---------------------------------------------------------
 
 @login_required
-def vote_submission_view(request):
+def vote_submission_view(request, election=None):
     """
     Recibe el voto, verifica la llave, FIRMA y ENCRIPTA.
+    Sin slug en la URL se vota en la elección predeterminada (settings.DEFAULT_ELECTION).
     """
     profile = get_object_or_404(VoterProfile, user=request.user)
+    election = get_election_or_404(election)
+    vote_url = reverse('voting:election_vote', args=[election.slug])
+    context = {
+        'profile': profile, 'election': election, 'has_voted': False, 'eligible': True,
+        'client_signing': client_signing_context(request, profile, election),
+    }
     
     # 1. Validaciones previas
-    if profile.has_voted:
-        messages.warning(request, "Ya has votado. No puedes votar de nuevo.")
+    # (en modo diario la marca del padrón se pone antes del comprobante: también cuenta)
+    if has_voted(profile, election):
+        messages.warning(request, "Ya has votado en esta elección. No puedes votar de nuevo.")
         return redirect('voting:success_page') 
 
     if not profile.public_key:
         messages.error(request, "No tienes una llave pública registrada. Por favor, genera tu llave primero.")
         return redirect('voting:generate_keys')
 
+    # Elección cerrada o votante fuera del padrón: la boleta muestra el aviso y no el formulario
+    context['eligible'] = is_eligible(profile, election)
+    if request.method == 'POST' and (not election.is_open or not context['eligible']):
+        messages.error(request, "No puedes votar en esta elección.")
+        return render(request, 'voting/vote_form.html', context, status=403)
+
 
     if request.method == 'POST':
-        # 2. Capturamos lo que el usuario eligió
-        pregunta_1 = request.POST.get('pregunta_1')
-        pregunta_2 = request.POST.get('pregunta_2')
-        pregunta_3 = request.POST.get('pregunta_3')
-        pregunta_4 = request.POST.get('pregunta_4')
-        # Capturamos el archivo de la llave privada que subió
-        private_key_file = request.FILES.get('private_key') 
-
-        if not all([pregunta_1, pregunta_2, pregunta_3, pregunta_4]) or not private_key_file:
-            messages.error(request, "Debes responder todas las preguntas y subir tu llave privada.")
-            return render(request, 'voting/vote_form.html', {'profile': profile})
+        # 2. Capturamos lo que el usuario eligió, su llave o su firma
+        answers, private_key_file, client_signature, error = read_ballot_form(request, election)
+        if error:
+            messages.error(request, error)
+            return render(request, 'voting/vote_form.html', context)
 
         try:
-            # Leemos el contenido de la llave privada subida
-            private_key_pem = private_key_file.read().decode('utf-8')
-
             # 3. Creamos el "paquete" de voto concatenando las respuestas
-            vote_content = (
-                f"USUARIO:{request.user.username}|P1:{pregunta_1}|P2:{pregunta_2}|P3:{pregunta_3}|P4:{pregunta_4}"
-            )
-
-            # 4. FIRMA DIGITAL (Autenticación)
-            # Usamos la llave privada subida para firmar el contenido.
-            signature_hex = sign_vote(vote_content, private_key_pem)
-            
-            # 5. VERIFICACIÓN INMEDIATA
-            # Comprobamos que la llave privada que subió coincide con la pública que tenemos guardada.
-            if not verify_signature(vote_content, signature_hex, profile.public_key):
-                 messages.error(request, "La llave privada subida no corresponde a su llave pública registrada.")
-                 return redirect(reverse('voting:vote_submit')) 
+            # (la elección va dentro del texto firmado)
+            vote_content = build_vote_content(request.user.username, answers, election)
+
+            if client_signature and not private_key_file:
+                # MODO NAVEGADOR: el voto ya viene firmado sobre este mismo texto.
+                # Solo verificamos (una operación de llave pública) y ciframos; no pasa por
+                # la cola aunque esté activa, porque la parte cara (firmar) ya no es nuestra.
+                signature = parse_client_signature(client_signature)
+                with span('ballot.seal'):
+                    encrypted_vote = seal_signed_ballot(
+                        vote_content, signature, profile.public_key, profile.signature_scheme,
+                        cache_key=profile.public_key_cache_key
+                    )
+                return _commit_and_confirm(request, profile, election, vote_content, answers, signature, encrypted_vote)
 
-            # 6. ENCRIPTACIÓN (Confidencialidad)
-            # Encriptamos el voto con AES para que nadie pueda leerlo en la BD.
-            encrypted_vote_hex = encrypt_vote_aes(vote_content)
+            # Leemos el contenido de la llave privada subida
+            with span('vote.read_key_file'):
+                private_key_pem = private_key_file.read().decode('utf-8')
+
+            # MODO COLA: solo encolamos; los workers firman, verifican, cifran y guardan.
+            if settings.BALLOT_INGESTION_MODE == 'queue':
+                if has_open_submission(profile, election):
+                    messages.warning(request, "Tu voto ya se está procesando.")
+                    return redirect('voting:verification_page')
+                try:
+                    submission = enqueue_submission(profile, election, vote_content, private_key_pem)
+                except QueueFull:
+                    messages.error(request, "El sistema está recibiendo muchos votos en este momento. Intenta de nuevo en unos segundos.")
+                    return render(request, 'voting/vote_form.html', context, status=503)
+                return redirect('voting:submission_status', receipt=submission.receipt)
+
+            # 4-6. FIRMA DIGITAL, VERIFICACIÓN INMEDIATA y ENCRIPTACIÓN
+            with span('ballot.seal'):
+                signature, encrypted_vote = seal_ballot(
+                    vote_content, private_key_pem, profile.public_key, profile.signature_scheme,
+                    cache_key=profile.public_key_cache_key
+                )
 
             # 7. GUARDADO EN BASE DE DATOS
-            # Usamos transaction.atomic para asegurar que se guarde todo o nada.
-            with transaction.atomic():
-                Vote.objects.create(
-                    voter=profile,
-                    option=vote_content, # Guardamos el texto plano (opcional según requisitos)
-                    digital_signature=signature_hex, # Guardamos la firma
-                    encrypted_vote=encrypted_vote_hex # Guardamos el cifrado
-                )
-                # Marcamos al usuario como "ya votó"
-                profile.has_voted = True
-                profile.save()
-            
-            messages.success(request, "¡Voto firmado y procesado con éxito!")
-            # Guardamos la firma en sesión para mostrarla en la pantalla de éxito
-            request.session['last_signature'] = signature_hex
+            return _commit_and_confirm(request, profile, election, vote_content, answers, signature, encrypted_vote)
+
+        except AlreadyVoted as e:
+            messages.warning(request, str(e))
             return redirect('voting:success_page')
 
+        except BallotRejected as e:
+            messages.error(request, str(e))
+            return redirect(vote_url)
+
         except Exception as e:
             messages.error(request, f"Error Criptográfico o de Archivo: {e}")
-            return render(request, 'voting/vote_form.html', {'profile': profile})
+            return render(request, 'voting/vote_form.html', context)
 
-    return render(request, 'voting/vote_form.html', {'profile': profile})
+    return render(request, 'voting/vote_form.html', context)
+
+
+def read_ballot_form(request, election):
+    """
+    Respuestas, archivo de llave y firma del navegador enviados en la boleta.
+    Regresa (respuestas, archivo, firma, error); 'error' es el mensaje para el votante o None.
+    """
+    # pregunta_1 -> primera pregunta de la boleta, pregunta_2 -> segunda, ...
+    answers = {
+        key: request.POST.get(f'pregunta_{number}')
+        for number, key in enumerate(election.question_keys, start=1)
+    }
+    # El archivo de la llave privada que subió...
+    private_key_file = request.FILES.get('private_key')
+    # ...o la firma hecha en su navegador (modo WebCrypto, en hexadecimal)
+    client_signature = request.POST.get('signature', '').strip() if settings.CLIENT_SIGNING_ENABLED else ''
+
+    error = None
+    if not all(answers.values()) or not (private_key_file or client_signature):
+        error = "Debes responder todas las preguntas y firmar tu voto (en el navegador o subiendo tu llave privada)."
+    # Solo aceptamos opciones que existan en la boleta (evita basura en los conteos)
+    elif not all(election.is_valid_answer(key, value) for key, value in answers.items()):
+        error = "Alguna de las respuestas no es una opción válida."
+    return answers, private_key_file, client_signature, error
+
+
+def parse_client_signature(client_signature):
+    """Firma del navegador (hexadecimal) a bytes; BallotRejected si no es válida."""
+    try:
+        return bytes.fromhex(client_signature)
+    except ValueError:
+        raise BallotRejected("La firma enviada no es válida.")
+
+
+def store_ballot(profile, election, vote_content, answers, signature, encrypted_vote):
+    """Guarda una papeleta ya sellada según BALLOT_INGESTION_MODE."""
+    if settings.BALLOT_INGESTION_MODE == 'journal':
+        # MODO DIARIO: respondemos en cuanto la papeleta está en disco; el flusher la guarda
+        with span('journal.append'):
+            journal_ballot(profile, election, vote_content, answers, signature, encrypted_vote)
+    else:
+        # Todo en una sola transacción: se guarda todo o nada.
+        commit_ballot(profile, election, vote_content, answers, signature, encrypted_vote)
+
+
+def _commit_and_confirm(request, profile, election, vote_content, answers, signature, encrypted_vote):
+    store_ballot(profile, election, vote_content, answers, signature, encrypted_vote)
+    pin_primary(request)
+
+    messages.success(request, "¡Voto firmado y procesado con éxito!")
+    # Guardamos la firma en sesión para mostrarla en la pantalla de éxito
+    request.session['last_signature'] = to_hex(signature)
+    return redirect('voting:success_page')
 
 
 @login_required
 def success_page(request):
     """Muestra el comprobante digital después de votar."""
-    signature = request.session.pop('last_signature', "Comprobante no disponible.")
-    return render(request, 'voting/success.html', {'signature': signature})
+    signature = request.session.pop('last_signature', None)
+    context = {'signature': signature or "Comprobante no disponible."}
+    if signature:
+        # Enlace a la prueba de inclusión del comprobante en el registro público
+        context['proof_url'] = reverse('voting:ledger_proof', args=[signature])
+    return render(request, 'voting/success.html', context)
+
+
+@login_required
+def submission_status_view(request, receipt):
+    """
+    Estado de un voto encolado (modo cola). La página se recarga sola mientras
+    el voto espera; con '?format=json' regresa solo el estado (para sondeo).
+    """
+    submission = get_object_or_404(BallotSubmission, receipt=receipt, voter__user=request.user)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'receipt': str(submission.receipt),
+            'status': submission.status,
+            'error': submission.error,
+        })
+
+    if submission.status == BallotSubmission.DONE:
+        pin_primary(request)
+        messages.success(request, "¡Voto firmado y procesado con éxito!")
+        request.session['last_signature'] = to_hex(submission.vote.digital_signature) if submission.vote else ''
+        return redirect('voting:success_page')
+
+    if submission.status == BallotSubmission.FAILED:
+        messages.error(request, submission.error)
+        return redirect('voting:election_vote', submission.election.slug)
+
+    return render(request, 'voting/submission_status.html', {'submission': submission})
 
 
 # ---------------------------------------------------------
 # VISTAS DE RESULTADOS Y AUDITORÍA
 # ---------------------------------------------------------
 
-def get_counts_for_question(question_key, votes):
-    """Cuenta cuántos votos tiene cada opción para generar gráficos."""
-    results = []
-    for vote in votes:
-        parsed_data = parse_vote_content(vote.option)
-        if question_key in parsed_data:
-            results.append(parsed_data[question_key])
-    
-    counts = Counter(results)
-    options = [get_legible_label(question_key, key) for key in counts.keys()]
-    
-    return {
-        'options': json.dumps(options), 
-        'counts': json.dumps(list(counts.values()))
-    }
+def get_charts(election, snapshot):
+    """Arma un gráfico por pregunta (título, etiquetas, conteos) en el orden de la boleta."""
+    return [
+        {
+            'key': key,
+            'chart_title': snapshot['questions'][key]['title'],
+            'options': snapshot['questions'][key]['options'],
+            'counts': snapshot['questions'][key]['counts'],
+        }
+        for key in election.question_keys
+    ]
+
+
+@login_required
+def election_list_view(request):
+    """Lista de elecciones, marcando en cuáles ya votó el usuario."""
+    profile = get_object_or_404(VoterProfile, user=request.user)
+    voted = set(
+        ElectionVoter.objects.filter(voter=profile, has_voted=True).values_list('election_id', flat=True)
+    )
+    elections = [(election, election.id in voted) for election in Election.objects.all()]
+    return render(request, 'voting/election_list.html', {
+        'elections': elections,
+        'default_election': settings.DEFAULT_ELECTION,
+    })
+
 
 @login_required 
-def results_dashboard_view(request):
+@replica_reads
+def results_dashboard_view(request, election=None):
     """
-    Tablero Público: Muestra estadísticas generales.
+    Tablero Público: Muestra estadísticas generales de una elección.
     Cualquier usuario logueado puede ver esto.
     """
     is_admin = request.user.is_staff
-    all_votes = Vote.objects.all().select_related('voter').order_by('id') 
-    
-    # Preparamos datos para los 4 gráficos
-    data_p1 = get_counts_for_question('P1', all_votes)
-    data_p2 = get_counts_for_question('P2', all_votes)
-    data_p3 = get_counts_for_question('P3', all_votes)
-    data_p4 = get_counts_for_question('P4', all_votes)
-
-    total_votes = len(all_votes)
+    election = get_election_or_404(election)
+    # Foto cacheada de los contadores (solo se recalcula cuando llega un voto nuevo)
+    with span('results.snapshot'):
+        snapshot = get_results_snapshot(election)
 
     context = {
-        'total_votes': total_votes,
-        'options_json_p1': data_p1['options'], 'counts_json_p1': data_p1['counts'],
-        'options_json_p2': data_p2['options'], 'counts_json_p2': data_p2['counts'],
-        'options_json_p3': data_p3['options'], 'counts_json_p3': data_p3['counts'],
-        'options_json_p4': data_p4['options'], 'counts_json_p4': data_p4['counts'],
+        'election': election,
+        'questions': election.questions,
+        'charts': get_charts(election, snapshot),
+        'total_votes': snapshot['total_votes'],
         
         'is_admin': is_admin, 
+        # El tablero solo abre el EventSource si la ruta SSE existe (servidor ASGI)
+        'live_results': settings.RESULTS_STREAM_ENABLED,
         'is_verification_page': False, 
         'is_audit_page': False, 
     }
@@ -330,35 +497,192 @@ def results_dashboard_view(request):
 
 
 @login_required
-def audit_view(request):
+@cache_control(private=True, no_cache=True)
+@etag(results_etag)
+@replica_reads
+def results_data_view(request, election=None):
+    """
+    Los mismos resultados del tablero en JSON (para clientes que consultan seguido).
+    Si el cliente manda 'If-None-Match' con el ETag vigente, respondemos 304 sin cuerpo
+    y sin tocar la base de datos.
+    """
+    return JsonResponse(get_results_snapshot(get_election_or_404(election)))
+
+
+def format_sse(event_type, data):
+    """Da formato de Server-Sent Event a un mensaje."""
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+@login_required
+async def results_stream_view(request, election=None):
+    """
+    Resultados en vivo (Server-Sent Events). Vista ASÍNCRONA: requiere correr
+    bajo ASGI (voting_project/asgi.py); cada conexión abierta es solo una cola
+    en memoria, no un worker bloqueado.
+    Primero manda la foto completa y después un 'delta' por cada voto confirmado
+    de ESTA elección.
+    """
+    if not isinstance(request, ASGIRequest):
+        # Bajo WSGI la respuesta infinita se consumiría de forma síncrona y nunca llegaría nada
+        raise Http404("Los resultados en vivo requieren un servidor ASGI.")
+    election = await sync_to_async(get_election_or_404)(election)
+    broadcast = get_broadcast()
+
+    async def event_stream():
+        # El suscriptor se registra cuando el cliente empieza a leer, y ANTES de la foto
+        # (así no se pierde un voto entre ambas); el 'finally' lo quita siempre.
+        subscriber = broadcast.subscribe(election)
+        try:
+            snapshot = await sync_to_async(get_results_snapshot)(election)
+            yield format_sse('snapshot', snapshot)
+            loop, queue, slug = subscriber
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.RESULTS_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    # Comentario SSE: mantiene viva la conexión a través de proxies
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse(event['type'], event.get('data', {}))
+        finally:
+            broadcast.unsubscribe(subscriber)
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Evita que Nginx/Render acumulen la respuesta en un búfer
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Columnas que necesita la tabla de auditoría (y la exportación).
+# Usamos values_list para no construir objetos completos ni hacer consultas extra por fila.
+AUDIT_COLUMNS = (
+    'id', 'encrypted_vote', 'digital_signature', 'timestamp',
+    'voter__user__username', 'voter__signature_scheme',
+)
+
+# Votos por página en la tabla de auditoría
+AUDIT_PAGE_SIZE = 50
+
+# Votos que se leen por consulta al exportar (la memoria no crece con el total de votos)
+AUDIT_EXPORT_CHUNK_SIZE = 2000
+
+
+def parse_time_param(raw_value, end_of_day=False):
+    """Acepta '2025-11-17' o '2025-11-17T21:30' (input datetime-local). Regresa None si no es una fecha."""
+    value = parse_datetime(raw_value)
+    if value is None and parse_date(raw_value) is not None:
+        value = datetime.combine(parse_date(raw_value), datetime.max.time() if end_of_day else datetime.min.time())
+    return value
+
+
+def filter_audit_votes(params, election):
+    """
+    Aplica los filtros de la auditoría (rango de fechas y opción) a los votos de una elección.
+    Regresa (queryset, filtros_limpios) para poder repetirlos en los enlaces de paginación.
+    """
+    votes = Vote.objects.filter(election=election)
+    filters = {}
+
+    # Rango de fechas: acepta '2025-11-17' o '2025-11-17T21:30' (input datetime-local)
+    for param, lookup in (('desde', 'timestamp__gte'), ('hasta', 'timestamp__lte')):
+        raw_value = (params.get(param) or '').strip()
+        if not raw_value:
+            continue
+        value = parse_time_param(raw_value, end_of_day=param == 'hasta')
+        if value is not None:
+            votes = votes.filter(**{lookup: value})
+            filters[param] = raw_value
+
+    # Opción: 'P1:ALTO' -> votos que respondieron ALTO en la pregunta 1
+    # (JOIN contra BallotAnswer usando su índice (election, question, answer))
+    option = (params.get('opcion') or '').strip().upper()
+    if ':' in option:
+        question, answer = option.split(':', 1)
+        votes = votes.filter(answers__question=question, answers__answer=answer)
+        filters['opcion'] = option
+
+    return votes, filters
+
+
+def build_audit_rows(rows, election):
+    """
+    Convierte filas de AUDIT_COLUMNS en los diccionarios que usa la tabla/exportación.
+    Las respuestas de todo el bloque se traen en una sola consulta a BallotAnswer.
+    'answers' es la lista de respuestas legibles en el orden de la boleta (para la tabla);
+    además cada pregunta queda como columna propia (para la exportación).
+    """
+    answers_by_vote = get_answers_for_votes([row[0] for row in rows])
+    processed = []
+    for vote_id, encrypted_vote, digital_signature, timestamp, username, scheme in rows:
+        answers = answers_by_vote[vote_id]
+        labels = {key: election.get_label(key, answers.get(key, 'N/A')) for key in election.question_keys}
+        processed.append({
+            'id': vote_id,
+            'voter_username': username,
+            'encrypted_vote': to_hex(encrypted_vote),   # Mostramos el sobre AES (en hex)
+            'digital_signature': to_hex(digital_signature), # Mostramos la firma digital (en hex)
+            'timestamp': timestamp,
+            'signature_scheme': get_scheme(scheme).label,
+            'answers': list(labels.values()),
+            **labels,
+        })
+    return processed
+
+
+@login_required
+@replica_reads
+def audit_view(request, election=None):
     """
     Auditoría Detallada: Muestra tabla cruda con firmas y encriptación.
     SOLO accesible para administradores (Staff).
+
+    Paginación por cursor (keyset) sobre el id: '?after=<id>' muestra la página
+    siguiente y '?before=<id>' la anterior. Cada página es una consulta indexada
+    de AUDIT_PAGE_SIZE filas, sin importar cuántos votos existan.
     """
+    election = get_election_or_404(election)
     if not request.user.is_staff:
         messages.error(request, "Acceso Denegado: Solo el personal de administración puede acceder a la auditoría.")
-        return redirect('voting:results_dashboard')
-        
-    all_votes = Vote.objects.all().select_related('voter').order_by('id') 
-    
-    processed_votes = []
-    for vote in all_votes:
-        parsed_data = parse_vote_content(vote.option)
+        return redirect('voting:election_results', election.slug)
         
-        processed_votes.append({
-            'id': vote.id,
-            'voter_username': vote.voter.user.username,
-            'encrypted_vote': vote.encrypted_vote,   # Mostramos el hash AES
-            'digital_signature': vote.digital_signature, # Mostramos la firma RSA
-            'timestamp': vote.timestamp,
-            'P1': get_legible_label('P1', parsed_data.get('P1', 'N/A')),
-            'P2': get_legible_label('P2', parsed_data.get('P2', 'N/A')),
-            'P3': get_legible_label('P3', parsed_data.get('P3', 'N/A')),
-            'P4': get_legible_label('P4', parsed_data.get('P4', 'N/A')),
-        })
+    votes, filters = filter_audit_votes(request.GET, election)
+    after = request.GET.get('after', '')
+    before = request.GET.get('before', '')
+
+    if before.isdigit():
+        # Página anterior: leemos hacia atrás y luego volteamos el resultado
+        rows = list(votes.filter(id__lt=int(before)).order_by('-id').values_list(*AUDIT_COLUMNS)[:AUDIT_PAGE_SIZE + 1])
+        has_previous = len(rows) > AUDIT_PAGE_SIZE
+        rows = rows[:AUDIT_PAGE_SIZE][::-1]
+        has_next = True
+    else:
+        if after.isdigit():
+            votes = votes.filter(id__gt=int(after))
+        rows = list(votes.order_by('id').values_list(*AUDIT_COLUMNS)[:AUDIT_PAGE_SIZE + 1])
+        has_next = len(rows) > AUDIT_PAGE_SIZE
+        rows = rows[:AUDIT_PAGE_SIZE]
+        has_previous = after.isdigit()
+
+    processed_votes = build_audit_rows(rows, election)
+
+    # Enlaces de paginación conservando los filtros activos
+    filter_query = urlencode(filters)
+    next_query = previous_query = None
+    if processed_votes and has_next:
+        next_query = urlencode({**filters, 'after': processed_votes[-1]['id']})
+    if processed_votes and has_previous:
+        previous_query = urlencode({**filters, 'before': processed_votes[0]['id']})
     
     context = {
+        'election': election,
+        'questions': election.questions,
         'votes': processed_votes, 
+        'filters': filters,
+        'filter_query': filter_query,
+        'next_query': next_query,
+        'previous_query': previous_query,
         'is_admin': True, 
         'is_verification_page': False, 
         'is_audit_page': True, 
@@ -367,12 +691,210 @@ def audit_view(request):
     return render(request, 'voting/results_dashboard.html', context)
 
 
+def _turnout_params(params):
+    """Resolución ('minuto' u 'hora') y rango de fechas de la vista de participación."""
+    resolution = params.get('resolucion', 'minuto')
+    if resolution not in RESOLUTIONS:
+        resolution = 'minuto'
+    since = parse_time_param((params.get('desde') or '').strip())
+    until = parse_time_param((params.get('hasta') or '').strip(), end_of_day=True)
+    return resolution, since, until
+
+
+@login_required
+@replica_reads
+def turnout_view(request, election=None):
+    """
+    Participación en el tiempo (solo staff): votos por minuto u hora y cómo se reparten
+    las respuestas en cada ventana. Se arma con las filas acumuladas (TurnoutBucket),
+    no recorriendo las papeletas.
+    """
+    election = get_election_or_404(election)
+    if not request.user.is_staff:
+        messages.error(request, "Acceso Denegado: Solo el personal de administración puede ver la participación.")
+        return redirect('voting:election_results', election.slug)
+
+    resolution, since, until = _turnout_params(request.GET)
+    with span('turnout.series'):
+        series = turnout_series(election, resolution, since, until)
+    return render(request, 'voting/turnout.html', {
+        'election': election,
+        'series': series,
+        'resolution': resolution,
+        'filters': {param: request.GET.get(param, '') for param in ('desde', 'hasta')},
+        'labels': {
+            question['key']: {
+                'title': question.get('chart_title') or question.get('title') or question['key'],
+                'options': election.question_options.get(question['key'], {}),
+            }
+            for question in election.questions
+        },
+    })
+
+
+@login_required
+@replica_reads
+def turnout_data_view(request, election=None):
+    """La misma serie de participación en JSON ('?resolucion=hora&desde=...&hasta=...')."""
+    election = get_election_or_404(election)
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Solo el personal de administración puede ver la participación.'}, status=403)
+    resolution, since, until = _turnout_params(request.GET)
+    with span('turnout.series'):
+        return JsonResponse(turnout_series(election, resolution, since, until))
+
+
+class Echo:
+    """Pseudo-archivo para csv.writer: regresa el renglón en lugar de guardarlo."""
+    def write(self, value):
+        return value
+
+
+def iter_audit_rows(votes, election):
+    """
+    Recorre los votos filtrados en bloques por cursor (id > último visto).
+    Cada bloque es una consulta corta, así la exportación nunca carga todo en memoria.
+    """
+    last_id = 0
+    while True:
+        rows = list(votes.filter(id__gt=last_id).order_by('id').values_list(*AUDIT_COLUMNS)[:AUDIT_EXPORT_CHUNK_SIZE])
+        if not rows:
+            return
+        yield from build_audit_rows(rows, election)
+        last_id = rows[-1][0]
+
+
+@login_required
+@replica_reads
+def audit_export(request, election=None):
+    """
+    Exportación de la auditoría en CSV (por defecto) o NDJSON ('?formato=ndjson').
+    Respeta los mismos filtros que la tabla y se envía en streaming.
+    """
+    election = get_election_or_404(election)
+    if not request.user.is_staff:
+        messages.error(request, "Acceso Denegado: Solo el personal de administración puede acceder a la auditoría.")
+        return redirect('voting:election_results', election.slug)
+
+    votes, filters = filter_audit_votes(request.GET, election)
+    export_format = request.GET.get('formato', 'csv')
+    # Una columna por pregunta de la boleta de esta elección
+    fields = ['id', 'voter_username', 'timestamp', *election.question_keys,
+              'signature_scheme', 'digital_signature', 'encrypted_vote']
+    filename = f'auditoria_{election.slug}'
+
+    if export_format == 'ndjson':
+        lines = (
+            json.dumps({field: row[field] for field in fields}, default=str, ensure_ascii=False) + '\n'
+            for row in iter_audit_rows(votes, election)
+        )
+        response = StreamingHttpResponse(lines, content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.ndjson"'
+        return response
+
+    writer = csv.writer(Echo())
+    lines = itertools.chain(
+        [writer.writerow(fields)],
+        (writer.writerow([row[field] for field in fields]) for row in iter_audit_rows(votes, election)),
+    )
+    response = StreamingHttpResponse(lines, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+# ---------------------------------------------------------
+# REGISTRO PÚBLICO DE PAPELETAS (sin login: cualquiera puede auditar)
+# ---------------------------------------------------------
+
+@cache_control(no_cache=True)
+def ledger_root_view(request):
+    """Raíz actual del árbol de Merkle de papeletas y cuántas hojas tiene."""
+    size, root = get_ledger_root()
+    return JsonResponse({'algorithm': 'sha256-rfc6962', 'size': size, 'root': root.hex()})
+
+
+def _throttled(request):
+    """Respuesta 429 si el cliente ya agotó sus consultas públicas de la ventana; None si puede seguir."""
+    retry_after = check_rate_limit(client_id(request))
+    if not retry_after:
+        return None
+    response = JsonResponse({'error': 'Demasiadas consultas. Intenta de nuevo más tarde.'}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+@cache_control(no_cache=True)
+def ledger_proof_view(request, receipt):
+    """
+    Prueba de inclusión de un comprobante (la firma en hexadecimal que vio el votante).
+    Con 'leaf', 'index', 'size' y 'path' cualquiera recalcula la raíz sin confiar en el servidor.
+    Pública y sin login: comparte el límite de consultas por IP con receipt_check_view.
+    """
+    throttled = _throttled(request)
+    if throttled:
+        return throttled
+
+    try:
+        signature = bytes.fromhex(receipt)
+    except ValueError:
+        return JsonResponse({'error': 'El comprobante debe ser la firma en hexadecimal.'}, status=400)
+
+    proof = inclusion_proof(signature)
+    if proof is None:
+        # Recién confirmado: su hoja puede estar aún en la lista del anexador
+        ensure_in_ledger(signature)
+        proof = inclusion_proof(signature)
+    if proof is None:
+        return JsonResponse({'error': 'El comprobante no está en el registro.'}, status=404)
+    return JsonResponse({
+        'algorithm': 'sha256-rfc6962',
+        'index': proof['index'],
+        'size': proof['size'],
+        'leaf': proof['leaf'].hex(),
+        'path': [node.hex() for node in proof['path']],
+        'root': proof['root'].hex(),
+    })
+
+
+@cache_control(no_cache=True)
+def receipt_check_view(request, receipt):
+    """
+    ¿Está este comprobante en la urna? Público y sin login: solo dice si existe,
+    cuándo se registró y su posición en el registro (nunca quién votó ni qué).
+    """
+    throttled = _throttled(request)
+    if throttled:
+        return throttled
+
+    try:
+        signature = bytes.fromhex(receipt)
+    except ValueError:
+        return JsonResponse({'error': 'El comprobante debe ser la firma en hexadecimal.'}, status=400)
+
+    found = lookup_receipt(signature)
+    if found is None:
+        return JsonResponse({'found': False}, status=404)
+    if found['ledger_index'] is None:
+        ensure_in_ledger(signature)
+        found = lookup_receipt(signature)
+    return JsonResponse({
+        'found': True,
+        'recorded_at': found['recorded_at'].isoformat(),
+        'ledger_index': found['ledger_index'],
+        'proof_url': reverse('voting:ledger_proof', args=[receipt]),
+    })
+
+
 @login_required
+@replica_reads
 def verification_page(request):
     """
-    Verificación Personal: Muestra al usuario SU propio historial y firmas.
+    Verificación Personal: Muestra al usuario SU propio historial y firmas (de todas las elecciones).
     """
-    user_votes = Vote.objects.filter(voter__user=request.user).select_related('voter').order_by('-timestamp')
+    user_votes = (
+        Vote.objects.filter(voter__user=request.user)
+        .select_related('voter__user', 'election').order_by('-timestamp')
+    )
     
     context = {
         'votes': user_votes,
@@ -383,6 +905,18 @@ def verification_page(request):
     
     return render(request, 'voting/results_dashboard.html', context)
 
+def metrics_view(request):
+    """
+    Métricas en formato de texto de Prometheus (histogramas por vista y por etapa).
+    Solo staff, o un recolector con 'Authorization: Bearer <METRICS_TOKEN>'.
+    Sin muestreo (METRICS_SAMPLE_RATE=0) los histogramas están vacíos.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not request.user.is_staff and not (token and constant_time_compare(authorization, f'Bearer {token}')):
+        raise PermissionDenied
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 def guide_view(request):
     """Muestra la guía de usuario."""
     return render(request, 'voting/guide.html')
@@ -392,12 +926,13 @@ def guide_view(request):
 # ---------------------------------------------------------
 
 @login_required
-def check_key_status(request):
+def check_key_status(request, election=None):
     """
     Permite al usuario subir un archivo .key para ver si funciona.
-    No guarda nada, solo verifica.
+    No guarda nada, solo verifica. "Ya usada" se refiere a la elección de la URL.
     """
     profile = get_object_or_404(VoterProfile, user=request.user)
+    election = get_election_or_404(election)
     key_status = None # Estados posibles: 'valid_ready', 'valid_used', 'invalid_format', etc.
     
     if request.method == 'POST':
@@ -406,28 +941,27 @@ def check_key_status(request):
             uploaded_file = request.FILES['private_key']
             try:
                 # 1. Intentamos leer la llave (Detectar si es Falsa/Corrupta)
+                # según el esquema de firma registrado para este votante.
                 key_content = uploaded_file.read().decode('utf-8')
-                private_key_obj = RSA.import_key(key_content)
+                uploaded_fingerprint = private_key_fingerprint(key_content, profile.signature_scheme)
                 
                 # 2. Verificamos si el usuario tiene una llave registrada en el sistema
                 if not profile.public_key:
                     key_status = 'no_key_registered'
                 else:
-                    # 3. Generamos la pública desde la privada subida y comparamos con la guardada
-                    uploaded_public_pem = private_key_obj.publickey().export_key('PEM').decode('utf-8').strip()
-                    stored_public_pem = profile.public_key.strip()
-                    
-                    if uploaded_public_pem != stored_public_pem:
+                    # 3. Comparamos la huella de la pública derivada de la privada subida
+                    # con la huella guardada (sin volver a exportar PEM)
+                    if uploaded_fingerprint != profile.ensure_fingerprint():
                         key_status = 'mismatch' # La llave sirve, pero no es la tuya
                     else:
                         # 4. Verificar si ya se usó
-                        if profile.has_voted:
+                        if has_voted(profile, election):
                             key_status = 'valid_used'
                         else:
                             key_status = 'valid_ready'
 
             except (ValueError, IndexError, TypeError) as e:
-                # Si RSA.import_key falla, el archivo es basura
+                # Si la llave no se puede importar, el archivo es basura
                 key_status = 'invalid_format'
     else:
         form = KeyCheckForm()
@@ -435,5 +969,6 @@ def check_key_status(request):
     return render(request, 'voting/check_key.html', {
         'form': form, 
         'key_status': key_status,
-        'profile': profile
+        'profile': profile,
+        'election': election,
     })
\ No newline at end of file
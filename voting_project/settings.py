@@ -44,6 +44,9 @@ MIDDLEWARE = [
     # AÑADIDO: WhiteNoise ayuda a que que la página sirva los estilos (CSS) e imágenes correctamente cuando se suba a internet.
     'whitenoise.middleware.WhiteNoiseMiddleware', 
     
+    # Métricas de la ruta crítica (solo si METRICS_SAMPLE_RATE > 0; ver voting/metrics.py)
+    'voting.middleware.RequestMetricsMiddleware',
+    
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -86,6 +89,119 @@ DATABASES = {
     )
 }
 
+# Las pruebas de votos simultáneos usan hilos: con SQLite la base de prueba va en un archivo
+# (en memoria, un candado ocupado falla al instante en lugar de esperar como en producción)
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['TEST'] = {'NAME': str(BASE_DIR / 'test_db.sqlite3')}
+
+# Réplica de solo lectura (opcional) para tablero, auditoría, exportaciones y "mis votos".
+# Sin DATABASE_REPLICA_URL todo se lee de 'default'. Ver voting/db_router.py.
+DATABASE_REPLICA_URL = config('DATABASE_REPLICA_URL', default='')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(DATABASE_REPLICA_URL, conn_max_age=600)
+    # En las pruebas la réplica es la misma base de prueba (no hay replicación que esperar)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['voting.db_router.ReplicaRouter']
+# Segundos que un votante lee del primario después de escribir (mayor que el retraso de la réplica)
+DATABASE_REPLICA_PIN_SECONDS = config('DATABASE_REPLICA_PIN_SECONDS', default=10, cast=int)
+
+
+# --- CACHÉ ---
+# Por defecto usamos la caché en memoria de cada proceso (no requiere servicios extra).
+# Con varios workers conviene una caché compartida, por ejemplo:
+#   CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache  CACHE_LOCATION=/tmp/voting-cache
+#   CACHE_BACKEND=django.core.cache.backends.redis.RedisCache          CACHE_LOCATION=redis://127.0.0.1:6379
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='voting-cache'),
+    }
+}
+
+# Segundos que vive la foto de resultados en caché. Cada voto nuevo la invalida antes;
+# este tiempo solo acota qué tan vieja puede estar si cada worker tiene su propia caché
+# (con caché compartida, la versión de los resultados y su ETag no expiran).
+RESULTS_CACHE_TIMEOUT = config('RESULTS_CACHE_TIMEOUT', default=30, cast=int)
+
+
+# --- RESULTADOS EN VIVO (SSE) ---
+# La conexión SSE queda abierta indefinidamente: SOLO funciona bajo un servidor ASGI
+# (gunicorn + UvicornWorker). Bajo WSGI ocuparía un worker hasta su timeout sin enviar nada,
+# por eso la ruta y el EventSource del tablero solo existen con RESULTS_STREAM_ENABLED=True.
+RESULTS_STREAM_ENABLED = config('RESULTS_STREAM_ENABLED', default=False, cast=bool)
+# Backend de difusión para /voting/results/stream/:
+#   'voting.broadcast.InProcessBroadcast'    -> votos que entran por este mismo proceso ASGI.
+#   'voting.broadcast.CachePollingBroadcast' -> sondea la caché compartida (varios procesos).
+RESULTS_BROADCAST_BACKEND = config('RESULTS_BROADCAST_BACKEND', default='voting.broadcast.InProcessBroadcast')
+# Segundos entre "pings" para mantener viva la conexión y entre sondeos de la caché
+RESULTS_STREAM_HEARTBEAT = config('RESULTS_STREAM_HEARTBEAT', default=15, cast=int)
+RESULTS_STREAM_POLL_INTERVAL = config('RESULTS_STREAM_POLL_INTERVAL', default=2.0, cast=float)
+
+
+# --- ELECCIONES ---
+# Elección que atienden las rutas sin slug (/voting/vote/, /voting/results/, ...).
+# La crea la migración 0014 con la boleta original; las demás se crean con 'manage.py create_election'.
+DEFAULT_ELECTION = config('DEFAULT_ELECTION', default='encuesta-catedra')
+
+
+# --- MÉTRICAS (/metrics, formato Prometheus) ---
+# Fracción de peticiones que se miden (0 = apagado: el middleware no se carga; 1 = todas).
+METRICS_SAMPLE_RATE = config('METRICS_SAMPLE_RATE', default=0.0, cast=float)
+# /metrics es solo para staff; un recolector (Prometheus) puede usar 'Authorization: Bearer <token>'.
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+
+# --- INGESTA DE VOTOS ---
+# 'inline': la vista firma, verifica, cifra y guarda antes de responder (comportamiento original).
+# 'queue':  la vista solo valida y encola; 'python manage.py process_ballot_queue' hace el resto.
+# 'journal': la vista sella la papeleta, la agrega al diario local (fsync) y responde;
+#            un hilo la pasa a la base por lotes (ver voting/journal.py).
+BALLOT_INGESTION_MODE = config('BALLOT_INGESTION_MODE', default='inline')
+# Contrapresión: máximo de votos esperando en la cola antes de pedir al votante que reintente
+BALLOT_QUEUE_MAX_PENDING = config('BALLOT_QUEUE_MAX_PENDING', default=500, cast=int)
+
+# Registro público: papeletas que el anexador agrega al árbol de Merkle por transacción (ver voting/ledger.py)
+LEDGER_APPEND_BATCH = config('LEDGER_APPEND_BATCH', default=1000, cast=int)
+
+# Diario de papeletas (modo 'journal'). Debe ser un disco local y persistente del servidor.
+JOURNAL_DIR = config('JOURNAL_DIR', default=str(BASE_DIR / 'journal'))
+# Ventana del "group commit": las papeletas que llegan en estos milisegundos comparten un fsync
+JOURNAL_GROUP_COMMIT_MS = config('JOURNAL_GROUP_COMMIT_MS', default=2, cast=float)
+# Cada cuántos segundos (como máximo) el flusher pasa el diario a la base, y cuántas papeletas por lote
+JOURNAL_FLUSH_INTERVAL = config('JOURNAL_FLUSH_INTERVAL', default=0.5, cast=float)
+JOURNAL_FLUSH_BATCH = config('JOURNAL_FLUSH_BATCH', default=500, cast=int)
+# Tamaño a partir del cual se abre un segmento nuevo (los llenos se borran al pasar a la base)
+JOURNAL_SEGMENT_BYTES = config('JOURNAL_SEGMENT_BYTES', default=16 * 1024 * 1024, cast=int)
+
+# --- VISTAS ASÍNCRONAS (servidor ASGI) ---
+# True: voto, verificación de llave y resultados en JSON usan las vistas de voting/async_views.py.
+# Solo tiene sentido con un servidor ASGI (uvicorn); bajo WSGI cada vista async corre en su propio loop.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+# Procesos que firman, verifican y cifran para esas vistas (0 = hilos del mismo proceso)
+CRYPTO_POOL_WORKERS = config('CRYPTO_POOL_WORKERS', default=2, cast=int)
+# Operaciones criptográficas en espera antes de responder 503 (por proceso del servidor)
+CRYPTO_POOL_MAX_PENDING = config('CRYPTO_POOL_MAX_PENDING', default=64, cast=int)
+
+# Llavero AES de los votos cifrados (ver voting/key_ring.py).
+# BALLOT_AES_KEYS: 'k2:<base64>,k1:<base64>'; la primera es la activa salvo que se indique BALLOT_AES_ACTIVE_KEY.
+# BALLOT_KEYSTORE_PATH: archivo JSON creado/rotado con 'manage.py rotate_ballot_key'.
+# Sin ninguno de los dos, SOLO con DEBUG=True se usa una llave derivada de SECRET_KEY (desarrollo);
+# con DEBUG=False no hay llavero y el chequeo voting.E001 detiene migrate/runserver/check.
+BALLOT_AES_KEYS = config('BALLOT_AES_KEYS', default='')
+BALLOT_AES_ACTIVE_KEY = config('BALLOT_AES_ACTIVE_KEY', default='')
+BALLOT_KEYSTORE_PATH = config('BALLOT_KEYSTORE_PATH', default='')
+
+
+# --- CONSULTA PÚBLICA DE COMPROBANTES (/voting/receipt/<firma>/ y /voting/ledger/proof/<firma>/) ---
+# Máximo de consultas por cliente (IP) en cada ventana de RECEIPT_LOOKUP_WINDOW segundos (ambas rutas suman).
+# Con varios workers el límite solo es global si la caché es compartida (ver CACHES).
+RECEIPT_LOOKUP_RATE = config('RECEIPT_LOOKUP_RATE', default=30, cast=int)
+RECEIPT_LOOKUP_WINDOW = config('RECEIPT_LOOKUP_WINDOW', default=60, cast=int)
+# Segundos que se recuerda en caché un comprobante inexistente (no se vuelve a consultar la base)
+RECEIPT_NEGATIVE_CACHE_TIMEOUT = config('RECEIPT_NEGATIVE_CACHE_TIMEOUT', default=60, cast=int)
+# Solo detrás de un proxy que reescribe X-Forwarded-For (ej. Render); si no, cualquiera falsifica su IP
+RECEIPT_TRUST_X_FORWARDED_FOR = config('RECEIPT_TRUST_X_FORWARDED_FOR', default=False, cast=bool)
+
 
 # Password validation
 # Validaciones automáticas para que las contraseñas no sean "12345".
@@ -104,6 +220,12 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# SOLO PARA PRUEBAS DE CARGA: hash de contraseñas barato (MD5) en lugar de PBKDF2.
+# Las cuentas ya existentes siguen funcionando (los demás hashers quedan activos). NUNCA en producción.
+if config('FAST_PASSWORD_HASHER', default=False, cast=bool):
+    from django.conf import global_settings
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher', *global_settings.PASSWORD_HASHERS]
+
 
 # --- IDIOMA Y ZONA HORARIA ---
 LANGUAGE_CODE = 'es-mx'        # Pone los mensajes de error y admin en Español de México
@@ -125,6 +247,33 @@ STATICFILES_DIRS = [
 ]
 
 
+# --- ESQUEMA DE FIRMA DIGITAL ---
+# Esquema con el que se generan las llaves NUEVAS de los votantes:
+# 'rsa-pkcs1v15' (original), 'rsa-pss' o 'ed25519' (mucho más rápido).
+# Los votantes que ya tienen llave conservan su esquema (VoterProfile.signature_scheme).
+SIGNATURE_SCHEME = config('SIGNATURE_SCHEME', default='rsa-pkcs1v15')
+
+# Modo navegador (WebCrypto), opcional: la llave se genera y firma en el navegador del
+# votante; el servidor solo guarda la pública y verifica UNA firma por voto. Apagado,
+# el flujo es el de siempre: descargar y subir el archivo .key. Los esquemas se prueban
+# en este orden (el primero que el navegador soporte): 'ed25519', 'rsa-pkcs1v15', 'rsa-pss'.
+CLIENT_SIGNING_ENABLED = config('CLIENT_SIGNING_ENABLED', default=False, cast=bool)
+CLIENT_SIGNATURE_SCHEMES = [
+    scheme.strip() for scheme in config('CLIENT_SIGNATURE_SCHEMES', default='ed25519,rsa-pkcs1v15').split(',')
+    if scheme.strip()
+]
+
+
+# --- RESERVA DE LLAVES RSA PRE-GENERADAS ---
+# El proceso 'python manage.py run_key_pool' mantiene llaves listas para entregar.
+# Cuando la reserva baja de KEY_POOL_LOW_WATER, se rellena hasta KEY_POOL_MAX_SIZE
+# generando como máximo KEY_POOL_REFILL_RATE llaves por segundo (para no acaparar la CPU).
+KEY_POOL_ENABLED = config('KEY_POOL_ENABLED', default=True, cast=bool)
+KEY_POOL_MAX_SIZE = config('KEY_POOL_MAX_SIZE', default=200, cast=int)
+KEY_POOL_LOW_WATER = config('KEY_POOL_LOW_WATER', default=50, cast=int)
+KEY_POOL_REFILL_RATE = config('KEY_POOL_REFILL_RATE', default=5.0, cast=float)
+
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -43,6 +43,9 @@ urlpatterns = [
     # Esto mantiene el proyecto ordenado.
     path('voting/', include('voting.urls')),
     
+    # Métricas para Prometheus (solo staff o con METRICS_TOKEN)
+    path('metrics', voting_views.metrics_view, name='metrics'),
+    
     # ---------------------------------------------------------
     # 5. PÁGINA DE INICIO (RAÍZ)
     # ---------------------------------------------------------